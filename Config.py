@@ -12,12 +12,12 @@ email: pphill10@u.rochester.edu
 website: https://github.com/peweetheman
 """
 
+import importlib
+import multiprocessing
+import os
 import numpy as np
-from control_algorithms.PRM_star_control import PRM_star
-from control_algorithms.RRT_star_control import RRT_star
-from scipy import sin, cos, sqrt, pi
-from control_algorithms.PRM_control import PRM
-from control_algorithms.RRT_control import RRT
+from numpy import pi
+from control_algorithms.base import auv_dynamics as dynamics
 
 """Configure the simulation parameters"""
 # AUV starting state
@@ -29,7 +29,16 @@ field_dim = [0, 9.9, 0, 4.9]  # x_min , x_max, y_min, y_max
 
 # Simulation variables
 plot = True      # whether or not to plot while running
+plot_process = True  # draw the plot in a separate renderer process that never blocks the control loop (live_plot.py), False redraws it in the control loop
 collect_data = False  # whether or not to save data to files
+record = False  # whether or not to record every control step to data/<run>_record.zip for offline replays, see recorder.py
+record_tree = False  # also record the planner trees, makes the recording much larger
+record_chunk = 50  # control steps per compressed chunk of the recording
+log_measurements = False  # whether or not to log every measurement to data/<run>_measurements.npz for offline GMRF benchmarks, see replay.py
+simulation_seed = None  # seed of the measurement noise, run i uses simulation_seed + i. None leaves np.random unseeded
+pipeline = False  # run the GMRF update in a worker process that overlaps with the control algorithm, see pipeline.py
+pipeline_staleness = 1  # the control algorithm may use a GMRF belief missing up to this many of the latest measurements, 0 waits for the current one
+profile = False  # whether or not to collect timers and counters of the GMRF and planners per control step, see instrumentation.py
 sigma_w_squ = 0.2 ** 2  # Measurement variance
 sample_time_gmrf = 100  # Sample/Calculation time in ms of GMRF algorithm, not used right now
 simulation_end_time = 2000000 # Run time of simulation in ms, not used right now
@@ -38,6 +47,8 @@ simulation_end_time = 2000000 # Run time of simulation in ms, not used right now
 gmrf_dim = [50, 25, 15, 15]  # lxf, lyf, dvx, dvy
 set_Q_init = False  # Re-Calculate precision matrix at Initialization? False: Load stored precision matrix
 set_Q_check = False  # Plots Q matrix entries inside GMRF algorithm
+gmrf_state = None  # file written by GMRF.save_state, if set every run starts from this posterior instead of the prior
+save_gmrf_state = False  # with collect_data, save the GMRF posterior at the end of every run to data/<run>_gmrf.npz
 set_gmrf_torus = True  # True -w> GMRF uses torus boundary condition, False -> GMRF uses Neumann-BC
 set_GMRF_cartype = False  # Use car(1)? <-> True, Default is car(2) from Choi et al
 set_prior = 3  # Choose prior case from below
@@ -85,7 +96,7 @@ elif set_GMRF_cartype == True:
 """CONTROL PARAMETERS"""
 simulation_max_dist = 40.0   			# max distance of path for simulation tests
 iterations = 100
-control_algo = 'PRM'      # choose either 'PI', 'RRT_star', 'PRM_star', 'RRT', 'PRM'
+control_algo = 'PRM'      # choose either 'PI', 'RRT_star', 'PRM_star', 'RRT', 'PRM', 'PRM_roadmap'
 sigma_epsilon = pi / 16         # Exploration noise in radians, 90 grad = 1,57
 R_cost = 5 * np.ones(shape=(1, 1))  # Immediate control cost. This is not incorporated in sampling algorithms, though could be in the cost function.
 border_variance_penalty = 1000
@@ -101,64 +112,103 @@ pi_parameters = (n_updates, n_k, n_horizon, N_horizon, t_cstep, sigma_epsilon, R
 
 """Choose control parameters for sampling control algorithms"""
 max_runtime = 0.5					# Runtime for the sampling algorithm to end after. Typically takes .05 seconds more than this runtime.
+planner_budget = 'time'				# when the sampling algorithms stop: 'time' (max_runtime), 'iterations' (max_iterations) or 'nodes' (max_nodes). The last two give the same result on every machine
+max_iterations = 1000				# iterations of the sampling algorithms with planner_budget = 'iterations'
+max_nodes = 200						# tree size of the sampling algorithms with planner_budget = 'nodes'
 max_curvature = 1.0     			# maximum curvature of a path allowed for the robot
 growth = 2.0       					# distance that RRT algorithms will steer nearest node to new node
 min_dist = 2.0                      # minimum distance of paths that the control algorithm will consider. needed to be >0 as we don't want to consider not moving (will get error if set to <=0). also good to not be super small, to discourage taking greedily very short informative paths that get stuck
-obstacles = None  					# any obstacles in the field. currently only handles squares specified by x,y location and side length
+obstacles = None  					# list of obstacles in the field: (x, y, side) squares, ('circle', x, y, radius) or ('polygon', [(x1, y1), ...]), see control_algorithms/base/obstacles.py
+obstacle_resolution = 0.05			# cell size of the obstacle occupancy grid in m
+obstacle_clearance = 0.0			# if > 0, paths have to keep this distance in m from the obstacles
+stall_time = None					# sampling algorithms stop early once their best path has not improved for this many seconds, None always runs max_runtime
+persistent_planner = False			# keep the RRT*/PRM* tree between control steps and re-root it at the new AUV pose instead of rebuilding it
+var_change_tol = 1e-3				# kept edges are only re-scored if the variance of a GMRF vertex they cross changed by more than this
+lazy_edges = False					# RRT*/PRM* rank candidate edges by a cheap lower bound of their cost and only plan the edges that can win
+sampler = 'uniform'					# sampling strategy of the sampling algorithms: 'uniform', 'halton', 'sobol' (needs scipy >= 1.7) or 'variance'
+planner_seed = None					# seed of the samples and random steering of every planner, None draws it from np.random
+sampler_batch = 256					# number of samples generated at once
+roadmap_vertices = 500				# number of vertices of the PRM_roadmap roadmap
+roadmap_radius = 3.0				# roadmap vertices closer than this (pose metric) are connected
+roadmap_resolution = 0.25			# distance resolution of the PRM_roadmap search, see graph_search.bucket_labels
+roadmap_search = 'buckets'			# PRM_roadmap search: 'buckets' (vectorized, graph_search.bucket_labels) or 'labels' (Pareto labels, graph_search.pareto_labels, slower on large roadmaps)
+# npz file the roadmap is saved to and reused from while the field geometry stays the same, in the user cache
+# directory so runs do not write to data/. None keeps it in memory for the run
+roadmap_file = os.path.join(os.environ.get('XDG_CACHE_HOME') or os.path.join(os.path.expanduser('~'), '.cache'), 'informative_path_planning', 'roadmap.npz')
+n_planner_workers = 1				# if > 1, this many independently seeded trees are grown in worker processes and the best plan is kept
 RRT_params = (field_dim, max_runtime, max_curvature, growth, min_dist, obstacles)
 PRM_params = (field_dim, max_runtime, max_curvature, min_dist, obstacles)
 
 
 #################################################################################################
 """DEFINE GENERAL FUNCTIONS"""
+# Control algorithms by name: (module, class, 'RRT' or 'PRM' parameters). A module is only imported when its planner is
+# first used, so a run or worker does not load the planners it does not need. Add planners with register_planner
+planners = {'RRT_star': ('control_algorithms.RRT_star_control', 'RRT_star', 'RRT'),
+			'PRM_star': ('control_algorithms.PRM_star_control', 'PRM_star', 'PRM'),
+			'RRT': ('control_algorithms.RRT_control', 'RRT', 'RRT'),
+			'PRM': ('control_algorithms.PRM_control', 'PRM', 'PRM'),
+			'PRM_roadmap': ('control_algorithms.PRM_roadmap_control', 'PRM_roadmap', 'PRM')}
+planner_classes = {}
+
+# Planner kept between control steps when persistent_planner is set
+planner = None
+
+# Add a control algorithm that make_planner can create by name, its class takes the arguments of the RRT or PRM planners
+def register_planner(name, module, class_name, params='RRT'):
+	planners[name] = (module, class_name, params)
+	planner_classes.pop(name, None)
+
+# Class of a control algorithm, imports its module on first use
+def planner_class(name):
+	if name not in planner_classes:
+		if name not in planners:
+			raise ValueError("unknown control algorithm " + str(name))
+		(module, class_name, params) = planners[name]
+		planner_classes[name] = getattr(importlib.import_module(module), class_name)
+	return planner_classes[name]
+
 # Run the selected control algorithm
-def control_algorithm(start, u_optimal, gmrf_params, var_x, max_dist, plot):
-	if control_algo == 'RRT_star':
-		return RRT_star(start, RRT_params, gmrf_params, var_x, max_dist, plot)
-	elif control_algo == 'PRM_star':
-		return PRM_star(start, PRM_params, gmrf_params, var_x, max_dist, plot)
-	elif control_algo == 'RRT':
-		return RRT(start, RRT_params, gmrf_params, var_x, max_dist, plot)
-	elif control_algo == 'PRM':
-		return PRM(start, PRM_params, gmrf_params, var_x, max_dist, plot)
-
-# AUV model
+def control_algorithm(start, u_optimal, gmrf_params, var_x, max_dist, plot, changed=None):
+	global planner
+	if n_planner_workers > 1:
+		from control_algorithms.ensemble_control import Ensemble
+		return Ensemble(control_algo, start, gmrf_params, var_x, max_dist, n_planner_workers)
+	if persistent_planner and type(planner).__name__ == control_algo and hasattr(planner, 'replan'):
+		planner.replan(start, var_x, max_dist, plot, changed)
+		return planner
+	planner = make_planner(control_algo, start, gmrf_params, var_x, max_dist, plot)
+	return planner
+
+# Create a new sampling control algorithm by name
+def make_planner(algorithm, start, gmrf_params, var_x, max_dist, plot, budget=None, seed=None):
+	planner_type = planner_class(algorithm)
+	params = RRT_params if planners[algorithm][2] == 'RRT' else PRM_params
+	if algorithm == 'PRM_roadmap':
+		# fixed roadmap, searched to completion every step
+		return planner_type(start, params, gmrf_params, var_x, max_dist, plot)
+	return planner_type(start, params, gmrf_params, var_x, max_dist, plot, budget, seed)
+
+# Drop the planner kept between control steps, needed at the start of every simulation run
+def reset_planner():
+	global planner
+	planner = None
+
+# Start method of the worker processes (planner ensemble, live plot, GMRF pipeline). Forked workers see the Config of
+# the parent, including changes made at runtime. Where fork is not available the workers are spawned and re-import
+# their modules, main.py keeps the simulation under its main guard for this
+def process_context():
+	if 'fork' in multiprocessing.get_all_start_methods():
+		return multiprocessing.get_context('fork')
+	return multiprocessing.get_context('spawn')
+
+# AUV model, see control_algorithms/base/auv_dynamics.py for the batched version
 def auv_dynamics(x_auv, u_auv, epsilon_a, delta_t, field_dim, x_auv_new=None, set_border=True):
-	x_auv_out = np.zeros(shape=3)
+	border = field_dim if set_border == True else None
 	if control_algo == 'PI':
-		x_auv_out[2] = x_auv[2] + u_auv * delta_t + epsilon_a * sqrt(delta_t)  # computes angle
-		x_auv_out[0] = x_auv[0] + v_auv * cos(x_auv_out[2]) * delta_t
-		x_auv_out[1] = x_auv[1] + v_auv * sin(x_auv_out[2]) * delta_t
+		return dynamics.step(np.reshape(x_auv, (3, 1)), np.ravel(u_auv)[0], epsilon_a, delta_t, v_auv, border)[:, 0]
 	else:
-		print("x-auv-new", x_auv_new)
-		vec = x_auv_new - x_auv
-		unit_vec = vec/ (np.sqrt(vec[0] ** 2 + vec[1] ** 2))
-		x_auv_out = x_auv + unit_vec * 1.0
-	if set_border == True:
-		# Prevent AUV from leaving the true field
-		if x_auv_out[0] < field_dim[0]:
-			x_auv_out[0] = field_dim[0]
-
-		if x_auv_out[1] < field_dim[2]:
-			x_auv_out[1] = field_dim[2]
-
-		if x_auv_out[0] > field_dim[1]:
-			x_auv_out[0] = field_dim[1]
-
-		if x_auv_out[1] > field_dim[3]:
-			x_auv_out[1] = field_dim[3]
-
-	if x_auv_out[2] > 2 * pi:
-		a_pi = int(x_auv_out[2] / 2 * pi)
-		x_auv_out[2] = x_auv_out[2] - a_pi * 2 * pi
-	trajectory_1 = np.vstack([x_auv, x_auv_out])
-	path_length = 0
-	for kk in range(1, np.size(trajectory_1, axis=0)):
-		path_length += ((trajectory_1[kk, 0] - trajectory_1[kk - 1, 0]) ** 2 + (
-					trajectory_1[kk, 1] - trajectory_1[kk - 1, 1]) ** 2)
-	print(" add path_length: ", path_length)
-
-	return x_auv_out
+		return dynamics.move_towards(x_auv, x_auv_new, 1.0, border)
 
 
 # Calculate new observation vector through shape function interpolation
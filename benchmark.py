@@ -0,0 +1,320 @@
+"""
+Microbenchmarks of the planning and estimation kernels with fixed seeds and fixtures.
+
+Results are compared against a saved baseline, a benchmark whose metric got slower than the baseline by more than
+the tolerance counts as a regression (exit code 1). With --output they are also written as JSON.
+	python benchmark.py                       run all benchmarks and compare against the baseline
+	python benchmark.py --save-baseline       run all benchmarks and store them as the new baseline
+	python benchmark.py dubins gmrf_update    only run the benchmarks whose name starts with one of these
+The metric is the best time of a call over the repeats. The sampling planners run a fixed number of iterations with
+a fixed seed instead of Config.max_runtime, their metric is the time per iteration, and the cost of their path after
+several iteration counts is compared separately as it must not depend on the machine.
+"""
+import argparse
+import contextlib
+import io
+import json
+import os
+import platform
+import random
+import shutil
+import subprocess
+import sys
+import tempfile
+import time
+
+import numpy as np
+
+import Config
+from control_algorithms import control_scripts
+from control_algorithms.base import dubins_path_planner as plan
+from control_algorithms.base.budget import IterationBudget
+from gp_scripts import gp_scripts
+
+# GMRF sizes (lxf, lyf, dvx, dvy) besides Config.gmrf_dim, whose precision matrices are computed at initialization
+gmrf_dims = {'small': [10, 5, 3, 3], 'medium': [20, 10, 5, 5]}
+planners = ['RRT', 'RRT_star', 'PRM', 'PRM_star', 'PRM_roadmap']
+iteration_planners = ['RRT', 'RRT_star', 'PRM', 'PRM_star']
+checkpoints = [50, 100, 200]     # iteration budgets at which the path cost of the planners is recorded
+seed = 0
+
+# imports of a simulation or planner worker process, run in a fresh interpreter by bench_startup
+startup_code = """
+import sys, time
+start = time.perf_counter()
+import Config
+from gp_scripts import gp_scripts
+from control_algorithms import control_scripts
+Config.planner_class(Config.control_algo)
+print(time.perf_counter() - start, len(sys.modules), 'matplotlib' in sys.modules)
+"""
+
+
+@contextlib.contextmanager
+def quiet():
+	# the GMRF prints its dimensions
+	with contextlib.redirect_stdout(io.StringIO()):
+		yield
+
+
+@contextlib.contextmanager
+def scratch_dir():
+	# GMRF(set_Q_init=True) writes its matrices to gp_scripts/ of the working directory, this keeps the stored ones
+	cwd = os.getcwd()
+	path = tempfile.mkdtemp()
+	os.mkdir(os.path.join(path, 'gp_scripts'))
+	os.chdir(path)
+	try:
+		yield path
+	finally:
+		os.chdir(cwd)
+		shutil.rmtree(path)
+
+
+def seed_all():
+	random.seed(seed)
+	np.random.seed(seed)
+
+
+class Fixtures(object):
+	# inputs shared by the benchmarks, built once and only on demand
+
+	def __init__(self):
+		self.cache = {}
+
+	def get(self, name, make):
+		if name not in self.cache:
+			seed_all()
+			self.cache[name] = make()
+		return self.cache[name]
+
+	def gmrf(self, size):
+		# GMRF after a few measurements along a fixed track, so the variance field is not flat
+		def make():
+			with quiet():
+				if size == 'config':
+					gmrf = gp_scripts.GMRF(Config.gmrf_dim, Config.alpha_prior, Config.kappa_prior, False)
+				else:
+					with scratch_dir():
+						gmrf = gp_scripts.GMRF(gmrf_dims[size], Config.alpha_prior, Config.kappa_prior, True)
+				for x in np.linspace(1.0, 4.0, 4):
+					gmrf.gmrf_bayese_update(np.array([x, 0.5 * x, 0.4]), np.random.normal(size=1))
+			return gmrf
+		return self.get('gmrf_' + size, make)
+
+	def poses(self, k=200):
+		# k (start, end) pose pairs inside the field
+		def make():
+			(x_min, x_max, y_min, y_max) = Config.field_dim
+			low, high = [x_min, y_min, -np.pi], [x_max, y_max, np.pi]
+			return np.random.uniform(low, high, size=(k, 3)), np.random.uniform(low, high, size=(k, 3))
+		return self.get('poses', make)
+
+	def paths(self):
+		# Dubins polylines of the pose pairs
+		def make():
+			starts, ends = self.poses()
+			return [plan.dubins_path_planning(s[0], s[1], s[2], e[0], e[1], e[2], Config.max_curvature)[:3] for (s, e) in zip(starts[:50], ends[:50])]
+		return self.get('paths', make)
+
+
+def measure(function, repeat):
+	# best and median time of repeat calls
+	times = []
+	for _ in range(repeat):
+		start = time.perf_counter()
+		function()
+		times.append(time.perf_counter() - start)
+	return {'seconds': min(times), 'median': float(np.median(times)), 'repeat': repeat}
+
+
+def bench_precision_matrix(fixtures, size, repeat):
+	(lxf, lyf, dvx, dvy) = Config.gmrf_dim if size == 'config' else gmrf_dims[size]
+	(lx, ly) = (lxf + 2 * dvx, lyf + 2 * dvy)
+	return measure(lambda: gp_scripts.calculate_precision_matrix(lx, ly, Config.kappa_prior[0], Config.alpha_prior[0], car1=Config.set_GMRF_cartype), repeat)
+
+
+def bench_gmrf_init(fixtures, size, repeat):
+	if size == 'config':
+		# loads the stored precision matrices
+		def run():
+			with quiet():
+				gp_scripts.GMRF(Config.gmrf_dim, Config.alpha_prior, Config.kappa_prior, False)
+	else:
+		def run():
+			with quiet(), scratch_dir():
+				gp_scripts.GMRF(gmrf_dims[size], Config.alpha_prior, Config.kappa_prior, True)
+	return measure(run, repeat)
+
+
+def bench_gmrf_update(fixtures, size, repeat):
+	gmrf = fixtures.gmrf(size)
+	seed_all()
+	return measure(lambda: gmrf.gmrf_bayese_update(np.array([2.5, 2.0, 0.4]), np.random.normal(size=1)), repeat)
+
+
+def bench_dubins(fixtures, repeat):
+	starts, ends = fixtures.poses()
+
+	def run():
+		for (s, e) in zip(starts, ends):
+			plan.dubins_path_planning(s[0], s[1], s[2], e[0], e[1], e[2], Config.max_curvature)
+	result = measure(run, repeat)
+	result['calls'] = len(starts)
+	return result
+
+
+def bench_path_var(fixtures, repeat):
+	gmrf = fixtures.gmrf('config')
+	planner = Config.make_planner('RRT_star', Config.x_auv, gmrf.params, gmrf.var_x, Config.simulation_max_dist, None)
+	paths = fixtures.paths()
+
+	def run():
+		for (px, py, pangle) in paths:
+			planner.path_var(px, py, pangle)
+	result = measure(run, repeat)
+	result['calls'] = len(paths)
+	return result
+
+
+def bench_control_algorithm(fixtures, algorithm, repeat):
+	# machine speed: time per iteration of a fixed number of iterations. Algorithmic quality: cost of the returned path
+	# after a given number of iterations, which does not depend on the machine as the planners are seeded
+	gmrf = fixtures.gmrf('config')
+	roadmap_file = Config.roadmap_file
+	Config.roadmap_file = None   # the roadmap is built in memory, not loaded from or saved to disk
+	try:
+		make = lambda budget: Config.make_planner(algorithm, Config.x_auv, gmrf.params, gmrf.var_x, Config.simulation_max_dist, None, budget, seed)
+		make(IterationBudget(1))
+		if algorithm not in iteration_planners:
+			return measure(lambda: make(None).control_algorithm(), repeat)
+		times = []
+		for _ in range(repeat):
+			planner = make(IterationBudget(max(checkpoints)))
+			start = time.perf_counter()
+			planner.control_algorithm()
+			times.append(time.perf_counter() - start)
+		cost = {}
+		for iterations in checkpoints:
+			planner = make(IterationBudget(iterations))
+			planner.control_algorithm()
+			cost[str(iterations)] = planner_cost(planner)
+	finally:
+		Config.roadmap_file = roadmap_file
+	return {'seconds': min(times), 'median': float(np.median(times)), 'repeat': repeat, 'iterations': max(checkpoints),
+			'nodes': planner_size(planner), 'samples_per_second': max(checkpoints) / min(times),
+			'metric': min(times) / max(checkpoints), 'cost': cost}
+
+
+def bench_pi_controller(fixtures, repeat):
+	gmrf = fixtures.gmrf('config')
+	u_optimal = np.zeros(shape=(Config.N_horizon, 1))
+	seed_all()
+	return measure(lambda: control_scripts.pi_controller(Config.x_auv, u_optimal, gmrf.var_x, Config.pi_parameters, gmrf.params, Config.field_dim, False), repeat)
+
+
+def bench_startup(fixtures, repeat):
+	# import time of a new worker process, which only has to load the configured planner and no plotting
+	times = []
+	for _ in range(repeat):
+		output = subprocess.check_output([sys.executable, '-c', startup_code], cwd=os.path.dirname(os.path.abspath(__file__)))
+		(seconds, modules, matplotlib) = output.split()[-3:]
+		times.append(float(seconds))
+	return {'seconds': min(times), 'median': float(np.median(times)), 'repeat': repeat, 'modules': int(modules),
+			'matplotlib': matplotlib == b'True'}
+
+
+def planner_cost(planner):
+	# average variance per unit path length of the best path
+	if hasattr(planner, 'tree'):
+		return float(planner.tree.best_cost())
+	return float(planner.best_node_cost())
+
+
+def planner_size(planner):
+	if hasattr(planner, 'tree'):
+		return len(planner.tree)
+	elif hasattr(planner, 'roadmap'):
+		return len(planner.roadmap)
+	return len(planner.node_list)
+
+
+def benchmarks(repeat):
+	# (name, function) of every benchmark, the function takes the fixtures
+	suite = []
+	for size in list(gmrf_dims) + ['config']:
+		suite.append(('precision_matrix_' + size, lambda f, size=size: bench_precision_matrix(f, size, repeat)))
+	for size in gmrf_dims:
+		suite.append(('gmrf_init_' + size, lambda f, size=size: bench_gmrf_init(f, size, max(repeat // 2, 1))))
+	suite.append(('gmrf_init_config', lambda f: bench_gmrf_init(f, 'config', repeat)))
+	for size in list(gmrf_dims) + ['config']:
+		suite.append(('gmrf_update_' + size, lambda f, size=size: bench_gmrf_update(f, size, repeat)))
+	suite.append(('dubins', lambda f: bench_dubins(f, repeat)))
+	suite.append(('path_var', lambda f: bench_path_var(f, repeat)))
+	for algorithm in planners:
+		suite.append(('control_algorithm_' + algorithm, lambda f, algorithm=algorithm: bench_control_algorithm(f, algorithm, max(repeat // 2, 1))))
+	suite.append(('pi_controller', lambda f: bench_pi_controller(f, repeat)))
+	suite.append(('startup', lambda f: bench_startup(f, repeat)))
+	return suite
+
+
+def run(names=(), repeat=5):
+	fixtures = Fixtures()
+	results = {}
+	for (name, function) in benchmarks(repeat):
+		if names and not any(name.startswith(prefix) for prefix in names):
+			continue
+		result = function(fixtures)
+		result.setdefault('metric', result['seconds'])
+		results[name] = result
+		print("{0:<32} {1:.6f} s".format(name, result['metric']))
+	return {'date': time.strftime('%Y-%m-%d %H:%M:%S'), 'machine': platform.node(), 'python': platform.python_version(),
+			'numpy': np.__version__, 'max_runtime': Config.max_runtime, 'results': results}
+
+
+def compare(report, baseline, tolerance):
+	# names of the benchmarks whose metric exceeds the baseline by more than tolerance
+	regressions = []
+	for name, result in sorted(report['results'].items()):
+		if name not in baseline['results']:
+			continue
+		ratio = result['metric'] / baseline['results'][name]['metric']
+		flag = ''
+		if ratio > tolerance:
+			flag = 'REGRESSION'
+			regressions.append(name)
+		elif ratio < 1.0 / tolerance:
+			flag = 'faster'
+		# lower cost is better, costs are negative
+		baseline_cost = baseline['results'][name].get('cost', {})
+		worse = [k for k, cost in result.get('cost', {}).items() if k in baseline_cost and cost > baseline_cost[k] + 1e-9]
+		if worse:
+			flag += ' COST REGRESSION after {0} iterations'.format(', '.join(worse))
+			regressions.append(name)
+		print("{0:<32} {1:6.2f}x baseline {2}".format(name, ratio, flag))
+	return regressions
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Microbenchmarks of the planning and estimation kernels")
+	parser.add_argument('names', nargs='*', help="only run benchmarks whose name starts with one of these")
+	parser.add_argument('--repeat', type=int, default=5)
+	parser.add_argument('--output', default=None, help="also write the results to this JSON file")
+	parser.add_argument('--baseline', default='benchmark_baseline.json', help="baseline of this machine, ignored by git")
+	parser.add_argument('--save-baseline', action='store_true', help="store the results as the new baseline")
+	parser.add_argument('--tolerance', type=float, default=1.25, help="allowed slowdown factor against the baseline")
+	args = parser.parse_args(argv)
+
+	report = run(args.names, args.repeat)
+	for filename in ([args.baseline] if args.save_baseline else []) + ([args.output] if args.output is not None else []):
+		with open(filename, 'w') as f:
+			json.dump(report, f, indent=1, sort_keys=True)
+	if args.save_baseline or not os.path.exists(args.baseline):
+		return 0
+	with open(args.baseline) as f:
+		baseline = json.load(f)
+	return 1 if compare(report, baseline, args.tolerance) else 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -1,17 +1,21 @@
-import copy
 import math
-import random
-import time
 import numpy as np
 import Config
+import instrumentation
 from control_algorithms.base import dubins_path_planner as plan
+from control_algorithms.base import obstacles
+from control_algorithms.base import samplers
+from control_algorithms.base.budget import make_budget
+from control_algorithms.base.Edge import Edge
 from control_algorithms.base.Node import Node
+from control_algorithms.base.NodePlanner import NodePlanner
+from control_algorithms.base.Tree import Tree
 
 
-class PRM:
+class PRM(NodePlanner):
 	# PRM* algorithm using average variance per unit path length as cost function and Dubins path planner for local planning
 
-	def __init__(self, start, PRM_params, gmrf_params, var_x, max_dist, plot):
+	def __init__(self, start, PRM_params, gmrf_params, var_x, max_dist, plot, budget=None, seed=None):
 		"""
 		:param start: initial location of agent
 		:param PRM_params: specified in config file
@@ -19,23 +23,33 @@ class PRM:
 		:param var_x: variance of field as a 1D vector of variance of each node in GMRF
 		:param max_dist: maximum distance that the algorithm solution will return
 		:param plot: only used for plotting in the middle of running algorithm good for debugging
+		:param budget: when to stop planning, see control_algorithms/base/budget.py. Defaults to the one chosen in the config file
+		:param seed: seed of the samples, defaults to Config.planner_seed
 		"""
 		self.start = Node(start)
 		self.node_list = [self.start]
+		self.edge_buffers = Tree(self.start.pose)
 		(self.space, self.max_time, self.max_curvature, self.min_dist, self.obstacles) = PRM_params
 		self.gmrf_params = gmrf_params
 		self.max_dist = max(max_dist, 10)  # can't just take the max_dist in case at the end of the simulation this will allow no possible paths
 		self.var_x = var_x
-		# used to track runtimes
-		self.local_planner_time = 0.0
-		self.method_time = 0.0
 		self.plot = plot
-
+		# trajectory index and path length from the start at which every edge of the returned path starts, one entry per
+		# edge beginning with 0. They belong to the result of control_algorithm and are read from the planner after it
+		self.edge_offsets = None
+		self.arc_offsets = None
+		# best node so far, node costs never change once a node is added
+		self.best_node = self.start
+		self.obstacle_map = obstacles.get_map(self.obstacles, self.space, Config.obstacle_resolution, Config.obstacle_clearance)
+		self.sampler = samplers.make_sampler(Config.sampler, [self.space[0]+.3, self.space[1]-.3, self.space[2]+.3, self.space[3]-.3], gmrf_params, var_x, Config.planner_seed if seed is None else seed, Config.sampler_batch)
+		self.budget = budget if budget is not None else make_budget(Config.planner_budget, self.max_time, Config.max_iterations, Config.max_nodes)
+
+	@instrumentation.timed('control_algorithm')
 	def control_algorithm(self):
-		start_time = time.time()
+		self.budget.start()
+		self.best_cost, self.best_time = float("inf"), self.budget.start_time
 		while True:
-			current_time = time.time() - start_time
-			if current_time > self.max_time:
+			if self.budget.exhausted(len(self.node_list)) or self.stalled(self.best_node_cost()):
 				break
 
 			##  PRM start
@@ -45,10 +59,11 @@ class PRM:
 				self.set_parent(sample_node, nearest_node)
 				if sample_node.parent is None:  # no possible path from any of the near nodes
 					continue
-				self.node_list.append(sample_node)
+				self.add_node(sample_node)
 			## PRM end
 
 		# generate path
+		instrumentation.count('nodes', len(self.node_list))
 		last_node = self.get_best_last_node()
 		if last_node is None:
 			return None
@@ -56,65 +71,34 @@ class PRM:
 		return path, u_optimal, tau_optimal
 
 	def get_sample(self):
-		sample = Node([random.uniform(self.space[0]+.3, self.space[1]-.3),
-					   random.uniform(self.space[2]+.3, self.space[3]-.3),
-					   random.uniform(-math.pi, math.pi)])
+		sample = Node(self.sampler.sample())
 		return sample
 
 	def local_path(self, source_node, destination_node):
-		# take source_node and find path to destination_node
-		time1 = time.time()
+		# take source_node and find path to destination_node, returns a candidate Edge
 		px, py, pangle, mode, plength, u = plan.dubins_path_planning(source_node.pose[0], source_node.pose[1], source_node.pose[2], destination_node.pose[0], destination_node.pose[1], destination_node.pose[2], self.max_curvature)
-		self.local_planner_time += time.time() - time1
-		new_node = copy.deepcopy(source_node)
-		new_node.pose = destination_node.pose
-		new_node.path_x = px
-		new_node.path_y = py
-		new_node.path_angle = pangle
-		new_node.u = u
-
-		new_node.path_dist = plength
-		new_node.dist += plength
-		new_node.path_var = self.path_var(px, py, pangle)
-		new_node.total_var += new_node.path_var
-		new_node.cost = new_node.total_var / new_node.dist
-		new_node.parent = source_node
-		return new_node
+		path_var = self.path_var(px, py, pangle)
+		return Edge(source_node, destination_node.pose, px, py, pangle, u, plength, path_var,
+					source_node.dist + plength, source_node.total_var + path_var)
+
+	def accept_edge(self, node, edge):
+		# materializes an accepted candidate edge on node
+		node.parent = edge.source
+		node.path_x = edge.path_x
+		node.path_y = edge.path_y
+		node.path_angle = edge.path_angle
+		node.u = edge.u
+		node.path_dist = edge.path_dist
+		node.path_var = edge.path_var
+		node.dist = edge.dist
+		node.total_var = edge.total_var
+		node.cost = edge.cost
 
 	def set_parent(self, new_node, nearest_node):
-		# connects new_node to nearest node and tracks cost
-		px, py, pangle, mode, plength, u = plan.dubins_path_planning(nearest_node.pose[0], nearest_node.pose[1], nearest_node.pose[2], new_node.pose[0], new_node.pose[1], new_node.pose[2], self.max_curvature)
-		new_node.parent = nearest_node
-		new_node.path_x = px
-		new_node.path_y = py
-		new_node.path_angle = pangle
-		new_node.total_var = new_node.parent.total_var + self.path_var(px, py, pangle)
-		new_node.u = u
-		new_node.dist = new_node.parent.dist + plength
-
-	def get_best_last_node(self):
-		cost_list = []
-		for node in self.node_list:
-			if node.dist >= self.min_dist:
-				cost_list.append(node.cost)
-			else:
-				cost_list.append(float("inf"))
-		best_node = self.node_list[cost_list.index(min(cost_list))]
-		return best_node
-
-	def get_path(self, last_node):
-		path = [last_node]
-		u_optimal = []
-		tau_optimal = np.vstack((last_node.path_x, last_node.path_y, last_node.path_angle))
-		while True:
-			path.append(last_node.parent)
-			u_optimal = u_optimal + last_node.u
-			last_node = last_node.parent
-			if last_node is None:
-				break
-			tau_add = np.vstack((last_node.path_x, last_node.path_y, last_node.path_angle))
-			tau_optimal = np.concatenate((tau_add, tau_optimal), axis=1)
-		return path, u_optimal, tau_optimal
+		# connects new_node to nearest node and tracks cost, new_node keeps no parent if the path hits an obstacle
+		edge = self.local_path(nearest_node, new_node)
+		if self.obstacle_map.path_free(edge.path_x, edge.path_y):
+			self.accept_edge(new_node, edge)
 
 	def get_near_nodes(self, new_node):
 		# gamma_star = 2(1+1/d) ** (1/d) volume(free)/volume(total) ** 1/d and we need gamma > gamma_star
@@ -127,26 +111,22 @@ class PRM:
 		return near_nodes
 
 	def check_collision(self, node):
-		if self.obstacles is not None:
-			for (x, y, side) in self.obstacles:
-				for (nx, ny) in zip(node.path_x, node.path_y):
-					if ((nx > x - .8 * side / 2) & (nx < x + .8 * side / 2) & (ny > y - side / 2) & (
-								ny < y + side / 2)):
-						return False  # collision
-
-		return True  # safe
+		# checks the path to node, or only its pose if it has no path yet
+		if len(node.path_x):
+			return self.obstacle_map.path_free(node.path_x, node.path_y)
+		return self.obstacle_map.path_free([node.pose[0]], [node.pose[1]])
 
 	def nearest_node(self, sample):
 		dlist = [dist(node, sample) for node in self.node_list]
 		min_node = self.node_list[dlist.index(min(dlist))]
 		return min_node
 
+	@instrumentation.timed('path_var')
 	def path_var(self, px, py, pangle):  # returns negative total variance along the path
 		control_cost = 0  # NOT USED!!!!!!
 		path_var = 0
 
 		(lxf, lyf, dvx, dvy, lx, ly, n, p, de, l_TH, p_THETA, xg_min, xg_max, yg_min, yg_max) = self.gmrf_params
-		p1 = time.time()
 		A = np.zeros(shape=(n + p, 1)).astype(float)
 		# iterate over path and calculate cost
 		for kk in range(len(px)):  # Iterate over length of trajectory
@@ -157,7 +137,6 @@ class PRM:
 				A += interpolation_matrix(np.array([px[kk], py[kk], pangle[kk]]), n, p, lx, xg_min, yg_min, de)
 				control_cost += 0
 		path_var -= np.dot(A.T, self.var_x)[0][0]
-		self.method_time += (time.time() - p1)
 		return path_var  # negative path var
 
 	def draw_graph(self, plot=None):
@@ -167,9 +146,7 @@ class PRM:
 				if node.parent is not None:
 					plot.plot(node.path_x, node.path_y, color='green')
 
-			if self.obstacles is not None:
-				for (x, y, side) in self.obstacles:
-					plot.plot(x, y, "sk", ms=8 * side)
+			self.obstacle_map.draw(plot)
 
 			plot.quiver(self.start.pose[0], self.start.pose[1], math.cos(self.start.pose[2]), math.sin(self.start.pose[2]), color="b")
 			plot.axis(self.space)
@@ -202,30 +179,3 @@ def interpolation_matrix(x_local2, n, p, lx, xg_min, yg_min, de):
 	u1[((ny + 1) * lx) + nx] = (-1 / (de[0] * de[1])) * ((x_el - de[0] / 2) * (y_el + de[1] / 2))  # u for upper left corner
 	u1[((ny + 1) * lx) + nx + 1] = (1 / (de[0] * de[1])) * ((x_el + de[0] / 2) * (y_el + de[1] / 2))  # u for upper right corner
 	return u1
-
-
-def initialize(graph, source):
-	d = {}  # Stands for destination
-	p = {}  # Stands for predecessor
-	for node in graph:
-		d[node] = float('Inf')  # We start admiting that the rest of nodes are very very far
-		p[node] = None
-	d[source] = 0  # For the source we know how to reach
-	return d, p
-
-
-def relax(node, neighbour, graph, d, p):
-	# If the distance between the node and the neighbour is lower than the one I have now
-	if d[neighbour] > d[node] + graph[node][neighbour]:
-		# Record this lower distance
-		d[neighbour] = d[node] + graph[node][neighbour]
-		p[neighbour] = node
-
-
-def bellman_ford(graph, source):
-	d, p = initialize(graph, source)
-	for i in range(len(graph) - 1):  # Run this until is converges
-		for u in graph:
-			for v in graph[u]:  # For each neighbour of u
-				relax(u, v, graph, d, p)  # Lets relax it
-	return d, p
\ No newline at end of file
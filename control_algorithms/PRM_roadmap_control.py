@@ -0,0 +1,158 @@
+import math
+
+import numpy as np
+
+import Config
+import instrumentation
+from control_algorithms.base import dubins_path_planner as plan
+from control_algorithms.base import footprint
+from control_algorithms.base import graph_search
+from control_algorithms.base import obstacles
+from control_algorithms.base import samplers
+from control_algorithms.base.Roadmap import Roadmap
+from control_algorithms.base.Tree import gather_segments, pose_distances
+
+# Roadmaps loaded or built in this process, by signature
+roadmaps = {}
+
+
+class PRM_roadmap:
+	# Multi-query PRM using average variance per unit path length as cost function. The roadmap only depends on the
+	# field geometry and is built once (and saved to Config.roadmap_file). Every call re-weights its edges with var_x,
+	# connects the AUV pose to the roadmap and searches the (distance, variance) labels within max_dist
+
+	def __init__(self, start, PRM_params, gmrf_params, var_x, max_dist, plot):
+		"""
+		:param start: initial location of agent
+		:param PRM_params: specified in config file
+		:param gmrf_params: specified in config file
+		:param var_x: variance of field as a 1D vector of variance of each node in GMRF
+		:param max_dist: maximum distance that the algorithm solution will return
+		:param plot: only used for plotting in the middle of running algorithm good for debugging
+		"""
+		(self.space, self.max_time, self.max_curvature, self.min_dist, self.obstacles) = PRM_params
+		self.start = np.array(start, dtype=float)
+		self.gmrf_params = gmrf_params
+		self.max_dist = max(max_dist, 10)   # can't just take the max_dist in case at the end of the simulation this will allow no possible paths
+		self.var_x = var_x
+		self.radius = Config.roadmap_radius
+		self.obstacle_map = obstacles.get_map(self.obstacles, self.space, Config.obstacle_resolution, Config.obstacle_clearance)
+		self.roadmap = get_roadmap(self)
+		self.cost = float("inf")    # average variance per unit path length of the returned path
+		self.plot = plot
+		self.edges = []             # roadmap edges of the returned path, -1 for the edge from the start
+		# trajectory index and path length from the start at which every edge of the returned path starts, one entry per
+		# edge beginning with 0. They belong to the result of control_algorithm and are read from the planner after it
+		self.edge_offsets = None
+		self.arc_offsets = None
+
+	@instrumentation.timed('control_algorithm')
+	def control_algorithm(self):
+		roadmap = self.roadmap
+		n = len(roadmap)
+		with instrumentation.timer('edge_var'):
+			edge_var = roadmap.edge_var(self.var_x, Config.border_variance_penalty)
+
+		# connect the AUV pose to the roadmap
+		connections = self.connect()
+		graph = roadmap.graph(edge_var, [c[0] for c in connections], [c[5] for c in connections], [c[6] for c in connections])
+		if Config.roadmap_search == 'labels':
+			labels = graph_search.pareto_labels(graph, n, self.max_dist, Config.roadmap_resolution)
+			best = graph_search.best_ratio(labels, self.min_dist)
+			if best is None:
+				return None
+			(d, var, _, _) = labels[best[0]][best[1]]
+			self.cost = var / d
+			vertices = graph_search.label_path(labels, best[0], best[1])
+		else:
+			labels = graph_search.bucket_labels(graph, n, self.max_dist, Config.roadmap_resolution)
+			best = graph_search.best_bucket(labels, self.min_dist)
+			if best is None:
+				return None
+			self.cost = labels[1][best] / labels[0][best]
+			vertices = graph_search.bucket_path(labels, best[0], best[1])
+		return self.get_path(vertices, connections)
+
+	def connect(self):
+		# Dubins edges from the start to the roadmap vertices within radius, or to the nearest ones if there are none.
+		# Returns (vertex, px, py, pangle, u, plength, path_var) for every collision free edge
+		distances = pose_distances(self.roadmap.pose, self.start)
+		near = np.nonzero(distances <= self.radius)[0]
+		if len(near) == 0:
+			near = np.argsort(distances)[:5]
+		connections = []
+		for vertex in near:
+			pose = self.roadmap.pose[vertex]
+			px, py, pangle, mode, plength, u = plan.dubins_path_planning(self.start[0], self.start[1], self.start[2], pose[0], pose[1], pose[2], self.max_curvature)
+			if self.check_collision(px, py):
+				connections.append((int(vertex), px, py, pangle, u, plength, self.path_var(px, py)))
+		return connections
+
+	def get_path(self, vertices, connections):
+		# vertices starts with the AUV vertex, returns the vertices leaf first like the other planners, the controls
+		# and the (3, N) trajectory from the start. The edges are collected first and then copied once
+		roadmap = self.roadmap
+		connection = [c for c in connections if c[0] == vertices[1]][0]
+		edges = np.array([roadmap.indptr[v] + np.nonzero(roadmap.to[roadmap.indptr[v]:roadmap.indptr[v + 1]] == w)[0][0]
+						  for (v, w) in zip(vertices[1:-1], vertices[2:])], dtype=int)
+		self.edges = [-1] + list(edges)
+		lengths = np.append(len(connection[1]), roadmap.path_len[edges])
+		dists = np.append(connection[5], roadmap.length[edges])
+		self.edge_offsets = np.cumsum(lengths) - lengths
+		self.arc_offsets = np.cumsum(dists) - dists
+		tau_optimal = np.empty(shape=(3, np.sum(lengths)))
+		tau_optimal[:, :lengths[0]] = connection[1:4]
+		tau_optimal[:, lengths[0]:] = gather_segments(roadmap.path, roadmap.path_start[edges], roadmap.path_len[edges]).T
+		u_optimal = np.concatenate((connection[4], gather_segments(roadmap.u, roadmap.u_start[edges], roadmap.u_len[edges])))
+		return vertices[::-1], u_optimal, tau_optimal
+
+	def check_collision(self, path_x, path_y):
+		return self.obstacle_map.path_free(path_x, path_y)
+
+	@instrumentation.timed('path_var')
+	def path_var(self, px, py):      # returns negative total variance along the path
+		cells, weights, n_outside = footprint.path_footprint(px, py, self.gmrf_params, self.space)
+		path_var = Config.border_variance_penalty * n_outside - np.dot(weights, np.ravel(self.var_x)[cells])
+		return path_var    # negative path var
+
+	def signature(self):
+		# field geometry and roadmap settings the roadmap was built for
+		(lxf, lyf, dvx, dvy, lx, ly, n, p, de, l_TH, p_THETA, xg_min, xg_max, yg_min, yg_max) = self.gmrf_params
+		return np.concatenate((self.space, [self.max_curvature, Config.roadmap_vertices, self.radius, lx, ly, de[0], de[1], xg_min, yg_min],
+							   self.obstacle_map.signature()))
+
+	def draw_graph(self, plot=None):
+		if plot is not None:  # use plot of calling
+			roadmap = self.roadmap
+			poses = roadmap.pose
+			plot.quiver(poses[:, 0], poses[:, 1], np.cos(poses[:, 2]), np.sin(poses[:, 2]), color='b', angles='xy', scale_units='xy', scale=.8, width=.015)
+			for e in self.edges:
+				if e >= 0:
+					edge = roadmap.edge(e)
+					plot.plot(edge[:, 0], edge[:, 1], color='green')
+
+			self.obstacle_map.draw(plot)
+
+			plot.quiver(self.start[0], self.start[1], math.cos(self.start[2]), math.sin(self.start[2]), color="b")
+			plot.axis(self.space)
+			plot.grid(True)
+			plot.title("PRM roadmap (avg variance per unit path length as cost function)")
+			plot.pause(.1)  # need for animation
+
+
+def get_roadmap(planner):
+	# roadmap for the field geometry of planner, from memory, from Config.roadmap_file or newly built
+	signature = planner.signature()
+	key = tuple(signature)
+	if key in roadmaps:
+		return roadmaps[key]
+	roadmap = Roadmap.load(Config.roadmap_file, signature) if Config.roadmap_file else None
+	if roadmap is None:
+		# Halton samples cover the field evenly and do not depend on var_x, the seed keeps the roadmap reproducible
+		sampler = samplers.make_sampler('halton', [planner.space[0]+.3, planner.space[1]-.3, planner.space[2]+.3, planner.space[3]-.3], seed=0)
+		roadmap = Roadmap.build(signature, sampler, Config.roadmap_vertices, planner.radius, planner.max_curvature,
+								planner.gmrf_params, planner.space, planner.check_collision)
+		if Config.roadmap_file:
+			roadmap.save(Config.roadmap_file)
+	roadmaps[key] = roadmap
+	return roadmap
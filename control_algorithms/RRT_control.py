@@ -1,17 +1,22 @@
 import math
 import random
-import time
 
 import numpy as np
 import Config
+import instrumentation
 from control_algorithms.base import dubins_path_planner as plan
+from control_algorithms.base import obstacles
+from control_algorithms.base import samplers
+from control_algorithms.base.budget import make_budget
 from control_algorithms.base.Node import Node
+from control_algorithms.base.NodePlanner import NodePlanner
+from control_algorithms.base.Tree import Tree
 
 
-class RRT:
+class RRT(NodePlanner):
 	# Modified RRT algorithm using avg variance per unit path length as cost function
 
-	def __init__(self, start, RRT_params, gmrf_params, var_x, max_dist, plot):
+	def __init__(self, start, RRT_params, gmrf_params, var_x, max_dist, plot, budget=None, seed=None):
 		"""
 		:param start: initial location of agent
 		:param RRT_params: specified in config file
@@ -19,22 +24,34 @@ class RRT:
 		:param var_x: variance of field as a 1D vector of variance of each node in GMRF
 		:param max_dist: maximum distance that the algorithm solution will return
 		:param plot: only used for plotting in the middle of running algorithm good for debugging
+		:param budget: when to stop planning, see control_algorithms/base/budget.py. Defaults to the one chosen in the config file
+		:param seed: seed of the samples and the random steering, defaults to Config.planner_seed
 		"""
 		self.start = Node(start)
 		self.node_list = [self.start]
+		self.edge_buffers = Tree(self.start.pose)
 		self.max_dist = max(max_dist, 10)   # can't just take the max_dist in case at the end of the simulation this will allow no possible paths
 		self.var_x = var_x
 		(self.space, self.max_time, self.max_curvature, self.growth, self.min_dist, self.obstacles) = RRT_params
 		self.gmrf_params = gmrf_params
-		self.local_planner_time = 0.0
-		self.method_time = 0.0
 		self.plot = plot
-
+		# trajectory index and path length from the start at which every edge of the returned path starts, one entry per
+		# edge beginning with 0. They belong to the result of control_algorithm and are read from the planner after it
+		self.edge_offsets = None
+		self.arc_offsets = None
+		# best node so far, node costs never change once a node is added
+		self.best_node = self.start
+		self.obstacle_map = obstacles.get_map(self.obstacles, self.space, Config.obstacle_resolution, Config.obstacle_clearance)
+		self.sampler = samplers.make_sampler(Config.sampler, [self.space[0]+.3, self.space[1]-.3, self.space[2]+.3, self.space[3]-.3], gmrf_params, var_x, Config.planner_seed if seed is None else seed, Config.sampler_batch)
+		self.rng = random.Random(self.sampler.rng.randint(0, 2 ** 31 - 1))   # random steering
+		self.budget = budget if budget is not None else make_budget(Config.planner_budget, self.max_time, Config.max_iterations, Config.max_nodes)
+
+	@instrumentation.timed('control_algorithm')
 	def control_algorithm(self):
-		start_time = time.time()
+		self.budget.start()
+		self.best_cost, self.best_time = float("inf"), self.budget.start_time
 		while True:
-			current_time = time.time() - start_time
-			if current_time > self.max_time:
+			if self.budget.exhausted(len(self.node_list)) or self.stalled(self.best_node_cost()):
 				break
 
 			# RRT start
@@ -45,41 +62,42 @@ class RRT:
 				self.set_parent(new_node, nearest_node)
 				if new_node.parent is None:  # no possible path from any of the near nodes
 					continue
-				self.node_list.append(new_node)
+				self.add_node(new_node)
 			# RRT end
 		# generate path
+		instrumentation.count('nodes', len(self.node_list))
 		last_node = self.get_best_last_node()
 		path, u_optimal, tau_optimal = self.get_path(last_node)
 
 		return path, u_optimal, tau_optimal
 
 	def get_sample(self):
-		sample = Node([random.uniform(self.space[0]+.3, self.space[1]-.3),
-					   random.uniform(self.space[2]+.3, self.space[3]-.3),
-					   random.uniform(-math.pi, math.pi)])
+		sample = Node(self.sampler.sample())
 		return sample
 
 	def steer(self, source_node, dest_node):
 		# take source_node and steer towards destination node
-		dtheta = random.uniform(-self.max_curvature, self.max_curvature)
+		dtheta = self.rng.uniform(-self.max_curvature, self.max_curvature)
 		dx = np.cos(source_node.pose[2] + dtheta / 2)
 		dy = np.sin(source_node.pose[2] + dtheta / 2)
 		vec = np.array([dx, dy, dtheta])
 		new_node = Node(source_node.pose + self.growth * vec)
 
 		if new_node.pose[0] < self.space[0]:
-			new_node.pose[0] = self.space[0] + random.uniform(0, 2)
+			new_node.pose[0] = self.space[0] + self.rng.uniform(0, 2)
 		if new_node.pose[0] > self.space[1]:
-			new_node.pose[0] = self.space[1] - random.uniform(0, 2)
+			new_node.pose[0] = self.space[1] - self.rng.uniform(0, 2)
 		if new_node.pose[1] < self.space[2]:
-			new_node.pose[1] = self.space[2] + random.uniform(0, 2)
+			new_node.pose[1] = self.space[2] + self.rng.uniform(0, 2)
 		if new_node.pose[1] > self.space[3]:
-			new_node.pose[1] = self.space[3] - random.uniform(0, 2)
+			new_node.pose[1] = self.space[3] - self.rng.uniform(0, 2)
 		return new_node
 
 	def set_parent(self, new_node, nearest_node):
 		# connects new_node to nearest node and tracks cost
 		px, py, pangle, mode, plength, u = plan.dubins_path_planning(nearest_node.pose[0], nearest_node.pose[1], nearest_node.pose[2], new_node.pose[0], new_node.pose[1], new_node.pose[2], self.max_curvature)
+		if not self.check_collision_path(px, py):
+			return  # new_node keeps no parent
 		new_node.parent = nearest_node
 		new_node.path_x = px
 		new_node.path_y = py
@@ -88,57 +106,24 @@ class RRT:
 		new_node.u = u
 		new_node.dist = new_node.parent.dist + plength
 
-	def get_best_last_node(self):
-		cost_list = []
-		for node in self.node_list:
-			if node.dist >= self.min_dist:
-				cost_list.append(node.total_var/node.dist)
-			else:
-				cost_list.append(float("inf"))
-		best_node = self.node_list[cost_list.index(min(cost_list))]
-		return best_node
-
-	def get_path(self, last_node):
-		path = [last_node]
-		u_optimal = np.array((last_node.u))
-		tau_optimal = np.vstack((last_node.path_x, last_node.path_y, last_node.path_angle))
-		while True:
-			last_node = last_node.parent
-			if last_node is None:
-				break
-			u_optimal = np.concatenate((u_optimal, last_node.u), axis=0)
-			tau_add = np.vstack((last_node.path_x, last_node.path_y, last_node.path_angle))
-			tau_optimal = np.concatenate((tau_add, tau_optimal), axis=1)
-			path.append(last_node)
-		return path, u_optimal, tau_optimal
-
 	def check_collision_path(self, px, py):
 		# check for collision on path
-		for kk in range(len(px)):
-			if not self.check_collision(px[kk], py[kk]):
-				return False
-		return True
+		return self.obstacle_map.path_free(px, py)
 
 	def check_collision(self, x_node, y_node):
-		if self.obstacles is None:
-			return True  # safe
-		for (x, y, side) in self.obstacles:
-			if (x_node > x - .8 * side / 2) and (x_node < x + .8 * side / 2) and (y_node > y - side / 2) and (y_node < y + side / 2):
-				return False  # collision
-
-		return True  # safe
+		return self.obstacle_map.path_free([x_node], [y_node])
 
 	def nearest_node(self, sample):
 		dlist = [dist(node, sample) for node in self.node_list]
 		min_node = self.node_list[dlist.index(min(dlist))]
 		return min_node
 
+	@instrumentation.timed('path_var')
 	def path_var(self, px, py, pangle):       # returns negative total variance along the path
 		control_cost = 0  # NOT USED!!!!!!
 		path_var = 0
 
 		(lxf, lyf, dvx, dvy, lx, ly, n, p, de, l_TH, p_THETA, xg_min, xg_max, yg_min, yg_max) = self.gmrf_params
-		p1 = time.time()
 		A = np.zeros(shape=(n + p, 1)).astype(float)
 		# iterate over path and calculate cost
 		for kk in range(len(px)):  # Iterate over length of trajectory
@@ -149,7 +134,6 @@ class RRT:
 				A += interpolation_matrix(np.array([px[kk], py[kk], pangle[kk]]), n, p, lx, xg_min, yg_min, de)
 				control_cost += 0
 		path_var -= np.dot(A.T, self.var_x)[0][0]
-		self.method_time += (time.time() - p1)
 		return path_var    # negative path var
 
 	def draw_graph(self, plot=None):
@@ -159,9 +143,7 @@ class RRT:
 				if node.parent is not None:
 					plot.plot(node.path_x, node.path_y, color='green')
 
-			if self.obstacles is not None:
-				for (x, y, side) in self.obstacles:
-					plot.plot(x, y, "sk", ms=8 * side)
+			self.obstacle_map.draw(plot)
 
 			plot.quiver(self.start.pose[0], self.start.pose[1], math.cos(self.start.pose[2]), math.sin(self.start.pose[2]), color="b")
 			plot.axis(self.space)
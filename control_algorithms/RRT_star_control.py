@@ -1,18 +1,22 @@
 import math
 import random
-import time
 
 import numpy as np
 
 import Config
+import instrumentation
 from control_algorithms.base import dubins_path_planner as plan
-from control_algorithms.base.Node import Node
+from control_algorithms.base import obstacles
+from control_algorithms.base import samplers
+from control_algorithms.base.budget import make_budget
+from control_algorithms.base.Tree import Tree
+from control_algorithms.base.TreePlanner import TreePlanner
 
 
-class RRT_star:
+class RRT_star(TreePlanner):
 	# Basic RRT* algorithm using average variance per unit path length as cost function
 
-	def __init__(self, start, RRT_params, gmrf_params, var_x, max_dist, plot):
+	def __init__(self, start, RRT_params, gmrf_params, var_x, max_dist, plot, budget=None, seed=None):
 		"""
 		:param start: initial location of agent
 		:param RRT_params: specified in config file
@@ -20,193 +24,146 @@ class RRT_star:
 		:param var_x: variance of field as a 1D vector of variance of each node in GMRF
 		:param max_dist: maximum distance that the algorithm solution will return
 		:param plot: only used for plotting in the middle of running algorithm good for debugging
+		:param budget: when to stop planning, see control_algorithms/base/budget.py. Defaults to the one chosen in the config file
+		:param seed: seed of the samples and the random steering, defaults to Config.planner_seed
 		"""
-		self.start = Node(start)
-		self.node_list = [self.start]
 		self.max_dist = max(max_dist, 10)   # can't just take the max_dist in case at the end of the simulation this will allow no possible paths
 		self.var_x = var_x
 		self.gmrf_params = gmrf_params
 		(self.space, self.max_time, self.max_curvature, self.growth, self.min_dist, self.obstacles) = RRT_params
-		self.local_planner_time = 0.0
-		self.method_time = 0.0
+		# nodes are integer indices into the tree, the start node is 0. Edges are indexed by the GMRF cells they
+		# cross when the tree is kept between control steps, see replan
+		self.tree = Tree(start, edge_footprint=self.path_footprint if Config.persistent_planner else None, min_dist=self.min_dist)
 		self.plot = plot
-
+		self.obstacle_map = obstacles.get_map(self.obstacles, self.space, Config.obstacle_resolution, Config.obstacle_clearance)
+		self.sampler = samplers.make_sampler(Config.sampler, self.space, gmrf_params, var_x, Config.planner_seed if seed is None else seed, Config.sampler_batch)
+		self.rng = random.Random(self.sampler.rng.randint(0, 2 ** 31 - 1))   # random steering
+		self.budget = budget if budget is not None else make_budget(Config.planner_budget, self.max_time, Config.max_iterations, Config.max_nodes)
+		self.last_path = None   # node path returned by the last call, used to re-root the tree in replan
+		# trajectory index and path length from the start at which every edge of the returned path starts, one entry per
+		# edge beginning with 0. They belong to the result of control_algorithm and are read from the planner after it
+		self.edge_offsets = None
+		self.arc_offsets = None
+
+	@instrumentation.timed('control_algorithm')
 	def control_algorithm(self):
-		start_time = time.time()
+		self.budget.start()
+		self.best_cost, self.best_time = float("inf"), self.budget.start_time
 		while True:
-			current_time = time.time() - start_time
-			if current_time > self.max_time:
+			if self.budget.exhausted(len(self.tree)) or self.stalled(self.tree.best_cost()):
 				break
 
 			# start RRT*
 			sample = self.get_sample()
 			nearest_node = self.nearest_node(sample)
-			new_node = self.steer(nearest_node, sample)
-			if self.check_collision(new_node.pose[0], new_node.pose[1]):
-				near_nodes = self.get_near_nodes(new_node)
-				self.set_parent(new_node, near_nodes)
-				if new_node.parent is None:    # no possible path from any of the near nodes
+			new_pose = self.steer(nearest_node, sample)
+			if self.check_collision(new_pose[0], new_pose[1]):
+				near_nodes = self.get_near_nodes(new_pose)
+				new_node = self.set_parent(new_pose, near_nodes)
+				if new_node is None:    # no possible path from any of the near nodes
 					continue
-				self.node_list.append(new_node)
 				self.rewire(new_node, near_nodes)
 			# end RRT*
 
 		# generate path
+		instrumentation.count('nodes', len(self.tree))
 		last_node = self.get_best_last_node()
 		path, u_optimal, tau_optimal = self.get_path(last_node)
 
 		return path, u_optimal, tau_optimal
 
 	def get_sample(self):
-		sample = Node([random.uniform(self.space[0], self.space[1]),
-					  random.uniform(self.space[2], self.space[3]),
-					  random.uniform(-math.pi, math.pi)])
-		return sample
-
-	def steer(self, source_node, dest_node):
-		# take source_node and steer towards destination node
-		dtheta = random.uniform(-self.max_curvature/2, self.max_curvature/2)
-		dx = np.cos(source_node.pose[2] + dtheta/2)
-		dy = np.sin(source_node.pose[2] + dtheta/2)
+		return self.sampler.sample()
+
+	def steer(self, source_node, dest_pose):
+		# take source_node and steer towards destination pose
+		source_pose = self.tree.pose[source_node]
+		dtheta = self.rng.uniform(-self.max_curvature/2, self.max_curvature/2)
+		dx = np.cos(source_pose[2] + dtheta/2)
+		dy = np.sin(source_pose[2] + dtheta/2)
 		vec = np.array([dx, dy, dtheta])
-		new_node = Node(source_node.pose + self.growth * vec)
-
-		if new_node.pose[0] < self.space[0]:
-			new_node.pose[0] = self.space[0] - random.uniform(0, 1)
-		if new_node.pose[0] > self.space[1]:
-			new_node.pose[0] = self.space[1] - random.uniform(0, 1)
-		if new_node.pose[1] < self.space[2]:
-			new_node.pose[1] = self.space[2] - random.uniform(0, 1)
-		if new_node.pose[1] > self.space[3]:
-			new_node.pose[1] = self.space[3] - random.uniform(0, 1)
-		return new_node
-
-	def set_parent(self, new_node, near_nodes):
-		# connects new_node along a minimum cost path
-		if not near_nodes:
-			near_nodes.append(self.nearest_node(new_node))
-		cost_list = []
-		for near_node in near_nodes:
+		new_pose = source_pose + self.growth * vec
+
+		if new_pose[0] < self.space[0]:
+			new_pose[0] = self.space[0] - self.rng.uniform(0, 1)
+		if new_pose[0] > self.space[1]:
+			new_pose[0] = self.space[1] - self.rng.uniform(0, 1)
+		if new_pose[1] < self.space[2]:
+			new_pose[1] = self.space[2] - self.rng.uniform(0, 1)
+		if new_pose[1] > self.space[3]:
+			new_pose[1] = self.space[3] - self.rng.uniform(0, 1)
+		return new_pose
+
+	def set_parent(self, new_pose, near_nodes):
+		# connects new_pose along a minimum cost path and adds it to the tree, returns the new node or None
+		tree = self.tree
+		if len(near_nodes) == 0:
+			near_nodes = [self.nearest_node(new_pose)]
+		mincost = float("inf")
+		best_edge = None
+		for near_node, bound in self.candidates(near_nodes, new_pose):
+			if bound >= mincost:
+				break   # candidates are sorted by their bound, none of the remaining ones can win
+			near_pose = tree.pose[near_node]
 			# CALL TO LOCAL PATH PLANNER
-			px, py, pangle, mode, plength, u = plan.dubins_path_planning(near_node.pose[0], near_node.pose[1], near_node.pose[2], new_node.pose[0], new_node.pose[1], new_node.pose[2], self.max_curvature)
+			px, py, pangle, mode, plength, u = plan.dubins_path_planning(near_pose[0], near_pose[1], near_pose[2], new_pose[0], new_pose[1], new_pose[2], self.max_curvature)
 			path_var = self.path_var(px, py, pangle)
-			if self.check_collision_path(px, py) and self.max_dist >= plength + near_node.dist:
-				cost_list.append((near_node.total_var + path_var) / (near_node.dist + plength))
-			else:
-				cost_list.append(float("inf"))
-
-		mincost = min(cost_list)
-		min_node = near_nodes[cost_list.index(mincost)]
-		if mincost == float("inf"):   # No parent could be found
-			return
-		new_node.parent = min_node
-		# CALL TO LOCAL PATH PLANNER
-		px, py, pangle, mode, plength, u = plan.dubins_path_planning(min_node.pose[0], min_node.pose[1], min_node.pose[2], new_node.pose[0], new_node.pose[1], new_node.pose[2], self.max_curvature)
-		new_node.path_x = px
-		new_node.path_y = py
-		new_node.path_angle = pangle
-		new_node.total_var = new_node.parent.total_var + self.path_var(px, py, pangle)
-		new_node.u = u
-		new_node.dist = new_node.parent.dist + plength
-
-	def get_best_last_node(self):
-		cost_list = []
-		for node in self.node_list:
-			if node.dist >= self.min_dist:
-				cost_list.append(node.total_var/node.dist)
-			else:
-				cost_list.append(float("inf"))
-		# print("min cost list", min(cost_list))
-		best_node = self.node_list[cost_list.index(min(cost_list))]
-		return best_node
-
-	def get_path(self, last_node):
-		path = [last_node]
-		u_optimal = np.array((last_node.u))
-		tau_optimal = np.vstack((last_node.path_x, last_node.path_y, last_node.path_angle))
-		while True:
-			last_node = last_node.parent
-			if last_node is None:
-				break
-			u_optimal = np.concatenate((u_optimal, last_node.u), axis=0)
-			tau_add = np.vstack((last_node.path_x, last_node.path_y, last_node.path_angle))
-			tau_optimal = np.concatenate((tau_add, tau_optimal), axis=1)
-			path.append(last_node)
-		return path, u_optimal, tau_optimal
-
-	def get_near_nodes(self, new_node):
+			if self.check_collision_path(px, py) and self.max_dist >= plength + tree.dist[near_node]:
+				cost = (tree.total_var[near_node] + path_var) / (tree.dist[near_node] + plength)
+				if cost < mincost:
+					mincost = cost
+					best_edge = (near_node, px, py, pangle, u, plength, path_var)
+
+		if best_edge is None:   # No parent could be found
+			return None
+		(min_node, px, py, pangle, u, plength, path_var) = best_edge
+		return tree.add_node(new_pose, min_node, px, py, pangle, u, plength, path_var)
+
+	def get_near_nodes(self, new_pose):
 		# gamma_star = 2(1+1/d) ** (1/d) volume(free)/volume(total) ** 1/d. We need a gamma > gamma_star for asymptotical completeness. See Kalman 2011. gamma = 1 satisfies
 		d = 2  # dimension of the self.space
-		nnode = len(self.node_list)
+		nnode = len(self.tree)
 		r = min(20.0 * ((math.log(nnode) / nnode)) ** (1 / d), self.growth * 5.0)
-		dlist = [dist(node, new_node) for node in self.node_list]
-		near_nodes = [self.node_list[dlist.index(d)] for d in dlist if d <= r]
+		near_nodes = np.nonzero(self.tree.distances(new_pose) <= r)[0]
 		return near_nodes
 
 	def rewire(self, new_node, near_nodes):
+		tree = self.tree
+		new_pose = tree.pose[new_node]
 		for near_node in near_nodes:
-			p1 = time.time()
-			px, py, pangle, mode, plength, u = plan.dubins_path_planning(new_node.pose[0], new_node.pose[1], new_node.pose[2], near_node.pose[0], near_node.pose[1], near_node.pose[2], self.max_curvature)
-			p2 = time.time()
-			self.local_planner_time += (p2 - p1)
-			avg_var_per_length = (new_node.total_var + self.path_var(px, py, pangle)) / (new_node.dist + plength)
-			if near_node.dist != 0:
-				if near_node.total_var / near_node.dist > avg_var_per_length and self.max_dist >= new_node.dist + plength \
+			near_pose = tree.pose[near_node]
+			if Config.lazy_edges:
+				# skip the full edge if even its lower bound can not improve near_node
+				self.refresh(near_node)
+				plength, var_bound = self.edge_bound(new_pose, near_pose)
+				if tree.dist[near_node] == 0 or self.max_dist < tree.dist[new_node] + plength or \
+						tree.cost[near_node] <= (tree.total_var[new_node] + var_bound) / (tree.dist[new_node] + plength):
+					continue
+			px, py, pangle, mode, plength, u = plan.dubins_path_planning(new_pose[0], new_pose[1], new_pose[2], near_pose[0], near_pose[1], near_pose[2], self.max_curvature)
+			path_var = self.path_var(px, py, pangle)
+			self.refresh(near_node)
+			avg_var_per_length = (tree.total_var[new_node] + path_var) / (tree.dist[new_node] + plength)
+			if tree.dist[near_node] != 0:
+				if tree.cost[near_node] > avg_var_per_length and self.max_dist >= tree.dist[new_node] + plength \
 						and self.check_loop(near_node, new_node):
 					if self.check_collision_path(px, py):
-						near_node.parent = new_node
-						near_node.path_x = px
-						near_node.path_y = py
-						near_node.path_angle = pangle
-						near_node.u = u
-						near_node.total_var = near_node.parent.total_var + self.path_var(px, py, pangle)
-						near_node.dist = near_node.parent.dist + plength
+						tree.set_edge(near_node, new_node, px, py, pangle, u, plength, path_var)
+						instrumentation.count('rewires')
 						self.propagate_update_to_children(near_node)
 
-	def propagate_update_to_children(self, parent_node):
-		for node in self.node_list:
-			if node.parent is not None:
-				if node.parent == parent_node:
-					node.total_var = parent_node.total_var + node.path_var
-					node.dist = parent_node.dist + node.path_dist
-					self.propagate_update_to_children(node)
-
-	def check_loop(self, near_node, new_node):
-		# checks to make sure that changing parents to temp_node does not create a loop
-		temp = new_node.parent
-		while temp is not None:
-			if temp == near_node:
-				return False       # creates a loop
-			temp = temp.parent
-		return True                # does not create a loop
-
 	def check_collision_path(self, px, py):
 		# check for collision on path
-		for kk in range(len(px)):
-			if not self.check_collision(px[kk], py[kk]):
-				return False
-		return True
+		return self.obstacle_map.path_free(px, py)
 
 	def check_collision(self, x_node, y_node):
-		if self.obstacles is None:
-			return True   # safe
-		for (x, y, side) in self.obstacles:
-			if (x_node > x - .8 * side / 2) and (x_node < x + .8 * side / 2) and (y_node > y - side / 2) and (y_node < y + side / 2):
-				return False  # collision
-
-		return True  # safe
-
-	def nearest_node(self, sample):
-		dlist = [dist(node, sample) for node in self.node_list]
-		min_node = self.node_list[dlist.index(min(dlist))]
-		return min_node
+		return self.obstacle_map.path_free([x_node], [y_node])
 
+	@instrumentation.timed('path_var')
 	def path_var(self, px, py, pangle):       # returns negative total variance along the path
 		control_cost = 0  # NOT USED!!!!!!
 		path_var = 0
 
 		(lxf, lyf, dvx, dvy, lx, ly, n, p, de, l_TH, p_THETA, xg_min, xg_max, yg_min, yg_max) = self.gmrf_params
-		p1 = time.time()
 		A = np.zeros(shape=(n + p, 1)).astype(float)
 		# iterate over path and calculate cost
 		for kk in range(len(px)):  # Iterate over length of trajectory
@@ -217,32 +174,25 @@ class RRT_star:
 				A += interpolation_matrix(np.array([px[kk], py[kk], pangle[kk]]), n, p, lx, xg_min, yg_min, de)
 				control_cost += 0
 		path_var -= np.dot(A.T, self.var_x)[0][0]
-		self.method_time += (time.time() - p1)
 		return path_var    # negative path var
 
 	def draw_graph(self, plot=None):
 		if plot is not None:  # use plot of calling
-			for node in self.node_list:
-				plot.quiver(node.pose[0], node.pose[1], math.cos(node.pose[2]), math.sin(node.pose[2]), color='b', angles='xy', scale_units='xy', scale=.8, width=.015)
-				if node.parent is not None:
-					plot.plot(node.path_x, node.path_y, color='green')
+			tree = self.tree
+			poses = tree.pose[:len(tree)]
+			plot.quiver(poses[:, 0], poses[:, 1], np.cos(poses[:, 2]), np.sin(poses[:, 2]), color='b', angles='xy', scale_units='xy', scale=.8, width=.015)
+			for node in range(1, len(tree)):
+				edge = tree.edge(node)
+				plot.plot(edge[:, 0], edge[:, 1], color='green')
 
-			if self.obstacles is not None:
-				for (x, y, side) in self.obstacles:
-					plot.plot(x, y, "sk", ms=8 * side)
+			self.obstacle_map.draw(plot)
 
-			plot.quiver(self.start.pose[0], self.start.pose[1], math.cos(self.start.pose[2]), math.sin(self.start.pose[2]), color="b")
+			plot.quiver(poses[0, 0], poses[0, 1], math.cos(poses[0, 2]), math.sin(poses[0, 2]), color="b")
 			plot.axis(self.space)
 			plot.grid(True)
 			plot.title("RRT* (avg variance per unit path length as cost function)")
 			plot.pause(.1)  # need for animation
 
-def dist(node1, node2):
-	# returns distance between two nodes
-	return math.sqrt((node2.pose[0] - node1.pose[0]) ** 2 +
-					 (node2.pose[1] - node1.pose[1]) ** 2 +
-					 3 * min((node1.pose[2] - node2.pose[2]) ** 2, (node1.pose[2] - node2.pose[2] + 2*math.pi) ** 2, (node1.pose[2] - node2.pose[2] - 2*math.pi) ** 2))
-
 # Calculate new observation vector through shape function interpolation
 def interpolation_matrix(x_local2, n, p, lx, xg_min, yg_min, de):
 	"""INTERPOLATION MATRIX:
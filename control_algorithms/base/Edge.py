@@ -0,0 +1,21 @@
+class Edge(object):
+	# Candidate edge from a tree node to a destination pose. It only carries the local path and its length and
+	# variance (plus the totals they lead to), so candidates can be scored without copying any node. The planner
+	# turns it into a real node only once the edge is accepted.
+	__slots__ = ('source', 'pose', 'path_x', 'path_y', 'path_angle', 'u', 'path_dist', 'path_var', 'dist', 'total_var', 'cost')
+
+	def __init__(self, source, pose, path_x, path_y, path_angle, u, path_dist, path_var, dist, total_var):
+		self.source = source            # node the edge starts at
+		self.pose = pose                # pose the edge ends at
+		self.path_x = path_x
+		self.path_y = path_y
+		self.path_angle = path_angle
+		self.u = u
+		self.path_dist = path_dist      # length of the edge
+		self.path_var = path_var        # (negative) variance along the edge
+		self.dist = dist                # path length from the root when reached through this edge
+		self.total_var = total_var
+		self.cost = total_var / dist
+
+	def __repr__(self):
+		return 'Edge to Pos({}, {}, {})'.format(self.pose[0], self.pose[1], self.pose[2])
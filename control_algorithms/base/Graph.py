@@ -1,64 +0,0 @@
-from collections import defaultdict
-import copy
-
-class Digraph(object):
-	def __init__(self, nodes=[]):
-		self.nodes = set()
-		self.neighbours = defaultdict(set)
-		self.dist = {}
-		self.path_var = {}
-
-	def addNode(self, *nodes):
-		[self.nodes.add(n) for n in nodes]
-
-	def addEdge(self, frm, to, d=1e309, path_var=1e-100):
-		self.addNode(frm, to)
-		self.neighbours[frm].add(to)
-		self.dist[frm, to] = d
-		self.path_var[frm, to] = path_var
-
-	def dijkstra(self, start, maxD=1e309):
-		"""Returns a map of nodes to distance from start and a map of nodes to
-		the neighbouring node that is closest to start."""
-		# total distance from origin
-		tdist = defaultdict(lambda: 1e309)
-		tdist[start] = 0
-		# neighbour that is nearest to the origin
-		preceding_node = {}
-		unvisited = copy.copy(self.nodes)
-
-		while unvisited:
-			current = unvisited.intersection(tdist.keys())
-			if not current: break
-			min_node = min(current, key=tdist.get)
-			unvisited.remove(min_node)
-
-			for neighbour in self.neighbours[min_node]:
-				d = tdist[min_node] + self.dist[min_node, neighbour]
-				if tdist[neighbour] > d and maxD >= d:
-					tdist[neighbour] = d
-					preceding_node[neighbour] = min_node
-
-		return tdist, preceding_node
-
-
-def min_path(self, start, end, maxD=1e309):
-	"""Returns the minimum distance and path from start to end."""
-	tdist, preceding_node = self.dijkstra(start, maxD)
-	dist = tdist[end]
-	backpath = [end]
-	try:
-		while end != start:
-			end = preceding_node[end]
-			backpath.append(end)
-		path = list(reversed(backpath))
-	except KeyError:
-		path = None
-
-	return dist, path
-
-
-def dist_to(self, *args): return self.min_path(*args)[0]
-
-
-def path_to(self, *args): return self.min_path(*args)[1]
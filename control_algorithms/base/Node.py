@@ -9,6 +9,7 @@ class Node(object):
 		self.path_dist = 0.0
 		self.dist = 0.0
 		self.pose = np.array(pose)           # x-coordinate, y-coordinate, angle-coordinate (in radians) constitutes a pose
+		self.index = 0                       # index in node_list and the edge buffers of the planner, see NodePlanner
 		self.u = []                # list of controls required to get from parent node to this node
 
 		# used for implementations currently as tracking path from parent to this node
@@ -26,4 +27,5 @@ class Node(object):
 		return self.pose[i]
 
 	def __repr__(self):
-		return 'Node Pos({}, {}, {})'.format(self.pose[0], self.pose[1], self.pose[2])
\ No newline at end of file
+		return 'Node Pos({}, {}, {})'.format(self.pose[0], self.pose[1], self.pose[2])
+
@@ -0,0 +1,42 @@
+from control_algorithms.base.TreePlanner import TreePlanner
+
+
+class NodePlanner(object):
+	# Best node tracking, stopping and path extraction shared by RRT and PRM, whose nodes are Node objects linked to
+	# their parent. The edges of the nodes are also kept in the flat buffers of a Tree, whose node indices follow
+	# node_list, so the returned path is copied from them once like in the tree planners. A subclass sets self.start,
+	# self.node_list ([self.start]), self.edge_buffers (Tree(self.start.pose)), self.best_node (self.start) and
+	# self.min_dist
+
+	def add_node(self, node):
+		# appends a node whose parent is set to node_list and its edge to the edge buffers
+		parent = node.parent
+		node.index = self.edge_buffers.add_node(node.pose, parent.index, node.path_x, node.path_y, node.path_angle, node.u,
+												node.dist - parent.dist, node.total_var - parent.total_var)
+		self.node_list.append(node)
+		self.track_best(node)
+
+	def track_best(self, node):
+		# called for every node added to node_list, keeps the node with the lowest cost at least min_dist from the start
+		if node.dist >= self.min_dist and node.total_var / node.dist < self.best_node_cost():
+			self.best_node = node
+
+	def best_node_cost(self):
+		# average variance per unit path length of best_node, inf while no node is min_dist from the start
+		node = self.best_node
+		return node.total_var / node.dist if node is not self.start else float("inf")
+
+	def get_best_last_node(self):
+		return self.best_node
+
+	def get_path(self, last_node):
+		# collects the nodes from the root to last_node first and then copies their edges once
+		buffers = self.edge_buffers
+		nodes = buffers.path_to(last_node.index)
+		tau_optimal, u_optimal, self.edge_offsets = buffers.gather(nodes)
+		self.arc_offsets = buffers.dist[buffers.parent[nodes]]
+		path = [self.node_list[node] for node in nodes[::-1]] + [self.start]    # leaf first, the root last
+		return path, u_optimal, tau_optimal
+
+	# the same stopping rule as the tree planners, control_algorithm sets best_cost and best_time before its loop
+	stalled = TreePlanner.stalled
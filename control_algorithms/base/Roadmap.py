@@ -0,0 +1,155 @@
+import os
+
+import numpy as np
+import scipy.sparse as sp
+
+from control_algorithms.base import dubins_path_planner as plan
+from control_algorithms.base import footprint
+from control_algorithms.base import graph_search
+from control_algorithms.base.Tree import pose_distances
+
+
+class Roadmap(object):
+	# Roadmap of Dubins edges between collision free poses. It only depends on the field geometry, so it is built once,
+	# kept on disk and reused by every control step. Edge polylines, controls and the GMRF footprints of the edges are
+	# kept in flat arrays addressed by offset and length like in Tree, only the edge variances change with var_x.
+	edge_arrays = ('frm', 'to', 'length', 'path_start', 'path_len', 'u_start', 'u_len', 'n_outside')
+	cell_arrays = ('cells', 'cell_weights', 'cell_edge')
+
+	def __init__(self, signature):
+		"""
+		:param signature: 1D array describing the field geometry and roadmap settings, a saved roadmap is only reused
+		if its signature matches
+		"""
+		self.signature = np.asarray(signature, dtype=float)
+		self.pose = np.zeros(shape=(0, 3))
+		self.frm = np.zeros(0, dtype=int)           # source vertex of every edge
+		self.to = np.zeros(0, dtype=int)            # target vertex of every edge
+		self.length = np.zeros(0)                   # Dubins path length of every edge
+		self.path = np.zeros(shape=(0, 3))          # flat edge polylines (x, y, angle)
+		self.path_start = np.zeros(0, dtype=int)
+		self.path_len = np.zeros(0, dtype=int)
+		self.u = np.zeros(0)                        # flat edge controls
+		self.u_start = np.zeros(0, dtype=int)
+		self.u_len = np.zeros(0, dtype=int)
+		self.n_outside = np.zeros(0, dtype=int)     # polyline points outside the field (border penalty)
+		self.cells = np.zeros(0, dtype=int)         # GMRF vertices of all edge footprints
+		self.cell_weights = np.zeros(0)             # shape function weights of those vertices
+		self.cell_edge = np.zeros(0, dtype=int)     # edge every footprint entry belongs to
+		self.indptr = np.zeros(1, dtype=int)        # CSR offsets of the edges leaving every vertex, edges are sorted by frm
+		self.W = None                               # sparse (edges x GMRF vertices) footprint matrix, see footprint_matrix
+
+	def __len__(self):
+		return len(self.pose)
+
+	@classmethod
+	def build(cls, signature, sampler, n_vertices, radius, max_curvature, gmrf_params, space, collision_free):
+		"""
+		:param sampler: sampler the vertex poses are drawn from
+		:param n_vertices: number of roadmap vertices
+		:param radius: vertices closer than this in the pose metric are connected in both directions
+		:param max_curvature: curvature of the Dubins paths
+		:param gmrf_params: GMRF.params, used to compute the edge footprints
+		:param space: field dimensions [x_min, x_max, y_min, y_max]
+		:param collision_free: function (path_x, path_y) -> True if the path does not hit an obstacle
+		"""
+		roadmap = cls(signature)
+		poses = []
+		while len(poses) < n_vertices:
+			pose = sampler.sample()
+			if collision_free([pose[0]], [pose[1]]):
+				poses.append(pose)
+		roadmap.pose = np.array(poses)
+		edges = []
+		for i in range(n_vertices):
+			for j in np.nonzero(pose_distances(roadmap.pose, roadmap.pose[i]) <= radius)[0]:
+				if i == j:
+					continue
+				px, py, pangle, mode, plength, u = plan.dubins_path_planning(roadmap.pose[i, 0], roadmap.pose[i, 1], roadmap.pose[i, 2], roadmap.pose[j, 0], roadmap.pose[j, 1], roadmap.pose[j, 2], max_curvature)
+				if plength <= 2 * radius and collision_free(px, py):
+					edges.append((i, j, px, py, pangle, u, plength))
+		roadmap.set_edges(edges, gmrf_params, space)
+		return roadmap
+
+	def set_edges(self, edges, gmrf_params, space):
+		# edges: list of (frm, to, px, py, pangle, u, plength), sorted by frm
+		self.frm = np.array([edge[0] for edge in edges], dtype=int)
+		self.to = np.array([edge[1] for edge in edges], dtype=int)
+		self.length = np.array([edge[6] for edge in edges], dtype=float)
+		self.path_len = np.array([len(edge[2]) for edge in edges], dtype=int)
+		self.path_start = np.cumsum(self.path_len) - self.path_len
+		self.path = np.concatenate([np.column_stack(edge[2:5]) for edge in edges]) if edges else np.zeros(shape=(0, 3))
+		self.u_len = np.array([len(edge[5]) for edge in edges], dtype=int)
+		self.u_start = np.cumsum(self.u_len) - self.u_len
+		self.u = np.concatenate([np.asarray(edge[5], dtype=float) for edge in edges]) if edges else np.zeros(0)
+		cells, weights, n_outside = [], [], []
+		for edge in edges:
+			edge_cells, edge_weights, outside = footprint.path_footprint(edge[2], edge[3], gmrf_params, space)
+			cells.append(edge_cells)
+			weights.append(edge_weights)
+			n_outside.append(outside)
+		self.n_outside = np.array(n_outside, dtype=int)
+		self.cells = np.concatenate(cells).astype(int) if edges else np.zeros(0, dtype=int)
+		self.cell_weights = np.concatenate(weights) if edges else np.zeros(0)
+		self.cell_edge = np.repeat(np.arange(len(edges)), [len(edge_cells) for edge_cells in cells]).astype(int)
+		self.indptr = np.zeros(len(self.pose) + 1, dtype=int)
+		np.cumsum(np.bincount(self.frm, minlength=len(self.pose)), out=self.indptr[1:])
+
+	def edge(self, e):
+		# view of the (len, 3) polyline of edge e
+		return self.path[self.path_start[e]:self.path_start[e] + self.path_len[e]]
+
+	def edge_u(self, e):
+		return self.u[self.u_start[e]:self.u_start[e] + self.u_len[e]]
+
+	def footprint_matrix(self, n_columns):
+		# sparse (edges x n_columns) matrix W of the edge footprints, W @ var_x is the variance seen along every edge.
+		# Duplicate vertices of an edge are summed
+		if self.W is None or self.W.shape[1] != n_columns:
+			self.W = sp.csr_matrix((self.cell_weights, (self.cell_edge, self.cells)), shape=(len(self.frm), n_columns))
+		return self.W
+
+	def edge_var(self, var_x, border_penalty):
+		# (negative) path variance of every edge for the given variance field, same value as the planners' path_var
+		field = np.ravel(var_x)
+		return border_penalty * self.n_outside - self.footprint_matrix(len(field)).dot(field)
+
+	def graph(self, edge_var, to=(), length=(), var=()):
+		# CSRGraph of the roadmap with the given edge variances and extra edges from the additional vertex len(self) to
+		# the vertices to, which is used for the AUV pose
+		n = len(self)
+		indptr = np.append(self.indptr, self.indptr[-1] + len(to))
+		return graph_search.CSRGraph(n + 1, indptr, np.concatenate((self.to, np.asarray(to, dtype=int))),
+									 np.concatenate((self.length, np.asarray(length, dtype=float))),
+									 np.concatenate((edge_var, np.asarray(var, dtype=float))))
+
+	def save(self, filename):
+		# written to a temporary file first, so another process never loads a partly written roadmap
+		filename = npz_filename(filename)
+		directory = os.path.dirname(filename)
+		if directory:
+			os.makedirs(directory, exist_ok=True)
+		temporary = filename[:-len('.npz')] + '.{0}.tmp.npz'.format(os.getpid())
+		arrays = {name: getattr(self, name) for name in self.edge_arrays + self.cell_arrays}
+		np.savez_compressed(temporary, signature=self.signature, pose=self.pose, path=self.path, u=self.u, indptr=self.indptr, **arrays)
+		os.replace(temporary, filename)
+
+	@classmethod
+	def load(cls, filename, signature):
+		# returns the roadmap saved in filename or None if there is none or it was built for a different signature
+		try:
+			data = np.load(npz_filename(filename))
+		except (IOError, OSError, ValueError):
+			return None
+		with data:
+			if not np.array_equal(data['signature'], np.asarray(signature, dtype=float)):
+				return None
+			roadmap = cls(signature)
+			for name in ('pose', 'path', 'u', 'indptr') + cls.edge_arrays + cls.cell_arrays:
+				setattr(roadmap, name, data[name])
+		return roadmap
+
+
+def npz_filename(filename):
+	# np.savez_compressed appends .npz to file names without it, save and load both use the name with the suffix
+	return filename if filename.endswith('.npz') else filename + '.npz'
@@ -0,0 +1,304 @@
+import heapq
+import math
+from collections import defaultdict
+
+import numpy as np
+import scipy.sparse as sp
+
+
+class Tree(object):
+	# Struct-of-arrays tree used by RRT* and PRM*. A node is identified by its integer index into the arrays
+	# (the root is always 0, a parent of -1 means no parent). The edge polyline (x, y, angle) and the controls
+	# from a node's parent to the node are kept in two shared flat buffers and addressed by offset and length.
+	# If edge_footprint is given, the GMRF footprint of every edge (vertices and shape function weights along the
+	# polyline) is kept the same way, so the path variance of all edges is one sparse mat-vec, see edge_vars.
+	node_arrays = ('pose', 'parent', 'dist', 'total_var', 'cost', 'path_dist', 'path_var', 'stale',
+				   'path_start', 'path_len', 'u_start', 'u_len', 'fp_start', 'fp_len', 'n_outside')
+
+	def __init__(self, start, capacity=256, path_capacity=8192, edge_footprint=None, min_dist=None):
+		"""
+		:param start: pose of the root node (x, y, angle)
+		:param capacity: number of nodes to preallocate, grows automatically
+		:param path_capacity: number of polyline points to preallocate, grows automatically
+		:param edge_footprint: optional function (px, py) -> (GMRF vertices, weights, points outside the field) of an
+		edge, see footprint.path_footprint. Edges are then also indexed by the GMRF vertices they cross
+		:param min_dist: if given, the nodes at least this far from the root are kept in a heap by cost, see best_node
+		"""
+		self.size = 0
+		self.pose = np.zeros(shape=(capacity, 3))
+		self.parent = -np.ones(capacity, dtype=int)
+		self.dist = np.zeros(capacity)                 # path length from the root
+		self.total_var = np.zeros(capacity)            # accumulated (negative) variance from the root
+		self.cost = np.zeros(capacity)                 # total_var / dist
+		self.path_dist = np.zeros(capacity)            # length of the edge from the parent
+		self.path_var = np.zeros(capacity)             # (negative) variance along the edge from the parent
+		self.stale = np.zeros(capacity, dtype=bool)    # path_var was computed for an older variance field
+		self.path_start = np.zeros(capacity, dtype=int)
+		self.path_len = np.zeros(capacity, dtype=int)
+		self.u_start = np.zeros(capacity, dtype=int)
+		self.u_len = np.zeros(capacity, dtype=int)
+		self.fp_start = np.zeros(capacity, dtype=int)
+		self.fp_len = np.zeros(capacity, dtype=int)
+		self.n_outside = np.zeros(capacity, dtype=int)  # edge points outside the field (border penalty)
+		self.child_sets = []                           # parent -> children index, kept in sync by set_edge
+		self.edge_footprint = edge_footprint
+		self.node_cells = []                           # node -> GMRF vertices its edge crosses (if edge_footprint is given)
+		self.cell_nodes = defaultdict(set)             # GMRF vertex -> nodes whose edge crosses it
+		self.min_dist = min_dist
+		self.best_heap = []                            # (cost, node) entries, outdated ones are dropped lazily
+
+		# flat edge buffers, rewired edges leave garbage behind that is reclaimed when a buffer runs full
+		self.path = np.zeros(shape=(path_capacity, 3))
+		self.path_used = 0
+		self.u = np.zeros(path_capacity)
+		self.u_used = 0
+		self.fp_cells = np.zeros(path_capacity * 4 if edge_footprint is not None else 0, dtype=int)
+		self.fp_weights = np.zeros(len(self.fp_cells))
+		self.fp_used = 0
+
+		self.add_node(start)
+
+	def __len__(self):
+		return self.size
+
+	def add_node(self, pose, parent=-1, px=(), py=(), pangle=(), u=(), path_dist=0.0, path_var=0.0):
+		# appends a node reached from parent along the given edge and returns its index
+		if self.size == len(self.parent):
+			self._grow_nodes(2 * self.size)
+		node = self.size
+		self.size += 1
+		self.child_sets.append(set())
+		self.node_cells.append(())
+		self.pose[node] = pose
+		self.set_edge(node, parent, px, py, pangle, u, path_dist, path_var)
+		return node
+
+	def set_edge(self, node, parent, px, py, pangle, u, path_dist, path_var):
+		# (re)connects node to parent along the given edge, the accumulated values of node are recomputed
+		# but those of its children are not, see RRT_star.propagate_update_to_children
+		if self.parent[node] >= 0:
+			self.child_sets[self.parent[node]].discard(node)
+		if parent >= 0:
+			self.child_sets[parent].add(node)
+		self.parent[node] = parent
+		self.path_start[node], self.path_len[node] = self._store_path(np.column_stack((px, py, pangle)) if len(px) else np.zeros(shape=(0, 3)))
+		self.u_start[node], self.u_len[node] = self._store_u(np.asarray(u, dtype=float))
+		self.path_dist[node] = path_dist
+		self.path_var[node] = path_var
+		self.stale[node] = False
+		if self.edge_footprint is not None:
+			cells, weights, self.n_outside[node] = self.edge_footprint(px, py) if len(px) else ((), (), 0)
+			self.fp_start[node], self.fp_len[node] = self._store_footprint(np.asarray(cells, dtype=int), np.asarray(weights, dtype=float))
+			self._index_cells(node, np.unique(cells))
+		self.update_node(node)
+
+	def update_node(self, node):
+		# recomputes dist, total_var and cost of node from its parent
+		parent = self.parent[node]
+		if parent < 0:
+			self.dist[node] = self.path_dist[node]
+			self.total_var[node] = self.path_var[node]
+		else:
+			self.dist[node] = self.dist[parent] + self.path_dist[node]
+			self.total_var[node] = self.total_var[parent] + self.path_var[node]
+		self.cost[node] = self.total_var[node] / self.dist[node] if self.dist[node] > 0 else 0.0
+		if self.min_dist is not None and self.dist[node] >= self.min_dist:
+			if len(self.best_heap) > 4 * self.size + 64:
+				self._rebuild_best()
+			heapq.heappush(self.best_heap, (self.cost[node], node))
+
+	def edge(self, node):
+		# view of the (len, 3) polyline from the parent of node to node
+		start = self.path_start[node]
+		return self.path[start:start + self.path_len[node]]
+
+	def edge_u(self, node):
+		# view of the controls along the edge from the parent of node to node
+		start = self.u_start[node]
+		return self.u[start:start + self.u_len[node]]
+
+	def best_node(self):
+		# node with the lowest cost among the nodes at least min_dist from the root whose edge is not stale, the root
+		# if there is none. Amortized O(1) as every outdated heap entry is popped only once
+		heap = self.best_heap
+		while heap:
+			(cost, node) = heap[0]
+			if node < self.size and not self.stale[node] and self.dist[node] >= self.min_dist and self.cost[node] == cost:
+				return node
+			heapq.heappop(heap)
+		return 0
+
+	def best_cost(self):
+		node = self.best_node()
+		return self.cost[node] if node > 0 else float("inf")
+
+	def children(self, node):
+		return self.child_sets[node]
+
+	def descendants(self, node):
+		# iterative pre-order traversal of the subtree below node (node excluded), parents come before their children
+		result = []
+		stack = list(self.child_sets[node])
+		while stack:
+			child = stack.pop()
+			result.append(child)
+			stack.extend(self.child_sets[child])
+		return result
+
+	def is_ancestor(self, ancestor, node):
+		# walks up from the parent of node, O(depth)
+		temp = self.parent[node]
+		while temp >= 0:
+			if temp == ancestor:
+				return True
+			temp = self.parent[temp]
+		return False
+
+	def edges_crossing(self, vertices):
+		# nodes whose edge crosses any of the given GMRF vertices, needs edge_footprint
+		nodes = set()
+		for vertex in vertices:
+			nodes.update(self.cell_nodes.get(vertex, ()))
+		return np.array(sorted(nodes), dtype=int)
+
+	def path_to(self, node):
+		# nodes from the first node below the root down to node
+		path = []
+		while self.parent[node] >= 0:
+			path.append(node)
+			node = self.parent[node]
+		return path[::-1]
+
+	def gather(self, nodes):
+		# copies the edges to nodes (in this order) once into a (3, N) trajectory and a control array, returns them
+		# with the trajectory index where every edge starts
+		nodes = np.asarray(nodes, dtype=int)
+		offsets = np.cumsum(self.path_len[nodes]) - self.path_len[nodes]
+		tau = gather_segments(self.path, self.path_start[nodes], self.path_len[nodes]).T
+		u = gather_segments(self.u, self.u_start[nodes], self.u_len[nodes])
+		return tau, u, offsets
+
+	def footprint_matrix(self, n_columns, nodes=None):
+		# sparse (nodes x n_columns) matrix W of the edge footprints, W @ var_x is the variance seen along every edge
+		nodes = np.arange(self.size) if nodes is None else np.asarray(nodes, dtype=int)
+		lengths = self.fp_len[nodes]
+		indptr = np.zeros(len(nodes) + 1, dtype=int)
+		np.cumsum(lengths, out=indptr[1:])
+		weights = gather_segments(self.fp_weights, self.fp_start[nodes], lengths)
+		cells = gather_segments(self.fp_cells, self.fp_start[nodes], lengths)
+		return sp.csr_matrix((weights, cells, indptr), shape=(len(nodes), n_columns))
+
+	def edge_vars(self, var_x, border_penalty, nodes=None):
+		# (negative) path variance of the edges to nodes (default all) for var_x, needs edge_footprint
+		nodes = np.arange(self.size) if nodes is None else np.asarray(nodes, dtype=int)
+		field = np.ravel(var_x)
+		return border_penalty * self.n_outside[nodes] - self.footprint_matrix(len(field), nodes).dot(field)
+
+	def distances(self, pose):
+		# returns the distance of pose to every node
+		return pose_distances(self.pose[:self.size], pose)
+
+	def prune(self, keep):
+		# removes every node whose entry in the boolean mask keep is False, every ancestor of a kept node has to be
+		# kept as well. Nodes are renumbered in their old order, returns the old -> new index array (-1 if removed)
+		n = self.size
+		keep = np.asarray(keep[:n], dtype=bool)
+		mapping = -np.ones(n, dtype=int)
+		mapping[keep] = np.arange(np.count_nonzero(keep))
+		for name in self.node_arrays:
+			array = getattr(self, name)
+			kept = array[:n][keep]
+			array[:len(kept)] = kept
+		self.size = int(np.count_nonzero(keep))
+		self.parent[self.size:] = -1
+		parent = self.parent[:self.size]
+		parent[parent >= 0] = mapping[parent[parent >= 0]]
+		self.child_sets = [set() for _ in range(self.size)]
+		for node in np.nonzero(parent >= 0)[0]:
+			self.child_sets[parent[node]].add(node)
+		self.node_cells = [self.node_cells[node] for node in np.nonzero(keep)[0]]
+		self.cell_nodes = defaultdict(set)
+		for node, cells in enumerate(self.node_cells):
+			for vertex in cells:
+				self.cell_nodes[vertex].add(node)
+		self.path, self.path_start, self.path_used = self._repack(self.path, self.path_start, self.path_len, 0)
+		self.u, self.u_start, self.u_used = self._repack(self.u, self.u_start, self.u_len, 0)
+		if self.edge_footprint is not None:
+			self.fp_weights, fp_start, self.fp_used = self._repack(self.fp_weights, self.fp_start, self.fp_len, 0)
+			self.fp_cells, self.fp_start, self.fp_used = self._repack(self.fp_cells, self.fp_start, self.fp_len, 0)
+		if self.min_dist is not None:
+			self._rebuild_best()
+		return mapping
+
+	def _rebuild_best(self):
+		nodes = np.nonzero(self.dist[:self.size] >= self.min_dist)[0]
+		self.best_heap = list(zip(self.cost[nodes], nodes))
+		heapq.heapify(self.best_heap)
+
+	def _index_cells(self, node, cells):
+		for vertex in self.node_cells[node]:
+			self.cell_nodes[vertex].discard(node)
+		self.node_cells[node] = [int(vertex) for vertex in cells]
+		for vertex in self.node_cells[node]:
+			self.cell_nodes[vertex].add(node)
+
+	def _grow_nodes(self, capacity):
+		for name in self.node_arrays:
+			old = getattr(self, name)
+			new = np.zeros(shape=(capacity,) + old.shape[1:], dtype=old.dtype)
+			new[:self.size] = old[:self.size]
+			setattr(self, name, new)
+		self.parent[self.size:] = -1
+
+	def _store_path(self, points):
+		if self.path_used + len(points) > len(self.path):
+			self.path, self.path_start, self.path_used = self._repack(self.path, self.path_start, self.path_len, len(points))
+		start = self.path_used
+		self.path[start:start + len(points)] = points
+		self.path_used += len(points)
+		return start, len(points)
+
+	def _store_u(self, u):
+		if self.u_used + len(u) > len(self.u):
+			self.u, self.u_start, self.u_used = self._repack(self.u, self.u_start, self.u_len, len(u))
+		start = self.u_used
+		self.u[start:start + len(u)] = u
+		self.u_used += len(u)
+		return start, len(u)
+
+	def _store_footprint(self, cells, weights):
+		if self.fp_used + len(cells) > len(self.fp_cells):
+			self.fp_weights, fp_start, self.fp_used = self._repack(self.fp_weights, self.fp_start, self.fp_len, len(cells))
+			self.fp_cells, self.fp_start, self.fp_used = self._repack(self.fp_cells, self.fp_start, self.fp_len, len(cells))
+		start = self.fp_used
+		self.fp_cells[start:start + len(cells)] = cells
+		self.fp_weights[start:start + len(cells)] = weights
+		self.fp_used += len(cells)
+		return start, len(cells)
+
+	def _repack(self, buffer, starts, lengths, extra):
+		# copies the live segments of a flat buffer to the front of a buffer large enough for extra more entries
+		n = self.size
+		live = lengths[:n]
+		used = int(np.sum(live))
+		capacity = max(len(buffer), 1)
+		while capacity < 2 * (used + extra):
+			capacity *= 2
+		new_starts = np.zeros_like(starts)
+		new_starts[:n] = np.cumsum(live) - live
+		new = np.zeros(shape=(capacity,) + buffer.shape[1:], dtype=buffer.dtype)
+		new[:used] = gather_segments(buffer, starts[:n], live)
+		return new, new_starts, used
+
+
+def pose_distances(poses, pose):
+	# vectorized version of the pose metric used by the planners, returns the distance of pose to every row of poses
+	dangle = (poses[:, 2] - pose[2]) ** 2
+	dangle = np.minimum(dangle, np.minimum((poses[:, 2] - pose[2] + 2 * math.pi) ** 2, (poses[:, 2] - pose[2] - 2 * math.pi) ** 2))
+	return np.sqrt((poses[:, 0] - pose[0]) ** 2 + (poses[:, 1] - pose[1]) ** 2 + 3 * dangle)
+
+
+def gather_segments(buffer, starts, lengths):
+	# concatenation of the segments buffer[start:start + length] with a single fancy-index copy
+	offsets = np.cumsum(lengths) - lengths
+	return buffer[np.repeat(starts - offsets, lengths) + np.arange(int(np.sum(lengths)))]
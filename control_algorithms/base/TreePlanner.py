@@ -0,0 +1,137 @@
+import math
+import time
+
+import numpy as np
+
+import Config
+from control_algorithms.base import dubins_path_planner as plan
+from control_algorithms.base import footprint
+
+
+class TreePlanner(object):
+	# Tree handling shared by RRT* and PRM*: re-rooting the tree between control steps, lazy re-scoring of stale edges,
+	# the lower bound of lazy edge evaluation, stopping and path extraction. A subclass sets self.tree, self.var_x,
+	# self.max_dist, self.plot, self.max_curvature, self.space, self.gmrf_params, self.sampler, self.obstacle_map and
+	# self.last_path and has path_var(px, py, pangle)
+
+	def replan(self, start, var_x, max_dist, plot=None, changed=None):
+		# reuses the tree of the previous call. The branch of the previous plan that is still ahead of the AUV is
+		# re-rooted at start and all other branches are pruned. If the GMRF vertices whose variance changed are
+		# given, only the edges crossing them are re-scored, otherwise all kept edges are re-scored lazily
+		tree = self.tree
+		self.var_x = var_x
+		self.max_dist = max(max_dist, 10)
+		self.plot = plot
+		self.sampler.update(var_x)
+		keep = np.zeros(len(tree), dtype=bool)
+		keep[0] = True
+		branch = self.next_branch_node(start)
+		if branch is not None:
+			branch_pose = tree.pose[branch]
+			px, py, pangle, mode, plength, u = plan.dubins_path_planning(start[0], start[1], start[2], branch_pose[0], branch_pose[1], branch_pose[2], self.max_curvature)
+			if self.obstacle_map.path_free(px, py) and plength <= self.max_dist:
+				keep[branch] = True
+				keep[tree.descendants(branch)] = True
+			else:
+				branch = None
+		mapping = tree.prune(keep)
+		tree.pose[0] = start
+		if branch is not None:
+			branch = mapping[branch]
+			tree.set_edge(branch, 0, px, py, pangle, u, plength, self.path_var(px, py, pangle))
+			if tree.edge_footprint is None:
+				tree.stale[tree.descendants(branch)] = True
+			else:
+				# one sparse mat-vec over the kept edges, or only over those crossing the changed vertices if given
+				nodes = tree.descendants(branch) if changed is None else [node for node in tree.edges_crossing(changed) if node != branch]
+				tree.path_var[nodes] = tree.edge_vars(var_x, Config.border_variance_penalty, nodes)
+			self.propagate_update_to_children(branch)
+			tree.prune(tree.dist[:len(tree)] <= self.max_dist)   # descendants of a pruned node are further away, so this stays a tree
+		self.last_path = None
+
+	def next_branch_node(self, start):
+		# first node of the previous plan that lies further along it than the AUV has travelled since
+		if self.last_path is None:
+			return None
+		tree = self.tree
+		travelled = math.sqrt((start[0] - tree.pose[0, 0]) ** 2 + (start[1] - tree.pose[0, 1]) ** 2)
+		for node in reversed(self.last_path):
+			if node != 0 and tree.dist[node] > travelled:
+				return node
+		return None
+
+	def refresh(self, node):
+		# re-scores the stale edges between the root and node against the current var_x, top down
+		tree = self.tree
+		chain = []
+		while node >= 0 and tree.stale[node]:
+			chain.append(node)
+			node = tree.parent[node]
+		for node in reversed(chain):
+			edge = tree.edge(node)
+			tree.path_var[node] = self.path_var(edge[:, 0], edge[:, 1], edge[:, 2])
+			tree.stale[node] = False
+			tree.update_node(node)
+
+	def candidates(self, near_nodes, new_pose):
+		# (near node, lower bound of the cost of new_pose through it). In lazy mode the bound comes from edge_bound,
+		# candidates that can not reach new_pose within max_dist are dropped and the rest is sorted by their bound
+		tree = self.tree
+		candidates = []
+		for near_node in near_nodes:
+			self.refresh(near_node)
+			if not Config.lazy_edges:
+				candidates.append((near_node, -float("inf")))
+				continue
+			plength, var_bound = self.edge_bound(tree.pose[near_node], new_pose)
+			if self.max_dist >= plength + tree.dist[near_node]:
+				candidates.append((near_node, (tree.total_var[near_node] + var_bound) / (tree.dist[near_node] + plength)))
+		if Config.lazy_edges:
+			candidates.sort(key=lambda candidate: candidate[1])
+		return candidates
+
+	def edge_bound(self, source_pose, dest_pose):
+		# length of the Dubins path between the poses and a lower bound of its (negative) path variance: every path
+		# point stays within plength of both poses, so it can not see more variance than the maximum in that box
+		plength, npoints = plan.dubins_path_length(source_pose[0], source_pose[1], source_pose[2], dest_pose[0], dest_pose[1], dest_pose[2], self.max_curvature)
+		var_max = footprint.box_max(self.var_x, max(source_pose[0], dest_pose[0]) - plength, min(source_pose[0], dest_pose[0]) + plength,
+									max(source_pose[1], dest_pose[1]) - plength, min(source_pose[1], dest_pose[1]) + plength, self.gmrf_params)
+		return plength, -npoints * max(var_max, 0.0)
+
+	def get_best_last_node(self):
+		tree = self.tree
+		for node in np.nonzero(tree.stale[:len(tree)])[0]:
+			self.refresh(node)
+		return tree.best_node()
+
+	def stalled(self, cost):
+		# tracks the best cost found so far, True once it has not improved for Config.stall_time seconds
+		now = time.time()
+		if cost < self.best_cost:
+			self.best_cost, self.best_time = cost, now
+		return Config.stall_time is not None and now - self.best_time > Config.stall_time
+
+	def get_path(self, last_node):
+		# collects the nodes from the root to last_node first and then copies their edges once
+		tree = self.tree
+		nodes = tree.path_to(last_node)
+		tau_optimal, u_optimal, self.edge_offsets = tree.gather(nodes)
+		self.arc_offsets = tree.dist[tree.parent[nodes]]
+		path = nodes[::-1] + [0]    # leaf first, the root last
+		self.last_path = path
+		return path, u_optimal, tau_optimal
+
+	def propagate_update_to_children(self, parent_node):
+		# only the subtree below parent_node is visited, parents are updated before their children
+		for node in self.tree.descendants(parent_node):
+			self.tree.update_node(node)
+
+	def check_loop(self, near_node, new_node):
+		# checks to make sure that changing parents to temp_node does not create a loop
+		return not self.tree.is_ancestor(near_node, new_node)
+
+	def nearest_node(self, sample):
+		return int(np.argmin(self.tree.distances(sample)))
+
+	def path_footprint(self, px, py):
+		return footprint.path_footprint(px, py, self.gmrf_params, self.space)
@@ -0,0 +1,49 @@
+"""
+AUV model: unicycle with constant velocity whose heading is the control input.
+step() propagates any number of states at once and never prints, move_towards() is the single state update
+used by main.py to move the AUV along the path returned by a sampling planner.
+"""
+import numpy as np
+
+
+def step(states, controls, noise, dt, v_auv=1.0, field_dim=None):
+	"""
+	:param states: (3, N) array of x, y and heading
+	:param controls: turn rate per state, scalar or (N,)
+	:param noise: heading noise per state, scalar or (N,), scaled by sqrt(dt)
+	:param dt: time step in s
+	:param v_auv: AUV velocity in m/s
+	:param field_dim: if given, [x_min, x_max, y_min, y_max] the positions are clamped to
+	:return: (3, N) array of the propagated states
+	"""
+	states = np.asarray(states, dtype=float)
+	angle = states[2] + controls * dt + noise * np.sqrt(dt)
+	out = np.empty_like(states)
+	out[0] = states[0] + v_auv * np.cos(angle) * dt
+	out[1] = states[1] + v_auv * np.sin(angle) * dt
+	out[2] = wrap_angle(angle)
+	if field_dim is not None:
+		clamp(out, field_dim)
+	return out
+
+
+def move_towards(x_auv, x_auv_new, distance=1.0, field_dim=None):
+	# moves the AUV distance meters (in x, y) towards the pose x_auv_new, the heading changes proportionally
+	vec = np.asarray(x_auv_new, dtype=float) - x_auv
+	out = x_auv + vec / np.sqrt(vec[0] ** 2 + vec[1] ** 2) * distance
+	out[2] = wrap_angle(out[2])
+	if field_dim is not None:
+		clamp(out, field_dim)
+	return out
+
+
+def wrap_angle(angle):
+	# maps angles to [0, 2 pi)
+	return np.mod(angle, 2 * np.pi)
+
+
+def clamp(states, field_dim):
+	# prevents the AUV from leaving the true field, in place
+	states[0] = np.clip(states[0], field_dim[0], field_dim[1])
+	states[1] = np.clip(states[1], field_dim[2], field_dim[3])
+	return states
@@ -0,0 +1,58 @@
+"""
+Stopping rules of the sampling planners. A planner calls start() before its loop and exhausted() at the top of every
+iteration. Wall-clock budgets make the result depend on the speed and load of the machine, iteration and node
+budgets together with a seeded planner give the same tree on every machine.
+"""
+import time
+
+
+class Budget(object):
+	# wall-clock budget, base class of the other budgets which only change the stopping rule
+
+	def __init__(self, limit):
+		"""
+		:param limit: seconds, iterations or tree nodes the planner may use
+		"""
+		self.limit = limit
+		self.start_time = None
+		self.iterations = 0
+
+	def start(self):
+		self.start_time = time.time()
+		self.iterations = -1    # the first call of exhausted is made before the first iteration
+
+	def exhausted(self, nodes):
+		# True if the planner has to stop, counts the iterations. nodes is the current size of the tree
+		self.iterations += 1
+		return self.stop(nodes)
+
+	def stop(self, nodes):
+		return self.elapsed() > self.limit
+
+	def elapsed(self):
+		return time.time() - self.start_time
+
+
+class IterationBudget(Budget):
+	# stops after limit iterations of the planner loop, including iterations whose sample was rejected
+
+	def stop(self, nodes):
+		return self.iterations >= self.limit
+
+
+class NodeBudget(Budget):
+	# stops once the tree has limit nodes, or after 100 iterations per node in case samples keep being rejected
+
+	def stop(self, nodes):
+		return nodes >= self.limit or self.iterations >= 100 * self.limit
+
+
+def make_budget(name, max_time, max_iterations=None, max_nodes=None):
+	# creates the budget chosen in the config file
+	if name == 'time':
+		return Budget(max_time)
+	elif name == 'iterations':
+		return IterationBudget(max_iterations)
+	elif name == 'nodes':
+		return NodeBudget(max_nodes)
+	raise ValueError("unknown planner budget " + str(name))
@@ -3,9 +3,10 @@ Dubins path planner sample code
 author Atsushi Sakai (@Atsushi_twi)
 """
 import math
-import matplotlib.pyplot as plt
 import numpy as np
 
+import instrumentation
+
 
 def mod2pi(theta):
 	return theta - 2.0 * math.pi * math.floor(theta / 2.0 / math.pi)
@@ -130,7 +131,7 @@ def LRL(alpha, beta, d):
 	return t, p, q, mode
 
 
-def dubins_path_planning_from_origin(ex, ey, eyaw, c):
+def best_path(ex, ey, eyaw, c):
 	# normalize
 	dx = ex
 	dy = ey
@@ -157,11 +158,36 @@ def dubins_path_planning_from_origin(ex, ey, eyaw, c):
 			bt, bp, bq, bmode = t, p, q, mode
 			bcost = cost
 
+	return bt, bp, bq, bmode, bcost
+
+
+def dubins_path_planning_from_origin(ex, ey, eyaw, c):
+	bt, bp, bq, bmode, bcost = best_path(ex, ey, eyaw, c)
 	px, py, pyaw, u = generate_course([bt, bp, bq], bmode, c)
 
 	return px, py, pyaw, bmode, bcost, u
 
 
+@instrumentation.timed('dubins_length')
+def dubins_path_length(sx, sy, syaw, ex, ey, eyaw, c):
+	"""
+	Length of the path dubins_path_planning returns and an upper bound of its number of points,
+	without generating the path
+	"""
+	ex = ex - sx
+	ey = ey - sy
+
+	lex = math.cos(syaw) * ex + math.sin(syaw) * ey
+	ley = - math.sin(syaw) * ex + math.cos(syaw) * ey
+
+	bt, bp, bq, bmode, bcost = best_path(lex, ley, eyaw - syaw, c)
+	# generate_course adds at most abs(l) / d + 3 points per segment to the start point, with the step d used there
+	d = .3 * c
+	npoints = 1 + int(sum(abs(l) / d + 3 for l in (bt, bp, bq)))
+	return bcost, npoints
+
+
+@instrumentation.timed('dubins')
 def dubins_path_planning(sx, sy, syaw, ex, ey, eyaw, c):
 	"""
 	Dubins path plannner
@@ -259,6 +285,7 @@ def plot_arrow(x, y, yaw, length=1.0, width=0.5, fc="r", ec="k"):  # pragma: no
 	"""
 	Plot arrow
 	"""
+	import matplotlib.pyplot as plt
 
 	if not isinstance(x, float):
 		for (ix, iy, iyaw) in zip(x, y, yaw):
@@ -270,6 +297,7 @@ def plot_arrow(x, y, yaw, length=1.0, width=0.5, fc="r", ec="k"):  # pragma: no
 
 
 if __name__ == '__main__':
+	import matplotlib.pyplot as plt
 	print("Dubins path planner sample start!!")
 
 	start_x = 1.0  # [m]
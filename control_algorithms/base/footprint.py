@@ -0,0 +1,55 @@
+"""
+Vectorized shape function interpolation for whole paths.
+Computes for every path point the same four bilinear weights as interpolation_matrix in Config and the
+planners, but for all points at once and without building dense (n + p) vectors.
+"""
+import numpy as np
+
+
+def path_footprint(px, py, gmrf_params, space):
+	"""
+	:param px: x-coordinates of the path
+	:param py: y-coordinates of the path
+	:param gmrf_params: GMRF.params
+	:param space: field dimensions [x_min, x_max, y_min, y_max], points outside are not interpolated
+	:return: GMRF vertex indices and weights (4 per point inside the field) and the number of points outside the field
+	"""
+	px = np.asarray(px, dtype=float)
+	py = np.asarray(py, dtype=float)
+	inside = (space[0] <= px) & (px <= space[1]) & (space[2] <= py) & (py <= space[3])
+	vertices, weights = corner_weights(px[inside], py[inside], gmrf_params)
+	return vertices.ravel(), weights.ravel(), len(px) - np.count_nonzero(inside)
+
+
+def interpolate(px, py, field, gmrf_params):
+	# shape function interpolation of a GMRF field (e.g. var_x) at every point, the points have to lie inside the GMRF grid
+	vertices, weights = corner_weights(np.asarray(px, dtype=float), np.asarray(py, dtype=float), gmrf_params)
+	return np.sum(weights * np.ravel(field)[vertices], axis=0)
+
+
+def corner_weights(x, y, gmrf_params):
+	# returns the (4, len(x)) vertex indices and weights of the lower left, lower right, upper left and upper right corners
+	(lxf, lyf, dvx, dvy, lx, ly, n, p, de, l_TH, p_THETA, xg_min, xg_max, yg_min, yg_max) = gmrf_params
+	nx = np.trunc((x - xg_min) / de[0]).astype(int)  # vertice column x-number at which the shape element starts
+	ny = np.trunc((y - yg_min) / de[1]).astype(int)  # vertice row y-number at which the shape element starts
+	# position in element coord-sys in meters
+	x_el = 0.1 * (x / 0.1 - np.trunc(x / 0.1)) - de[0] / 2
+	y_el = 0.1 * (y / 0.1 - np.trunc(y / 0.1)) - de[1] / 2
+	a = 1 / (de[0] * de[1])
+	vertices = np.array([ny * lx + nx, ny * lx + nx + 1, (ny + 1) * lx + nx, (ny + 1) * lx + nx + 1])
+	weights = np.array([a * (x_el - de[0] / 2) * (y_el - de[1] / 2),      # lower left corner
+						-a * (x_el + de[0] / 2) * (y_el - de[1] / 2),     # lower right corner
+						-a * (x_el - de[0] / 2) * (y_el + de[1] / 2),     # upper left corner
+						a * (x_el + de[0] / 2) * (y_el + de[1] / 2)])     # upper right corner
+	return vertices, weights
+
+
+def box_max(field, x_min, x_max, y_min, y_max, gmrf_params):
+	# upper bound of the interpolated field at any point in the box, the maximum of the vertices of all cells the box overlaps
+	(lxf, lyf, dvx, dvy, lx, ly, n, p, de, l_TH, p_THETA, xg_min, xg_max, yg_min, yg_max) = gmrf_params
+	grid = np.ravel(field)[:n].reshape(ly, lx)
+	nx0 = min(max(int((x_min - xg_min) // de[0]), 0), lx - 1)
+	nx1 = min(max(int((x_max - xg_min) // de[0]) + 1, 0), lx - 1)
+	ny0 = min(max(int((y_min - yg_min) // de[1]), 0), ly - 1)
+	ny1 = min(max(int((y_max - yg_min) // de[1]) + 1, 0), ly - 1)
+	return grid[ny0:ny1 + 1, nx0:nx1 + 1].max()
@@ -0,0 +1,177 @@
+"""
+Graph search on roadmaps with integer vertices 0..n-1 stored in CSR form (compressed sparse rows: the edges leaving
+vertex v are indices[indptr[v]:indptr[v + 1]]). Every edge has a length and a (negative) path variance.
+"""
+import heapq
+import math
+
+import numpy as np
+
+
+class CSRGraph(object):
+	# directed graph in CSR form, build it with from_edges
+
+	def __init__(self, n, indptr, indices, dist, var):
+		"""
+		:param n: number of vertices
+		:param indptr: (n + 1) offsets of the edges leaving each vertex
+		:param indices: target vertex of every edge
+		:param dist: length of every edge
+		:param var: (negative) path variance of every edge
+		"""
+		self.n = n
+		self.indptr = indptr
+		self.indices = indices
+		self.dist = dist
+		self.var = var
+
+	@classmethod
+	def from_edges(cls, n, frm, to, dist, var=None):
+		frm = np.asarray(frm, dtype=int)
+		order = np.argsort(frm, kind='stable')
+		indptr = np.zeros(n + 1, dtype=int)
+		np.cumsum(np.bincount(frm, minlength=n), out=indptr[1:])
+		dist = np.asarray(dist, dtype=float)[order]
+		var = np.zeros(len(dist)) if var is None else np.asarray(var, dtype=float)[order]
+		return cls(n, indptr, np.asarray(to, dtype=int)[order], dist, var)
+
+	def edges(self, v):
+		# slice of the edges leaving v
+		return slice(self.indptr[v], self.indptr[v + 1])
+
+
+def pareto_labels(graph, source, budget=math.inf, resolution=0.0):
+	"""
+	Multi-objective label-setting search over (distance, variance). Every vertex keeps its labels that are not
+	dominated in both objectives. Labels are settled in order of distance, so the variance may be negative. Labels
+	further than budget are dropped. A label is not extended to a vertex its walk already visited, so like the branches
+	of a PRM tree every label is a simple path and no edge adds its variance twice. A label therefore only dominates
+	labels whose walk visited all of its vertices. Exact version of bucket_labels, used by PRM_roadmap with
+	Config.roadmap_search = 'labels'
+	:param resolution: a label also counts as dominated by a label with at most this much more distance and no more
+	variance, which bounds the number of labels per vertex to about budget / resolution
+	:return: per vertex a list of labels (dist, var, vertex of the previous label, index of the previous label)
+	"""
+	labels = [[] for _ in range(graph.n)]
+	walks = [[] for _ in range(graph.n)]     # vertices of the walk of every label
+	queue = [(0.0, 0.0, source, -1, -1)]
+	while queue:
+		(d, var, v, prev, prev_index) = heapq.heappop(queue)
+		walk = frozenset([v]) if prev < 0 else walks[prev][prev_index] | {v}
+		if dominated(labels[v], walks[v], d + resolution, var, walk):
+			continue
+		labels[v].append((d, var, prev, prev_index))
+		walks[v].append(walk)
+		index = len(labels[v]) - 1
+		for e in range(graph.indptr[v], graph.indptr[v + 1]):
+			w = graph.indices[e]
+			wd = d + graph.dist[e]
+			if wd > budget or w in walk:
+				continue
+			wvar = var + graph.var[e]
+			if not dominated(labels[w], walks[w], wd + resolution, wvar, walk | {w}):
+				heapq.heappush(queue, (wd, wvar, w, v, index))
+	return labels
+
+
+def dominated(labels, walks, d, var, walk):
+	# whether a label of a vertex is at most d long, has at most var and visited no vertex outside walk
+	return any(ld <= d and lvar <= var and lwalk <= walk for ((ld, lvar, _, _), lwalk) in zip(labels, walks))
+
+
+def bucket_labels(graph, source, budget, resolution):
+	"""
+	Vectorized approximation of pareto_labels for large graphs. Distances are split into buckets of width resolution
+	and every (vertex, bucket) keeps only the label with the lowest variance. A label lands at least one bucket above
+	the label it extends, so every bucket is expanded once with all its edges at once, and labels dominated by a
+	label of a lower bucket are not expanded. Like in pareto_labels a label is not extended to a vertex its walk
+	already visited. Distances and variances of the labels stay exact.
+	:return: (n, K) arrays of distance and variance (inf if there is no label), previous vertex and previous bucket
+	"""
+	n = graph.n
+	n_buckets = int(budget / resolution) + 1
+	dist = np.full((n, n_buckets), math.inf)
+	var = np.full((n, n_buckets), math.inf)
+	prev = -np.ones((n, n_buckets), dtype=int)
+	prev_bucket = -np.ones((n, n_buckets), dtype=int)
+	frm = np.repeat(np.arange(n), np.diff(graph.indptr))
+	dist[source, 0] = 0.0
+	var[source, 0] = 0.0
+	best = np.full(n, math.inf)     # lowest variance of the labels in the lower buckets per vertex
+	for k in range(n_buckets - 1):
+		var[var[:, k] >= best, k] = math.inf
+		best = np.minimum(best, var[:, k])
+		edges = np.nonzero(np.isfinite(var[frm, k]))[0]
+		d = dist[frm[edges], k] + graph.dist[edges]
+		v = var[frm[edges], k] + graph.var[edges]
+		bucket = np.maximum((d / resolution).astype(int), k + 1)
+		keep = (d <= budget) & (bucket < n_buckets)
+		edges, d, v, bucket = edges[keep], d[keep], v[keep], bucket[keep]
+		to = graph.indices[edges]
+		keep = ~on_walk(prev, prev_bucket, frm[edges], k, to)
+		edges, d, v, bucket, to = edges[keep], d[keep], v[keep], bucket[keep], to[keep]
+		# per target label the candidate with the lowest variance, applied if it improves the label
+		flat = to * n_buckets + bucket
+		order = np.lexsort((v, flat))
+		first = np.ones(len(order), dtype=bool)
+		first[1:] = flat[order][1:] != flat[order][:-1]
+		order = order[first]
+		order = order[v[order] < var[to[order], bucket[order]]]
+		dist[to[order], bucket[order]] = d[order]
+		var[to[order], bucket[order]] = v[order]
+		prev[to[order], bucket[order]] = frm[edges[order]]
+		prev_bucket[to[order], bucket[order]] = k
+	var[var[:, -1] >= best, -1] = math.inf
+	return dist, var, prev, prev_bucket
+
+
+def on_walk(prev, prev_bucket, v, k, w):
+	# for every label (v[i], k) of bucket_labels whether vertex w[i] is on its walk from the source
+	found = np.zeros(len(w), dtype=bool)
+	index = np.arange(len(w))
+	k = np.full(len(w), k)
+	while len(index):
+		found[index] |= v == w[index]
+		(v, k) = (prev[v, k], prev_bucket[v, k])
+		index, v, k = index[v >= 0], v[v >= 0], k[v >= 0]
+	return found
+
+
+def bucket_path(labels, v, k):
+	# vertices from the source to vertex v along the label in bucket k
+	(dist, var, prev, prev_bucket) = labels
+	path = []
+	while v >= 0:
+		path.append(int(v))
+		v, k = prev[v, k], prev_bucket[v, k]
+	return path[::-1]
+
+
+def best_bucket(labels, min_dist):
+	# (vertex, bucket) of the label with the lowest variance per unit length that is at least min_dist long
+	(dist, var, prev, prev_bucket) = labels
+	ratio = np.full(dist.shape, math.inf)
+	valid = np.isfinite(var) & (dist >= min_dist)
+	ratio[valid] = var[valid] / dist[valid]
+	if not np.any(valid):
+		return None
+	return np.unravel_index(np.argmin(ratio), ratio.shape)
+
+
+def best_ratio(labels, min_dist):
+	# (vertex, label index) of the label with the lowest variance per unit length that is at least min_dist long
+	best, best_cost = None, math.inf
+	for v, vertex_labels in enumerate(labels):
+		for index, (d, var, _, _) in enumerate(vertex_labels):
+			if d >= min_dist and var / d < best_cost:
+				best, best_cost = (v, index), var / d
+	return best
+
+
+def label_path(labels, v, index):
+	# vertices from the source to vertex v along the given label
+	path = []
+	while v >= 0:
+		path.append(int(v))
+		(_, _, v, index) = labels[v][index]
+	return path[::-1]
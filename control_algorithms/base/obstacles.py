@@ -0,0 +1,121 @@
+"""
+Obstacles of the field rasterized into an occupancy grid, so that whole paths are checked with one vectorized lookup.
+Supported obstacles (Config.obstacles is a list of them):
+	(x, y, side)                             square of the original planners, its x-extent is scaled by .8
+	('circle', x, y, radius)
+	('polygon', [(x1, y1), (x2, y2), ...])   vertices in order, the polygon is closed automatically
+"""
+import zlib
+
+import numpy as np
+
+# Obstacle maps built in this process, by obstacles, field and resolution
+maps = {}
+
+
+class ObstacleMap(object):
+	# occupancy grid over the bounding box of the field and the obstacles, points outside the grid are free. A cell
+	# is occupied if its center lies inside an obstacle. If clearance > 0 a distance field is computed as well and
+	# points closer than clearance to an obstacle count as occupied
+
+	def __init__(self, obstacles, space, resolution=0.05, clearance=0.0):
+		"""
+		:param obstacles: list of obstacles, see above. None or empty for no obstacles
+		:param space: field dimensions [x_min, x_max, y_min, y_max]
+		:param resolution: cell size of the grid in m
+		:param clearance: minimum distance in m paths have to keep from the obstacles
+		"""
+		self.obstacles = list(obstacles) if obstacles is not None else []
+		self.resolution = resolution
+		self.clearance = clearance
+		self.grid = None            # (ny, nx) occupancy, None if there are no obstacles
+		self.distance = None        # (ny, nx) distance of every cell center to the nearest occupied cell in m
+		if not self.obstacles:
+			return
+		shapes = [shape_outline(obstacle) for obstacle in self.obstacles]
+		points = np.concatenate([outline for (kind, outline) in shapes])
+		self.origin = np.array([min(space[0], points[:, 0].min()), min(space[2], points[:, 1].min())]) - resolution
+		upper = np.array([max(space[1], points[:, 0].max()), max(space[3], points[:, 1].max())]) + resolution
+		(nx, ny) = np.ceil((upper - self.origin) / resolution).astype(int)
+		x = self.origin[0] + (np.arange(nx) + .5) * resolution
+		y = self.origin[1] + (np.arange(ny) + .5) * resolution
+		cx, cy = np.meshgrid(x, y)
+		self.grid = np.zeros(shape=(ny, nx), dtype=bool)
+		for obstacle, (kind, outline) in zip(self.obstacles, shapes):
+			self.grid |= rasterize(obstacle, kind, outline, cx, cy)
+		if clearance > 0:
+			from scipy.ndimage import distance_transform_edt
+			self.distance = distance_transform_edt(~self.grid) * resolution
+
+	def free(self, px, py):
+		# boolean array, True for every point that is not in (or closer than clearance to) an obstacle
+		px = np.asarray(px, dtype=float)
+		py = np.asarray(py, dtype=float)
+		if self.grid is None:
+			return np.ones(px.shape, dtype=bool)
+		ix = np.floor((px - self.origin[0]) / self.resolution).astype(int)
+		iy = np.floor((py - self.origin[1]) / self.resolution).astype(int)
+		inside = (ix >= 0) & (ix < self.grid.shape[1]) & (iy >= 0) & (iy < self.grid.shape[0])
+		free = np.ones(px.shape, dtype=bool)
+		if self.distance is not None:
+			free[inside] = self.distance[iy[inside], ix[inside]] >= self.clearance
+		else:
+			free[inside] = ~self.grid[iy[inside], ix[inside]]
+		return free
+
+	def path_free(self, px, py):
+		# True if no point of the path hits an obstacle
+		if self.grid is None:
+			return True
+		return bool(np.all(self.free(px, py)))
+
+	def signature(self):
+		# numbers identifying the rasterized obstacles, used to tell whether a saved roadmap is still valid
+		if self.grid is None:
+			return np.zeros(0)
+		return np.concatenate((self.origin, self.grid.shape, [self.resolution, self.clearance, zlib.crc32(self.grid.tobytes())]))
+
+	def draw(self, plot):
+		for obstacle, (kind, outline) in zip(self.obstacles, [shape_outline(obstacle) for obstacle in self.obstacles]):
+			if kind == 'square':
+				(x, y, side) = obstacle
+				plot.plot(x, y, "sk", ms=8 * side)
+			else:
+				plot.fill(outline[:, 0], outline[:, 1], color='k')
+
+
+def shape_outline(obstacle):
+	# kind of the obstacle and its outline as (k, 2) array (the bounding box for squares and circles)
+	if obstacle[0] == 'circle':
+		(kind, x, y, radius) = obstacle
+		angle = np.linspace(0, 2 * np.pi, 64)
+		return 'circle', np.column_stack((x + radius * np.cos(angle), y + radius * np.sin(angle)))
+	elif obstacle[0] == 'polygon':
+		return 'polygon', np.asarray(obstacle[1], dtype=float)
+	(x, y, side) = obstacle
+	return 'square', np.array([[x - .8 * side / 2, y - side / 2], [x + .8 * side / 2, y + side / 2]])
+
+
+def rasterize(obstacle, kind, outline, cx, cy):
+	# cells whose center (cx, cy) lies inside the obstacle
+	if kind == 'square':
+		return (cx > outline[0, 0]) & (cx < outline[1, 0]) & (cy > outline[0, 1]) & (cy < outline[1, 1])
+	elif kind == 'circle':
+		(_, x, y, radius) = obstacle
+		return (cx - x) ** 2 + (cy - y) ** 2 < radius ** 2
+	# even-odd rule, one pass per polygon edge
+	inside = np.zeros(cx.shape, dtype=bool)
+	for (x1, y1), (x2, y2) in zip(outline, np.roll(outline, -1, axis=0)):
+		if y1 == y2:
+			continue
+		crosses = (cy >= min(y1, y2)) & (cy < max(y1, y2))
+		inside ^= crosses & (cx < x1 + (cy - y1) * (x2 - x1) / (y2 - y1))
+	return inside
+
+
+def get_map(obstacles, space, resolution=0.05, clearance=0.0):
+	# obstacle map shared by all planners of this process, rasterized once per set of obstacles
+	key = (repr(obstacles), tuple(space), resolution, clearance)
+	if key not in maps:
+		maps[key] = ObstacleMap(obstacles, space, resolution, clearance)
+	return maps[key]
@@ -0,0 +1,144 @@
+"""
+Sampling strategies for the sampling based planners. A sampler draws poses (x, y, angle) inside a box of the field
+with angles in [-pi, pi). Samples are generated a batch at a time, sample() hands them out one by one.
+"""
+import math
+
+import numpy as np
+
+import instrumentation
+
+
+class Sampler(object):
+	# uniform samples, base class of the other samplers which only change how the unit cube is filled
+
+	def __init__(self, bounds, seed=None, batch_size=256):
+		"""
+		:param bounds: [x_min, x_max, y_min, y_max] of the samples
+		:param seed: seed of the random generator, if None it is drawn from np.random so np.random.seed still applies
+		:param batch_size: number of samples generated at once
+		"""
+		self.bounds = np.array(bounds, dtype=float)
+		self.low = np.array([self.bounds[0], self.bounds[2], -math.pi])
+		self.high = np.array([self.bounds[1], self.bounds[3], math.pi])
+		self.rng = np.random.RandomState(np.random.randint(0, 2 ** 31 - 1) if seed is None else seed)
+		self.batch_size = max(int(batch_size), 1)
+		self.batch = np.zeros(shape=(0, 3))
+		self.index = 0
+
+	def sample(self):
+		instrumentation.count('samples')
+		if self.index == len(self.batch):
+			self.batch = self.draw(self.batch_size)
+			self.index = 0
+		self.index += 1
+		return self.batch[self.index - 1].copy()
+
+	def draw(self, k):
+		# (k, 3) array of new samples
+		return self.low + self.unit_samples(k) * (self.high - self.low)
+
+	def unit_samples(self, k):
+		return self.rng.random_sample((k, 3))
+
+	def update(self, var_x):
+		# called with the new variance field when a planner is reused, only needed by VarianceSampler
+		pass
+
+
+class HaltonSampler(Sampler):
+	# Halton sequence in bases 2, 3 and 5, randomized with a seeded shift modulo 1 (Cranley-Patterson rotation)
+	bases = (2, 3, 5)
+
+	def __init__(self, bounds, seed=None, batch_size=256):
+		Sampler.__init__(self, bounds, seed, batch_size)
+		self.shift = self.rng.random_sample(3)
+		self.count = 1  # index 0 is the origin in every base
+
+	def unit_samples(self, k):
+		index = np.arange(self.count, self.count + k)
+		self.count += k
+		unit = np.column_stack([radical_inverse(index, base) for base in self.bases])
+		return np.mod(unit + self.shift, 1.0)
+
+
+class SobolSampler(Sampler):
+	# scrambled Sobol sequence, needs scipy >= 1.7. Batch sizes that are powers of 2 keep its balance properties
+
+	def __init__(self, bounds, seed=None, batch_size=256):
+		Sampler.__init__(self, bounds, seed, batch_size)
+		from scipy.stats import qmc
+		self.engine = qmc.Sobol(d=3, scramble=True, seed=self.rng.randint(0, 2 ** 31 - 1))
+
+	def unit_samples(self, k):
+		return self.engine.random(k)
+
+
+class VarianceSampler(Sampler):
+	# importance sampling of positions proportional to the variance of the GMRF vertices. A vertex is drawn from
+	# the CDF of the vertex variances and the position is spread uniformly over the cell around it. A fraction
+	# of the samples stays uniform so that every part of the field can still be reached
+
+	def __init__(self, bounds, gmrf_params, var_x, seed=None, batch_size=256, uniform_fraction=0.2):
+		"""
+		:param gmrf_params: specified in config file
+		:param var_x: variance of field as a 1D vector of variance of each node in GMRF
+		:param uniform_fraction: share of the samples drawn uniformly
+		"""
+		Sampler.__init__(self, bounds, seed, batch_size)
+		(lxf, lyf, dvx, dvy, lx, ly, n, p, de, l_TH, p_THETA, xg_min, xg_max, yg_min, yg_max) = gmrf_params
+		self.de = np.array(de[:2], dtype=float)
+		self.n = n
+		vertex = np.arange(n)
+		self.vertex_x = xg_min + (vertex % lx) * de[0]
+		self.vertex_y = yg_min + (vertex // lx) * de[1]
+		# only vertices whose cell overlaps the sampling box
+		self.vertices = np.nonzero((self.vertex_x + de[0] / 2 >= self.bounds[0]) & (self.vertex_x - de[0] / 2 <= self.bounds[1]) &
+								   (self.vertex_y + de[1] / 2 >= self.bounds[2]) & (self.vertex_y - de[1] / 2 <= self.bounds[3]))[0]
+		self.uniform_fraction = uniform_fraction
+		self.cdf = None
+		self.update(var_x)
+
+	def update(self, var_x):
+		weights = np.maximum(np.ravel(var_x)[:self.n][self.vertices], 0.0)
+		total = np.sum(weights)
+		self.cdf = np.cumsum(weights) / total if total > 0 else None
+		self.index = len(self.batch)  # the remaining samples were drawn for the old field
+
+	def unit_samples(self, k):
+		unit = self.rng.random_sample((k, 3))
+		if self.cdf is None:
+			return unit
+		weighted = np.nonzero(self.rng.random_sample(k) >= self.uniform_fraction)[0]
+		vertex = self.vertices[np.minimum(np.searchsorted(self.cdf, self.rng.random_sample(len(weighted)), side='right'), len(self.cdf) - 1)]
+		x = self.vertex_x[vertex] + (unit[weighted, 0] - 0.5) * self.de[0]
+		y = self.vertex_y[vertex] + (unit[weighted, 1] - 0.5) * self.de[1]
+		span = self.high - self.low
+		unit[weighted, 0] = np.clip((x - self.low[0]) / span[0], 0.0, 1.0)
+		unit[weighted, 1] = np.clip((y - self.low[1]) / span[1], 0.0, 1.0)
+		return unit
+
+
+def radical_inverse(index, base):
+	# van der Corput sequence in the given base for an integer array of indices
+	index = np.array(index, dtype=np.int64)
+	result = np.zeros(len(index))
+	f = 1.0 / base
+	while np.any(index > 0):
+		result += f * (index % base)
+		index //= base
+		f /= base
+	return result
+
+
+def make_sampler(name, bounds, gmrf_params=None, var_x=None, seed=None, batch_size=256):
+	# creates the sampler chosen in the config file
+	if name == 'uniform':
+		return Sampler(bounds, seed, batch_size)
+	elif name == 'halton':
+		return HaltonSampler(bounds, seed, batch_size)
+	elif name == 'sobol':
+		return SobolSampler(bounds, seed, batch_size)
+	elif name == 'variance':
+		return VarianceSampler(bounds, gmrf_params, var_x, seed, batch_size)
+	raise ValueError("unknown sampler " + str(name))
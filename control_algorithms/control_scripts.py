@@ -7,95 +7,74 @@ license: BSD
 Please feel free to use and modify this, but keep the above information. Thanks!
 """
 import Config
+import instrumentation
 import numpy as np
-from scipy import exp, sin, cos, sqrt, pi, interpolate
+from numpy import pi
 from random import randint
-import time
+from control_algorithms.base import auv_dynamics as dynamics
+from control_algorithms.base import footprint
 
 
+@instrumentation.timed('pi_controller')
 def pi_controller(x_auv, u_optimal, var_x, pi_parameters, gmrf_params, field_dim, set_sanity_check):
 	"""Optimal Stochastic controller in PI formulation, based on Schaal et al.
-	"A generalized Path Integral Control Approach for Reinforcement Learning" (2010) """
-	(lxf, lyf, dvx, dvy, lx, ly, n, p, de, l_TH, p_THETA, xg_min, xg_max, yg_min, yg_max) = gmrf_params
+	"A generalized Path Integral Control Approach for Reinforcement Learning" (2010)
+	All n_k roll-outs of an update are propagated and evaluated at once as arrays"""
 	(n_updates, n_k, n_horizon, N_horizon, t_cstep, sigma_epsilon, R_cost) = pi_parameters
 
-	# Initialize PI matrices
-	epsilon_auv = np.zeros(shape=(N_horizon, n_k))
-	tau_x = np.zeros(shape=(len(x_auv), N_horizon, n_k))
-	tau_optimal = np.zeros(shape=(len(x_auv), N_horizon))
-	pre_x_tau = np.zeros(shape=(N_horizon, n_k))
-	control_cost = np.zeros(shape=(N_horizon, n_k))
-	exp_lambda_S = np.zeros(shape=(N_horizon, n_k))
-	S_tau = np.zeros(shape=(N_horizon, n_k))
-	P_tau = np.zeros(shape=(N_horizon, n_k))
 	u_optimal[:-1] = u_optimal[1:]
 	u_optimal[-1] = 0
 	# u_optimal = np.zeros(shape=(N_horizon, 1))
+	M_m = 1  # Only for p=1 and this simple state model !
 
 	for ii in range(0, n_updates):  # Repeat PI algorithm for convergence
-
-		for jj in range(0, n_k):  # Iterate over all trajectories
-			"""Sample trajectories"""
-			tau_x[:, 0, jj] = x_auv  # Set initial trajectory state
-			# Calculate exploration noise (Only PI-Controller Hyperparameter)
-			epsilon_auv[:, jj] = sigma_epsilon * np.random.standard_normal(N_horizon)
-
-			for kk in range(0, N_horizon - 1):  # Iterate over length of trajectory except of last entry
-				# Sample roll-out trajectory
-				tau_x[:, kk + 1, jj] = Config.auv_dynamics(tau_x[:, kk, jj], u_optimal[kk], epsilon_auv[kk, jj], t_cstep, field_dim, set_border=False)
-
-			"""Calculate cost and probability weighting"""
-			for kk in range(0, N_horizon):  # Iterate over length of trajectory
-				# Compute variance along sampled trajectory
-				M_m = 1  # Only for p=1 and this simple state model !
-				# if M_m == 1:
-				#   print('Tau', tau_x[0:2, kk, jj], 'FL', field_limits)
-				if not (0 <= tau_x[0, kk, jj] <= field_dim[1]) or not (0 <= tau_x[1, kk, jj] <= field_dim[3]):
-					# print('Tau', tau_x[0:2, kk, jj], 'FL', field_limits)
-					pre_x_tau[kk, jj] = Config.border_variance_penalty
-					control_cost[kk, jj] = 0
-				else:
-					A_z = Config.interpolation_matrix(tau_x[:, kk, jj], n, p, lx, xg_min, yg_min, de)  #
-					pre_x_tau[kk, jj] = 1 / np.dot(A_z.T, var_x)
-					control_cost[kk, jj] = .5 * np.dot(np.array(u_optimal[kk] + epsilon_auv[kk, jj]).T,
-														np.dot(R_cost, np.array(u_optimal[kk] + epsilon_auv[kk, jj])))
-			for kk in range(0, N_horizon):  # Iterate over whole sampeld trajectory
-				S_tau[kk, jj] = np.sum(pre_x_tau[kk:, jj]) + np.sum(control_cost[kk:, jj])
-			for kk in range(0, N_horizon):  # Iterate over whole sampeld trajectory
-				exp_lambda_S[kk, jj] = exp(-10 * (S_tau[kk, jj] - np.amin(S_tau[:, jj])) /
-										   (np.amax(S_tau[:, jj]) - np.amin(S_tau[:, jj])))
+		"""Sample trajectories"""
+		# Calculate exploration noise (Only PI-Controller Hyperparameter), drawn trajectory by trajectory
+		epsilon_auv = sigma_epsilon * np.random.standard_normal((n_k, N_horizon)).T
+		tau_x = rollout(x_auv, u_optimal, epsilon_auv, t_cstep, field_dim, set_border=False)
+
+		"""Calculate cost and probability weighting"""
+		# Compute variance along sampled trajectories, states outside of the field get the border penalty
+		inside = (0 <= tau_x[0]) & (tau_x[0] <= field_dim[1]) & (0 <= tau_x[1]) & (tau_x[1] <= field_dim[3])
+		pre_x_tau = np.full((N_horizon, n_k), float(Config.border_variance_penalty))
+		pre_x_tau[inside] = 1 / footprint.interpolate(tau_x[0][inside], tau_x[1][inside], var_x, gmrf_params)
+		u_noise = u_optimal.reshape(N_horizon, 1) + epsilon_auv
+		control_cost = np.where(inside, .5 * R_cost[0, 0] * u_noise ** 2, 0)
+		S_tau = np.cumsum((pre_x_tau + control_cost)[::-1], axis=0)[::-1]  # cost-to-go of every state
+		S_min = np.amin(S_tau, axis=0)
+		exp_lambda_S = np.exp(-10 * (S_tau - S_min) / (np.amax(S_tau, axis=0) - S_min))
 
 		"""Update control"""
-		u_correction = np.zeros(shape=(N_horizon, 1))
-		for kk in range(0, N_horizon):  # Iterate over length of trajectory
-			for jj in range(0, n_k):  # Iterate over all trajectories
-				# Roll-Out probability
-				P_tau[kk, jj] = exp_lambda_S[kk, jj] / np.sum(exp_lambda_S[kk, :])
-
-			for jj in range(0, n_k):  # Iterate over all trajectories
-				u_correction[kk] += P_tau[kk, jj] * M_m * epsilon_auv[kk, jj]
+		P_tau = exp_lambda_S / np.sum(exp_lambda_S, axis=1, keepdims=True)  # Roll-Out probability
+		u_correction = np.sum(P_tau * M_m * epsilon_auv, axis=1, keepdims=True)
 		u_optimal = u_optimal + u_correction
 
 	"""PI Sanity check"""
-
+	tau_optimal = np.zeros(shape=(len(x_auv), N_horizon))
 	if set_sanity_check == True:
-		tau_optimal[:, 0] = x_auv
-		var_x_test = np.zeros(shape=(N_horizon, 1))
-		control_cost_test = np.zeros(shape=(N_horizon, 1))
-		for kk in range(0, N_horizon - 1):  # Iterate over length of trajectory except of last entry
-			tau_optimal[:, kk + 1] = Config.auv_dynamics(tau_optimal[:, kk], u_optimal[kk], 0, t_cstep, field_dim)
-
-		for kk in range(0, N_horizon):  # Iterate over length of trajectory except of last entry
-			A_test = Config.interpolation_matrix(tau_optimal[:, kk], n, p, lx, xg_min, yg_min, de)
-			var_x_test[kk] = 1 / np.dot(A_test.T, var_x)
-			control_cost_test[kk] = 0.5 * np.dot(np.array(u_optimal[kk]).T,
-												 np.dot(R_cost, np.array(u_optimal[kk])))
+		tau_optimal = rollout(x_auv, u_optimal, np.zeros(shape=(N_horizon, 1)), t_cstep, field_dim, set_border=True)[:, :, 0]
+		var_x_test = 1 / footprint.interpolate(tau_optimal[0], tau_optimal[1], var_x, gmrf_params).reshape(N_horizon, 1)
+		control_cost_test = 0.5 * R_cost[0, 0] * u_optimal.reshape(N_horizon, 1) ** 2
 
 		print('optimal path variance cost: ', var_x_test, 'optimal path control cost', control_cost_test)
 
 	return u_optimal, tau_x, tau_optimal
 
 
+def rollout(x_auv, u_optimal, epsilon, t_cstep, field_dim, set_border):
+	"""Propagates all roll-outs at once with the AUV model
+		Input: start state, controls (N_horizon), exploration noise (N_horizon x n_k)
+		Output: states (3 x N_horizon x n_k)"""
+	(N_horizon, n_k) = epsilon.shape
+	u = np.ravel(u_optimal)
+	border = field_dim if set_border == True else None
+	tau_x = np.zeros(shape=(len(x_auv), N_horizon, n_k))
+	tau_x[:, 0, :] = np.reshape(x_auv, (len(x_auv), 1))
+	for kk in range(0, N_horizon - 1):  # Iterate over length of trajectory except of last entry
+		tau_x[:, kk + 1] = dynamics.step(tau_x[:, kk], u[kk], epsilon[kk], t_cstep, Config.v_auv, border)
+	return tau_x
+
+
 def random_walk(x_auv):
 	"""Random Walk"""
 	max_step_size = ((0.2 * pi) / 1000)
@@ -0,0 +1,135 @@
+import random
+
+import numpy as np
+
+import Config
+
+# Worker pool kept between control steps and the shared variance buffer the workers read var_x from
+pool = None
+pool_size = 0
+shared_var_x = None
+worker_var_x = None
+
+
+class Ensemble:
+	# Grows several independently seeded trees of the configured sampling planner in worker processes under the
+	# same wall-clock budget and keeps the plan with the lowest average variance per unit path length. The nodes of
+	# the trees only exist in the workers, so the returned path holds the poses of the path nodes (leaf first)
+
+	def __init__(self, algorithm, start, gmrf_params, var_x, max_dist, n_workers):
+		"""
+		:param algorithm: name of the sampling planner, see Config.make_planner
+		:param start: initial location of agent
+		:param gmrf_params: specified in config file
+		:param var_x: variance of field as a 1D vector of variance of each node in GMRF
+		:param max_dist: maximum distance that the algorithm solution will return
+		:param n_workers: number of trees (and worker processes)
+		"""
+		self.algorithm = algorithm
+		self.start = np.array(start)
+		self.gmrf_params = gmrf_params
+		self.var_x = var_x
+		self.max_dist = max_dist
+		self.n_workers = n_workers
+		self.costs = None
+		# trajectory index and path length from the start at which every edge of the returned path starts, one entry per
+		# edge beginning with 0. They belong to the result of control_algorithm and are read from the planner after it
+		self.edge_offsets = None
+		self.arc_offsets = None
+
+	def control_algorithm(self):
+		get_pool(len(self.var_x), self.n_workers)
+		np.frombuffer(shared_var_x, dtype=float)[:] = np.ravel(self.var_x)
+		tasks = [(self.algorithm, int(seed), self.start, self.gmrf_params, self.max_dist) for seed in self.seeds()]
+		results = pool.map(grow_tree, tasks)
+		self.costs = [result[0] for result in results]
+		best = best_plan(results)
+		if best is None:
+			return None
+		(cost, path, u_optimal, tau_optimal, self.edge_offsets, self.arc_offsets) = best
+		return path, u_optimal, tau_optimal
+
+	def seeds(self):
+		# seeds of the trees from a seed sequence of the ensemble. Its entropy is Config.planner_seed, or if that is None
+		# one draw from np.random like the sampler of a single planner makes, so the simulation noise stays the same
+		entropy = Config.planner_seed if Config.planner_seed is not None else np.random.randint(0, 2 ** 31 - 1)
+		return np.random.SeedSequence(entropy).generate_state(self.n_workers)
+
+	def draw_graph(self, plot=None):
+		# the trees only exist in the worker processes, only the chosen path is plotted by the caller
+		if plot is not None:
+			plot.axis(Config.field_dim)
+			plot.grid(True)
+			plot.title("Ensemble of " + str(self.n_workers) + " " + self.algorithm + " trees")
+
+
+def get_pool(n_var, n_workers):
+	# (re)creates the worker pool if the number of workers or the size of var_x changed
+	global pool, pool_size, shared_var_x
+	if pool is not None and pool_size == n_workers and len(shared_var_x) == n_var:
+		return pool
+	close_pool()
+	context = Config.process_context()
+	shared_var_x = context.RawArray('d', n_var)
+	pool = context.Pool(n_workers, initializer=init_worker, initargs=(shared_var_x,))
+	pool_size = n_workers
+	return pool
+
+
+def close_pool():
+	# stops the workers, main.py calls this at the end of the simulation
+	global pool
+	if pool is not None:
+		pool.terminate()
+		pool.join()
+		pool = None
+
+
+def init_worker(shared):
+	# var_x is read from shared memory, it is only written by the main process between control steps
+	global worker_var_x
+	worker_var_x = np.frombuffer(shared, dtype=float).reshape(-1, 1)
+
+
+def grow_tree(task):
+	(algorithm, seed, start, gmrf_params, max_dist) = task
+	random.seed(seed)
+	np.random.seed(seed)
+	# every tree gets its own seed, Config.planner_seed would make them all the same
+	planner = Config.make_planner(algorithm, start, gmrf_params, worker_var_x, max_dist, None, seed=seed)
+	result = planner.control_algorithm()
+	if result is None:
+		return float("inf"), None, None, None, None, None
+	path, u_optimal, tau_optimal = result
+	return path_cost(planner, path), path_poses(planner, path), u_optimal, tau_optimal, planner.edge_offsets, planner.arc_offsets
+
+
+def best_plan(results):
+	# result of grow_tree with the lowest cost among the trees that returned a plan, None if none did
+	plans = [result for result in results if result[1] is not None]
+	if not plans:
+		return None
+	return min(plans, key=lambda result: result[0])
+
+
+def path_cost(planner, path):
+	# average variance per unit path length of the path returned by a planner
+	last_node = path[0]
+	if hasattr(planner, 'roadmap'):
+		return planner.cost
+	if hasattr(planner, 'tree'):
+		dist, total_var = planner.tree.dist[last_node], planner.tree.total_var[last_node]
+	else:
+		dist, total_var = last_node.dist, last_node.total_var
+	if dist < planner.min_dist:
+		return float("inf")
+	return total_var / dist
+
+
+def path_poses(planner, path):
+	# (len(path), 3) poses of the nodes of a path returned by a planner, they can be sent back to the main process
+	if hasattr(planner, 'roadmap'):
+		return np.array([planner.roadmap.pose[v] if v < len(planner.roadmap) else planner.start for v in path])
+	if hasattr(planner, 'tree'):
+		return planner.tree.pose[path]
+	return np.array([node.pose for node in path])
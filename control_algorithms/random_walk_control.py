@@ -1,6 +1,6 @@
 import Config
 import numpy as np
-from scipy import pi
+from numpy import pi
 from random import randint
 import time
 
@@ -9,15 +9,16 @@ Please feel free to use and modify this, but keep the above information. Thanks!
 """
 
 import Config
+import instrumentation
 
 import os
 import numpy as np
 import scipy
 import scipy.sparse as sp
-from scipy import exp, sin, cos, sqrt, pi, interpolate
+from numpy import exp, sin, cos, sqrt, pi
+from scipy import interpolate
 from scipy.sparse.linalg import spsolve
-import matplotlib.pyplot as plt
-from matplotlib import cm
+# matplotlib is only imported by the functions that plot, headless runs do not load it
 
 # from scikits.sparse.cholmod import cholesky
 
@@ -310,6 +311,13 @@ def calculate_precision_matrix(lx, ly, kappa, alpha, car1=False):
 			return sp.coo_matrix((Q_d[0, :], (Q_r[0, :], Q_c[0, :])), shape=(lx * ly, lx * ly)).tocsr()
 
 
+# Version of the files written by GMRF.save_state, increased whenever their content changes
+state_version = 1
+# Posterior arrays stored by GMRF.save_state besides the updated precision matrices
+state_arrays = ('F', 'T', 'b', 'c', 'h_theta', 'g_theta', 'log_pi_y', 'pi_theta', 'mue_theta', 'mue_x', 'var_x', 'var_x_reported',
+				'diag_Q_t_inv', 'measurements')
+
+
 """SAMPLE from GMRF"""
 def sample_from_GMRF(gmrf_dim, kappa, alpha, car_var, plot_gmrf=False):
 	x_min, x_max, y_min, y_max = Config.field_dim
@@ -331,6 +339,7 @@ def sample_from_GMRF(gmrf_dim, kappa, alpha, car_var, plot_gmrf=False):
 	x_Q = x_Q_vec.reshape((ly1, lx1))
 
 	if plot_gmrf == True:
+		import matplotlib.pyplot as plt
 		if len(kappa) == 1:
 			fig, ax = plt.subplots(1)
 			# ax = ax.ravel()
@@ -461,9 +470,12 @@ class GMRF:
 		self.mue_theta = np.zeros(shape=(n + p, l_TH))
 		self.mue_x = np.zeros(shape=(n + p, 1))
 		self.var_x = np.zeros(shape=(n + p, 1))
+		self.var_x_reported = np.zeros(shape=(n + p, 1))  # variance as last reported by changed_vertices
+		self.measurements = 0  # number of measurements absorbed by gmrf_bayese_update
 		print("size of p: ", p)
 		self.params = (lxf, lyf, dvx, dvy, lx, ly, n, p, de, l_TH, p_THETA, xg_min, xg_max, yg_min, yg_max)
 
+	@instrumentation.timed('gmrf_update')
 	def gmrf_bayese_update(self, x_auv, y_t):
 		"""updates the GMRF Class beliefe of the true field
 			Input: State, New measurement
@@ -474,6 +486,7 @@ class GMRF:
 		u = Config.interpolation_matrix(x_auv, n, p, lx, xg_min, yg_min, de)
 		u_sparse = sp.csr_matrix(u)
 		"""Update canonical mean and observation-dependent likelihood terms"""
+		self.measurements += 1
 		self.b = self.b + (y_t / Config.sigma_w_squ) * u  # Canonical mean
 		self.c = self.c - ((y_t ** 2) / (2 * Config.sigma_w_squ))  # Likelihood term
 
@@ -482,7 +495,8 @@ class GMRF:
 			filename = os.path.join('gp_scripts', "Q_t_" + str(jj))
 			Q_temporary = getattr(self, filename)
 			Q_temporary = Q_temporary
-			self.h_theta[:, jj] = scipy.sparse.linalg.spsolve(Q_temporary, u_sparse).T
+			with instrumentation.timer('spsolve'):
+				self.h_theta[:, jj] = scipy.sparse.linalg.spsolve(Q_temporary, u_sparse).T
 			# L_factor = cholesky(Q_temporary)
 			"""Update Precision Matrix"""
 			self.diag_Q_t_inv[:, jj] = np.subtract(self.diag_Q_t_inv[:, jj], (
@@ -494,6 +508,8 @@ class GMRF:
 				# Check precision matrix
 				my_data = Q_temporary.todense()
 				my_data[my_data == 0.0] = np.nan
+				import matplotlib.pyplot as plt
+				from matplotlib import cm
 				plt.matshow(my_data, cmap=cm.Spectral_r, interpolation='none')
 				plt.draw()
 				plt.pause(30)
@@ -505,7 +521,8 @@ class GMRF:
 			"""Compute canonical mean"""
 			filename = os.path.join('gp_scripts', "Q_t_" + str(jj))
 			Q_temporary = getattr(self, filename)
-			self.mue_theta[:, hh] = scipy.sparse.linalg.spsolve(Q_temporary, self.b).T
+			with instrumentation.timer('spsolve'):
+				self.mue_theta[:, hh] = scipy.sparse.linalg.spsolve(Q_temporary, self.b).T
 			"""Compute Likelihood"""
 			self.log_pi_y[hh] = self.c + self.g_theta[hh] + 0.5 * np.dot(self.b.T, self.mue_theta[:, hh])  # Compute likelihood
 
@@ -520,3 +537,53 @@ class GMRF:
 									 (np.subtract(self.mue_theta[ji, :],
 												  self.mue_x[ji] * np.ones(shape=(1, l_TH))) ** 2)), self.pi_theta)
 		return self.mue_x, self.var_x, self.pi_theta
+
+	def save_state(self, filename):
+		"""Writes the full posterior to a compressed npz file: the updated precision matrices Q_t_jj in CSR form,
+			the canonical mean, likelihood terms, hyperparameter posterior and predictive mean and variance
+		"""
+		(lxf, lyf, dvx, dvy, lx, ly, n, p, de, l_TH, p_THETA, xg_min, xg_max, yg_min, yg_max) = self.params
+		arrays = {name: np.asarray(getattr(self, name)) for name in state_arrays}
+		for jj in range(0, l_TH):
+			Q_t = getattr(self, os.path.join('gp_scripts', "Q_t_" + str(jj))).tocsr()
+			arrays.update({'Q_t_%d_data' % jj: Q_t.data, 'Q_t_%d_indices' % jj: Q_t.indices, 'Q_t_%d_indptr' % jj: Q_t.indptr})
+		np.savez_compressed(filename, version=state_version, sigma_w_squ=Config.sigma_w_squ, dims=np.array([lxf, lyf, dvx, dvy, lx, ly, n, p, l_TH]),
+							bounds=np.array([p_THETA, xg_min, xg_max, yg_min, yg_max]), de=de, **arrays)
+
+	def load_state(self, filename):
+		"""Replaces the posterior with the one stored by save_state, the matrices are restored as stored and nothing
+			is recomputed. The GMRF may have been created with other dimensions, they are taken from the file
+		"""
+		with np.load(filename) as data:
+			if int(data['version']) != state_version:
+				raise ValueError("GMRF state {0} has version {1}, expected {2}".format(filename, int(data['version']), state_version))
+			if float(data['sigma_w_squ']) != Config.sigma_w_squ:
+				raise ValueError("GMRF state {0} was saved with a measurement variance of {1}".format(filename, float(data['sigma_w_squ'])))
+			(lxf, lyf, dvx, dvy, lx, ly, n, p, l_TH) = [int(value) for value in data['dims']]
+			(p_THETA, xg_min, xg_max, yg_min, yg_max) = [float(value) for value in data['bounds']]
+			for name in state_arrays:
+				setattr(self, name, data[name])
+			for jj in range(0, l_TH):
+				Q_t = sp.csr_matrix((data['Q_t_%d_data' % jj], data['Q_t_%d_indices' % jj], data['Q_t_%d_indptr' % jj]), shape=(n + p, n + p))
+				setattr(self, os.path.join('gp_scripts', "Q_t_" + str(jj)), Q_t)
+			self.params = (lxf, lyf, dvx, dvy, lx, ly, n, p, data['de'], l_TH, p_THETA, xg_min, xg_max, yg_min, yg_max)
+		# scalars come back as 0-d arrays
+		self.c = self.c if self.c.ndim else float(self.c)
+		self.measurements = int(self.measurements)
+
+	@classmethod
+	def from_state(cls, filename):
+		# GMRF restored from a save_state file without loading or computing the prior precision matrices
+		gmrf = cls.__new__(cls)
+		gmrf.load_state(filename)
+		return gmrf
+
+	def changed_vertices(self, tol=None):
+		"""Returns the indices of the GMRF vertices whose variance changed by more than tol
+			since they were last reported, so planners can re-score only the edges crossing them
+		"""
+		if tol is None:
+			tol = Config.var_change_tol
+		changed = np.nonzero(np.abs(self.var_x[:, 0] - self.var_x_reported[:, 0]) > tol)[0]
+		self.var_x_reported[changed] = self.var_x[changed]
+		return changed
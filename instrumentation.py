@@ -0,0 +1,122 @@
+"""
+Timers and counters for the hot paths of the simulation (GMRF update, planners, PI controller).
+Disabled by default, a disabled probe only checks a flag. Measurements are summed over a control step, end_step
+stores them and starts the next step. Enable with Config.profile or enable().
+"""
+import time
+from collections import defaultdict
+from functools import wraps
+
+import numpy as np
+
+enabled = False
+seconds = defaultdict(float)    # timer name -> time spent in the current step
+calls = defaultdict(int)        # timer or counter name -> calls or count in the current step
+steps = []                      # (seconds, calls) of every finished step
+
+
+def enable(on=True):
+	global enabled
+	enabled = on
+
+
+def reset():
+	seconds.clear()
+	calls.clear()
+	del steps[:]
+
+
+def count(name, k=1):
+	if enabled:
+		calls[name] += k
+
+
+class timer(object):
+	# context manager adding the time spent in its block to the timer name
+
+	def __init__(self, name):
+		self.name = name
+		self.start = None
+
+	def __enter__(self):
+		self.start = time.perf_counter() if enabled else None
+		return self
+
+	def __exit__(self, *exc_info):
+		if self.start is not None:
+			seconds[self.name] += time.perf_counter() - self.start
+			calls[self.name] += 1
+		return False
+
+
+def timed(name):
+	# decorator adding the time spent in every call of the function to the timer name
+	def decorator(function):
+		@wraps(function)
+		def wrapper(*args, **kwargs):
+			if not enabled:
+				return function(*args, **kwargs)
+			start = time.perf_counter()
+			try:
+				return function(*args, **kwargs)
+			finally:
+				seconds[name] += time.perf_counter() - start
+				calls[name] += 1
+		return wrapper
+	return decorator
+
+
+def collect():
+	# returns the measurements of the current step and clears them, a worker process sends them to the main process
+	step = (dict(seconds), dict(calls))
+	seconds.clear()
+	calls.clear()
+	return step
+
+
+def merge(step_seconds, step_calls):
+	# adds measurements collected in a worker process to the current step
+	if enabled:
+		for name, value in step_seconds.items():
+			seconds[name] += value
+		for name, value in step_calls.items():
+			calls[name] += value
+
+
+def end_step():
+	# closes the current control step
+	if enabled:
+		steps.append((dict(seconds), dict(calls)))
+	seconds.clear()
+	calls.clear()
+
+
+def names():
+	return sorted(set(name for (step_seconds, step_calls) in steps for name in list(step_seconds) + list(step_calls)))
+
+
+def table():
+	# names and (steps, names) arrays of seconds and calls
+	all_names = names()
+	step_seconds = np.array([[s.get(name, 0.0) for name in all_names] for (s, c) in steps]).reshape(len(steps), len(all_names))
+	step_calls = np.array([[c.get(name, 0) for name in all_names] for (s, c) in steps], dtype=int).reshape(len(steps), len(all_names))
+	return all_names, step_seconds, step_calls
+
+
+def summary():
+	# one line per timer and counter with the totals and means per step
+	all_names, step_seconds, step_calls = table()
+	lines = []
+	for i, name in enumerate(all_names):
+		total_calls = np.sum(step_calls[:, i])
+		line = "{0:<24} calls {1:>9} ({2:.1f}/step)".format(name, total_calls, total_calls / float(max(len(steps), 1)))
+		if np.any(step_seconds[:, i] > 0):
+			line += "  time {0:.3f} s ({1:.4f} s/step)".format(np.sum(step_seconds[:, i]), np.mean(step_seconds[:, i]))
+		lines.append(line)
+	return "\n".join(lines)
+
+
+def save(filename):
+	# stores the finished steps next to the simulation data, see main.py
+	all_names, step_seconds, step_calls = table()
+	np.savez(filename, names=np.array(all_names), seconds=step_seconds, calls=step_calls)
@@ -0,0 +1,216 @@
+"""
+Live plot of the simulation drawn by a separate renderer process, so plotting does not change the control timing.
+The control loop sends compact snapshots (mean and variance grids, trajectory, planned path) over a short queue and
+never waits: if the queue is full the snapshot is dropped, and the renderer only draws the newest snapshot it has.
+The figure is set up once, every frame only updates the data of persistent artists and blits them.
+"""
+import queue
+
+import numpy as np
+
+import Config
+
+
+class LivePlot(object):
+
+	def __init__(self, true_field, params, field_dim, vmin, vmax, var_min, var_max, levels, PlotField, LabelVertices):
+		"""
+		:param true_field: true_field object, its grid is sent to the renderer once
+		:param params: GMRF.params
+		:param field_dim: [x_min, x_max, y_min, y_max] of the field
+		other parameters are the plot settings of main.py
+		"""
+		self.params = params
+		self.field_dim = field_dim
+		self.full_grid = PlotField
+		context = Config.process_context()
+		self.queue = context.Queue(maxsize=2)
+		self.dropped = 0    # snapshots dropped because the renderer fell behind
+		settings = figure_settings(params, field_dim, vmin, vmax, var_min, var_max, levels, PlotField, LabelVertices)
+		field = (true_field.x_field, true_field.y_field, true_field.z_field)
+		self.process = context.Process(target=render, args=(self.queue, field, extent(params, field_dim, PlotField), settings))
+		self.process.daemon = True
+		self.process.start()
+
+	def update(self, control, x_auv, mue_x, var_x, trajectory, tau_x, tau_optimal):
+		# sends a snapshot of the current step, returns at once
+		snapshot = {'mean': grid(self.params, mue_x, self.full_grid), 'var': grid(self.params, var_x, self.full_grid), 'x_auv': np.array(x_auv[:3], dtype=float),
+					'trajectory': np.asarray(trajectory)[:, :2].astype(np.float32),
+					'path': np.asarray(tau_optimal)[:2].astype(np.float32) if tau_optimal is not None else None,
+					'rollouts': np.asarray(tau_x)[:2].astype(np.float32) if tau_x is not None else None,
+					'nodes': planner_nodes(control)}
+		try:
+			self.queue.put_nowait(snapshot)
+		except queue.Full:
+			self.dropped += 1
+
+	def close(self):
+		# stops the renderer, snapshots it has not taken yet are discarded
+		try:
+			self.queue.put(None, timeout=1.0)
+		except queue.Full:
+			pass
+		self.process.join(timeout=5.0)
+		if self.process.is_alive():
+			self.process.terminate()
+		self.queue.cancel_join_thread()
+
+
+def figure_settings(params, field_dim, vmin, vmax, var_min, var_max, levels, PlotField, LabelVertices):
+	# settings of make_figure from the plot settings of main.py
+	return {'vmin': vmin, 'vmax': vmax, 'var_min': var_min, 'var_max': var_max, 'levels': levels,
+			'vertices': vertices(params) if PlotField else None, 'labels': PlotField and LabelVertices, 'field_dim': list(field_dim)}
+
+
+def extent(params, field_dim, full_grid):
+	# [x_min, x_max, y_min, y_max] of the plotted grid, the whole GMRF or only the vertices inside the field
+	(lxf, lyf, dvx, dvy, lx, ly, n, p, de, l_TH, p_THETA, xg_min, xg_max, yg_min, yg_max) = params
+	if full_grid:
+		return [xg_min, xg_max, yg_min, yg_max]
+	return list(field_dim)
+
+
+def vertices(params):
+	# (2, lx * ly) positions of the GMRF vertices
+	(lxf, lyf, dvx, dvy, lx, ly, n, p, de, l_TH, p_THETA, xg_min, xg_max, yg_min, yg_max) = params
+	xv, yv = np.meshgrid(np.linspace(xg_min, xg_max, lx), np.linspace(yg_min, yg_max, ly))
+	return np.vstack((xv.ravel(), yv.ravel()))
+
+
+def grid(params, values, full_grid):
+	# (ly, lx) image of a GMRF vector, only the vertices inside the field unless full_grid
+	(lxf, lyf, dvx, dvy, lx, ly, n, p, de, l_TH, p_THETA, xg_min, xg_max, yg_min, yg_max) = params
+	values = np.ravel(values)[:lx * ly].reshape((ly, lx))
+	if not full_grid:
+		values = values[dvy:(lyf + dvy), dvx:(lxf + dvx)]
+	return values.astype(np.float32)
+
+
+def planner_nodes(control):
+	# (N, 2) positions of the tree or roadmap nodes of a sampling planner, None for the other controllers
+	if control is None:
+		return None
+	if hasattr(control, 'tree'):
+		poses = control.tree.pose[:len(control.tree)]
+	elif hasattr(control, 'roadmap'):
+		poses = control.roadmap.pose
+	elif hasattr(control, 'node_list'):
+		poses = np.array([node.pose for node in control.node_list])
+	else:
+		return None
+	return np.asarray(poses)[:, :2].astype(np.float32)
+
+
+def make_figure(plt, field, extent, settings, animated=True):
+	"""
+	Sets up the plot once. Returns the figure, its (axes, artist) pairs that change between frames and a function
+	that loads a snapshot into them. Animated artists are left out of full draws so they can be blitted, the offline
+	renderer (recorder.py) saves full draws and uses animated=False
+	"""
+	from matplotlib.collections import LineCollection
+
+	(x_field, y_field, z_field) = field
+	fig = plt.figure(figsize=(9, 4))
+	ax0 = fig.add_subplot(221)
+	ax0.set_title('True Field')
+	if z_field is not None:
+		fig.colorbar(ax0.contourf(x_field, y_field, z_field, vmin=settings['vmin'], vmax=settings['vmax'], levels=settings['levels']), ax=ax0)
+	ax1 = fig.add_subplot(222)
+	ax1.set_title('GMRF Mean')
+	ax2 = fig.add_subplot(223)
+	ax2.set_title('GMRF Variance')
+	for ax in (ax0, ax1, ax2):
+		ax.set_xlabel('x (m)')
+		ax.set_ylabel('y (m)')
+
+	mean = ax1.imshow(np.zeros((2, 2)), extent=extent, origin='lower', aspect='auto', vmin=settings['vmin'], vmax=settings['vmax'], animated=animated)
+	var = ax2.imshow(np.zeros((2, 2)), extent=extent, origin='lower', aspect='auto', vmin=settings['var_min'], vmax=settings['var_max'], animated=animated)
+	fig.colorbar(mean, ax=ax1)
+	fig.colorbar(var, ax=ax2)
+	if settings['vertices'] is not None:
+		# static, part of the background
+		(x_min, x_max, y_min, y_max) = settings['field_dim']
+		for ax in (ax1, ax2):
+			ax.scatter(settings['vertices'][0], settings['vertices'][1], marker='+', facecolors='dimgrey')
+			ax.plot([x_min, x_min, x_max, x_max, x_min], [y_min, y_max, y_max, y_min, y_min], "k")
+		if settings['labels']:
+			for i, (x, y) in enumerate(settings['vertices'].T):
+				ax1.annotate('{0}'.format(i), xy=(x, y), xytext=(-2, 2), textcoords='offset points', ha='center', va='center')
+	auv = [ax.plot([], [], marker='o', markerfacecolor='none', animated=animated)[0] for ax in (ax0, ax1)]
+	nodes = ax2.plot([], [], linestyle='', marker='.', markersize=2, color='b', animated=animated)[0]
+	edges = LineCollection([], colors='green', linewidths=.5, animated=animated)
+	ax2.add_collection(edges)
+	rollouts = LineCollection([], colors='black', linewidths=.5, animated=animated)
+	ax2.add_collection(rollouts)
+	trajectory = ax2.plot([], [], color='yellow', animated=animated)[0]
+	path = ax2.plot([], [], color='blue', animated=animated)[0]
+	heading = ax2.quiver([0], [0], [0], [0], width=.005, animated=animated)
+	for ax in (ax1, ax2):
+		ax.set_xlim(extent[0], extent[1])
+		ax.set_ylim(extent[2], extent[3])
+	artists = [(ax1, mean), (ax2, var), (ax0, auv[0]), (ax1, auv[1]), (ax2, nodes), (ax2, edges), (ax2, rollouts),
+			   (ax2, trajectory), (ax2, path), (ax2, heading)]
+
+	def load(snapshot):
+		mean.set_data(snapshot['mean'])
+		var.set_data(snapshot['var'])
+		x_auv = snapshot['x_auv']
+		for marker in auv:
+			marker.set_data([x_auv[0]], [x_auv[1]])
+		heading.set_offsets([x_auv[:2]])
+		heading.set_UVC([np.cos(x_auv[2])], [np.sin(x_auv[2])])
+		trajectory.set_data(snapshot['trajectory'][:, 0], snapshot['trajectory'][:, 1])
+		if snapshot['path'] is not None:
+			path.set_data(snapshot['path'][0], snapshot['path'][1])
+		if snapshot['rollouts'] is not None:
+			rollouts.set_segments(np.transpose(snapshot['rollouts'], (2, 1, 0)))
+		if snapshot['nodes'] is not None:
+			nodes.set_data(snapshot['nodes'][:, 0], snapshot['nodes'][:, 1])
+		if snapshot.get('edges') is not None:
+			edges.set_segments(snapshot['edges'])
+
+	return fig, artists, load
+
+
+def render(snapshots, field, extent, settings):
+	# renderer process, runs until it receives None or its window is closed
+	import matplotlib.pyplot as plt
+
+	fig, artists, load = make_figure(plt, field, extent, settings)
+	canvas = fig.canvas
+	state = {'background': None}
+
+	def capture(event=None):
+		# the background has to be taken again after every full redraw, e.g. when the window is resized
+		state['background'] = canvas.copy_from_bbox(fig.bbox) if getattr(canvas, 'supports_blit', False) else None
+
+	canvas.mpl_connect('draw_event', capture)
+	plt.show(block=False)
+	canvas.draw()
+
+	while plt.fignum_exists(fig.number):
+		try:
+			snapshot = snapshots.get(timeout=0.05)
+		except queue.Empty:
+			canvas.flush_events()
+			continue
+		# only the newest snapshot is drawn
+		while snapshot is not None:
+			try:
+				snapshot = snapshots.get_nowait()
+			except queue.Empty:
+				break
+		if snapshot is None:
+			break
+
+		load(snapshot)
+		if state['background'] is None:
+			# no blitting on this backend, animated artists are skipped by a full draw and drawn on top of it
+			canvas.draw()
+		else:
+			canvas.restore_region(state['background'])
+		for (ax, artist) in artists:
+			ax.draw_artist(artist)
+		canvas.blit(fig.bbox)
+		canvas.flush_events()
+	plt.close(fig)
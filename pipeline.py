@@ -0,0 +1,110 @@
+"""
+Pipelined control loop: the GMRF update runs in a worker process and overlaps with the planner. Every step main.py
+sends the new measurement to the worker and plans with the newest posterior that is already available, which may
+be missing the latest measurements. The staleness bound is the number of measurements the posterior may lag
+behind; with 0 every step waits for its own update as in the sequential loop, with 1 the update of a step overlaps
+with its planner. The worker owns the GMRF, close() returns it with every measurement absorbed. If instrumentation
+is enabled, the worker sends its timers and counters with every posterior and they are added to the step of the
+main process that receives it.
+"""
+import time
+
+import numpy as np
+
+import Config
+import instrumentation
+
+
+def run_worker(connection, gmrf, profile):
+	# worker process, absorbs measurements until it receives None and then sends back the GMRF
+	instrumentation.enable(profile)
+	while True:
+		message = connection.recv()
+		if message is None:
+			connection.send(gmrf)
+			break
+		(k, x_auv, y_t) = message
+		start = time.perf_counter()
+		mue_x, var_x, pi_theta = gmrf.gmrf_bayese_update(x_auv, y_t)
+		update_time = time.perf_counter() - start
+		connection.send((k, mue_x, var_x, pi_theta, gmrf.changed_vertices(), update_time, instrumentation.collect()))
+	connection.close()
+
+
+class Pipeline(object):
+
+	def __init__(self, gmrf, staleness=1):
+		"""
+		:param gmrf: GMRF after initialization, it is handed over to the worker process
+		:param staleness: number of the latest measurements the posterior used for planning may be missing
+		"""
+		self.params = gmrf.params
+		self.staleness = staleness
+		context = Config.process_context()
+		self.connection, worker_connection = context.Pipe()
+		self.process = context.Process(target=run_worker, args=(worker_connection, gmrf, instrumentation.enabled))
+		self.process.daemon = True
+		self.process.start()
+		worker_connection.close()
+		self.sent = 0       # measurements sent to the worker
+		self.absorbed = 0   # posteriors received from the worker
+		self.posterior = None
+		self.changed = set()
+		self.measure_time = None
+		self.lags = []          # measurements missing from the posterior of every planner run
+		self.latencies = []     # seconds from a measurement to the control of its step
+		self.update_times = []  # seconds of every GMRF update in the worker
+
+	def measure(self, x_auv, y_t):
+		# hands a measurement to the worker, returns at once
+		self.measure_time = time.perf_counter()
+		self.connection.send((self.sent, np.array(x_auv, dtype=float), np.array(y_t, dtype=float)))
+		self.sent += 1
+
+	def receive(self):
+		(k, mue_x, var_x, pi_theta, changed, update_time, (step_seconds, step_calls)) = self.connection.recv()
+		instrumentation.merge(step_seconds, step_calls)
+		self.absorbed = k + 1
+		self.posterior = (mue_x, var_x, pi_theta)
+		self.changed.update(changed)
+		self.update_times.append(update_time)
+
+	def latest(self):
+		"""Newest posterior (mue_x, var_x, pi_theta) within the staleness bound and the GMRF vertices whose variance
+			changed since the last call. Waits for the worker only if the bound or the first posterior requires it
+		"""
+		while self.sent - self.absorbed > self.staleness or self.absorbed == 0:
+			self.receive()
+		while self.connection.poll():
+			self.receive()
+		self.lags.append(self.sent - self.absorbed)
+		changed = np.array(sorted(self.changed), dtype=int)
+		self.changed = set()
+		return self.posterior + (changed,)
+
+	def controlled(self):
+		# marks the control of the newest measurement as ready
+		self.latencies.append(time.perf_counter() - self.measure_time)
+
+	def close(self):
+		# absorbs the remaining measurements, stops the worker and returns its GMRF. The instrumentation of the updates
+		# that were still running is stored as one more step
+		if self.absorbed < self.sent:
+			while self.absorbed < self.sent:
+				self.receive()
+			instrumentation.end_step()
+		self.connection.send(None)
+		gmrf = self.connection.recv()
+		self.process.join()
+		self.connection.close()
+		return gmrf
+
+	def summary(self):
+		latencies = np.array(self.latencies)
+		if not len(latencies):
+			return "no control steps"
+		lags = np.array(self.lags)
+		return ("control latency mean {0:.3f} s p90 {1:.3f} s max {2:.3f} s, GMRF update mean {3:.3f} s, "
+				"posterior behind by {4:.2f} measurements on average (max {5}, bound {6})").format(
+			np.mean(latencies), np.percentile(latencies, 90), np.max(latencies), np.mean(self.update_times),
+			np.mean(lags), np.max(lags), self.staleness)
@@ -0,0 +1,220 @@
+"""
+Headless recorder of the simulation for offline replays. Every control step appends a snapshot (GMRF mean, variance
+and hyperparameter posterior, AUV pose, planned path and optionally the planner tree) to a buffer, which is written
+as one compressed npz chunk of a zip file every chunk_size steps. Paths and trees have a different length every step,
+they are kept in flat arrays with per step lengths like the edges in Tree.
+
+The recording is rendered separately, in parallel over the frames:
+	python recorder.py data/<run>_record.zip frames [--workers 4] [--every 1] [--video replay.mp4]
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import subprocess
+import sys
+import zipfile
+from collections import defaultdict
+
+import numpy as np
+
+import live_plot
+
+# names of the entries of GMRF.params
+param_names = ('lxf', 'lyf', 'dvx', 'dvy', 'lx', 'ly', 'n', 'p', 'de', 'l_TH', 'p_THETA', 'xg_min', 'xg_max', 'yg_min', 'yg_max')
+
+
+class Recorder(object):
+
+	def __init__(self, filename, params, field_dim, plot_settings, true_field=None, chunk_size=50, tree=False):
+		"""
+		:param filename: zip file the recording is written to
+		:param params: GMRF.params
+		:param field_dim: [x_min, x_max, y_min, y_max] of the field
+		:param plot_settings: plot settings of main.py, used when rendering
+		:param true_field: true_field object, if given its grid is stored for the true field plot
+		:param chunk_size: number of steps per chunk
+		:param tree: whether to store the tree nodes and edges of RRT, RRT*, PRM and PRM*
+		"""
+		self.zip = zipfile.ZipFile(filename, 'w', zipfile.ZIP_STORED)   # the chunks are compressed already
+		self.chunk_size = chunk_size
+		self.tree = tree
+		self.steps = 0
+		self.chunks = 0
+		self.buffer = defaultdict(list)
+		meta = {name: np.asarray(value) for name, value in zip(param_names, params)}
+		meta.update({'setting_' + name: np.asarray(value) for name, value in plot_settings.items()})
+		meta['field_dim'] = np.asarray(field_dim, dtype=float)
+		if true_field is not None:
+			meta.update(x_field=true_field.x_field, y_field=true_field.y_field, z_field=np.asarray(true_field.z_field, dtype=np.float32))
+		self.write('meta.npz', meta)
+
+	def record(self, x_auv, mue_x, var_x, pi_theta, tau_optimal, control=None):
+		buffer = self.buffer
+		buffer['step'].append(self.steps)
+		buffer['x_auv'].append(np.array(np.ravel(x_auv)[:3], dtype=float))
+		buffer['mue_x'].append(np.array(np.ravel(mue_x), dtype=np.float32))
+		buffer['var_x'].append(np.array(np.ravel(var_x), dtype=np.float32))
+		buffer['pi_theta'].append(np.array(np.ravel(pi_theta), dtype=np.float32))
+		path = np.zeros(shape=(0, 2)) if tau_optimal is None else np.asarray(tau_optimal)[:2].T
+		buffer['path'].append(path.astype(np.float32))
+		buffer['path_len'].append(len(path))
+		if self.tree:
+			nodes, parents = planner_edges(control)
+			buffer['nodes'].append(nodes)
+			buffer['parents'].append(parents)
+			buffer['tree_len'].append(len(nodes))
+		self.steps += 1
+		if len(buffer['step']) >= self.chunk_size:
+			self.flush()
+
+	def flush(self):
+		if not self.buffer['step']:
+			return
+		chunk = {}
+		for name, values in self.buffer.items():
+			chunk[name] = np.concatenate(values) if name in ('path', 'nodes', 'parents') else np.array(values)
+		self.write('chunk_{0:05d}.npz'.format(self.chunks), chunk)
+		self.chunks += 1
+		self.buffer = defaultdict(list)
+
+	def write(self, name, arrays):
+		data = io.BytesIO()
+		np.savez_compressed(data, **arrays)
+		self.zip.writestr(name, data.getvalue())
+
+	def close(self):
+		self.flush()
+		self.zip.close()
+
+
+def planner_edges(control):
+	# (N, 2) node positions and (N,) parent index (-1 for the root) of a sampling planner, empty for other controllers
+	if control is not None and hasattr(control, 'tree'):
+		n = len(control.tree)
+		return control.tree.pose[:n, :2].astype(np.float32), control.tree.parent[:n].astype(np.int32)
+	if control is not None and hasattr(control, 'node_list'):
+		index = {id(node): i for i, node in enumerate(control.node_list)}
+		parents = [index.get(id(node.parent), -1) for node in control.node_list]
+		return np.array([node.pose[:2] for node in control.node_list], dtype=np.float32), np.array(parents, dtype=np.int32)
+	return np.zeros(shape=(0, 2), dtype=np.float32), np.zeros(0, dtype=np.int32)
+
+
+class Recording(object):
+	# read access to a recording
+
+	def __init__(self, filename):
+		self.filename = filename
+		with zipfile.ZipFile(filename) as archive:
+			self.chunk_names = sorted(name for name in archive.namelist() if name.startswith('chunk_'))
+			with np.load(io.BytesIO(archive.read('meta.npz'))) as meta:
+				self.meta = {name: meta[name] for name in meta.files}
+		self.params = tuple(self.meta[name].item() if self.meta[name].ndim == 0 else self.meta[name] for name in param_names)
+		self.settings = {name[len('setting_'):]: value.item() if value.ndim == 0 else value for name, value in self.meta.items() if name.startswith('setting_')}
+		# the whole trajectory, every frame shows the trajectory up to its step
+		self.x_auv = np.concatenate([self.chunk(i, ['x_auv'])['x_auv'] for i in range(len(self.chunk_names))]) if self.chunk_names else np.zeros(shape=(0, 3))
+
+	def chunk(self, i, names=None):
+		# arrays of chunk i, only the given ones if names is not None
+		with zipfile.ZipFile(self.filename) as archive:
+			with np.load(io.BytesIO(archive.read(self.chunk_names[i]))) as data:
+				return {name: data[name] for name in (data.files if names is None else names)}
+
+	def field(self):
+		if 'z_field' in self.meta:
+			return self.meta['x_field'], self.meta['y_field'], self.meta['z_field']
+		return None, None, None
+
+	def snapshots(self, i):
+		# (step, snapshot for live_plot.make_figure) of every step of chunk i
+		chunk = self.chunk(i)
+		full_grid = bool(self.settings['PlotField'])
+		path_start = np.cumsum(chunk['path_len']) - chunk['path_len']
+		if 'tree_len' in chunk:
+			tree_start = np.cumsum(chunk['tree_len']) - chunk['tree_len']
+		for k, step in enumerate(chunk['step']):
+			path = chunk['path'][path_start[k]:path_start[k] + chunk['path_len'][k]]
+			snapshot = {'mean': live_plot.grid(self.params, chunk['mue_x'][k], full_grid),
+						'var': live_plot.grid(self.params, chunk['var_x'][k], full_grid),
+						'x_auv': chunk['x_auv'][k], 'trajectory': self.x_auv[:step + 1, :2], 'path': path.T, 'rollouts': None,
+						'nodes': np.zeros(shape=(0, 2)), 'edges': []}
+			if 'tree_len' in chunk:
+				nodes = chunk['nodes'][tree_start[k]:tree_start[k] + chunk['tree_len'][k]]
+				parents = chunk['parents'][tree_start[k]:tree_start[k] + chunk['tree_len'][k]]
+				child = np.nonzero(parents >= 0)[0]
+				snapshot['nodes'] = nodes
+				snapshot['edges'] = np.stack((nodes[parents[child]], nodes[child]), axis=1)
+			yield int(step), snapshot
+
+
+# figure of a render worker, set up once per process
+worker = {}
+
+
+def init_worker(filename):
+	import matplotlib
+	matplotlib.use('Agg')
+	import matplotlib.pyplot as plt
+	recording = Recording(filename)
+	s = recording.settings
+	settings = live_plot.figure_settings(recording.params, recording.meta['field_dim'], s['vmin'], s['vmax'], s['var_min'], s['var_max'],
+										 s['levels'], bool(s['PlotField']), bool(s['LabelVertices']))
+	extent = live_plot.extent(recording.params, recording.meta['field_dim'], bool(s['PlotField']))
+	fig, artists, load = live_plot.make_figure(plt, recording.field(), extent, settings, animated=False)
+	worker.update(recording=recording, fig=fig, load=load)
+
+
+def render_chunk(task):
+	# renders the frames of one chunk, returns their number
+	(i, directory, every, dpi) = task
+	count = 0
+	for step, snapshot in worker['recording'].snapshots(i):
+		if step % every:
+			continue
+		worker['load'](snapshot)
+		worker['fig'].savefig(os.path.join(directory, 'frame_{0:05d}.png'.format(step // every)), dpi=dpi)
+		count += 1
+	return count
+
+
+def render(filename, directory, workers=None, every=1, dpi=100):
+	# renders every frame of the recording to directory/frame_<n>.png, chunks are spread over the worker processes
+	if not os.path.isdir(directory):
+		os.makedirs(directory)
+	recording = Recording(filename)
+	tasks = [(i, directory, every, dpi) for i in range(len(recording.chunk_names))]
+	pool = multiprocessing.Pool(workers, initializer=init_worker, initargs=(filename,))
+	try:
+		count = sum(pool.map(render_chunk, tasks))
+	finally:
+		pool.close()
+		pool.join()
+	return count
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Renders a recording of recorder.Recorder to images or a video")
+	parser.add_argument('recording')
+	parser.add_argument('directory', help="the frames are written here")
+	parser.add_argument('--workers', type=int, default=None, help="render processes, all cores by default")
+	parser.add_argument('--every', type=int, default=1, help="only render every n-th step")
+	parser.add_argument('--dpi', type=int, default=100)
+	parser.add_argument('--video', default=None, help="also encode the frames to this video file (needs ffmpeg)")
+	parser.add_argument('--fps', type=int, default=10)
+	args = parser.parse_args(argv)
+
+	count = render(args.recording, args.directory, args.workers, args.every, args.dpi)
+	print("rendered", count, "frames to", args.directory)
+	if args.video is not None:
+		command = ['ffmpeg', '-y', '-framerate', str(args.fps), '-i', os.path.join(args.directory, 'frame_%05d.png'),
+				   '-pix_fmt', 'yuv420p', '-vf', 'pad=ceil(iw/2)*2:ceil(ih/2)*2', args.video]
+		try:
+			return subprocess.call(command)
+		except OSError:
+			print("ffmpeg not found, the frames are in", args.directory)
+			return 1
+	return 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
@@ -0,0 +1,179 @@
+"""
+Measurement logs and an offline replay engine for the GMRF update. With Config.log_measurements the simulation writes
+every (x_auv, y_t) pair it feeds to gmrf_bayese_update, together with its seed and the GMRF settings, to
+data/<run>_measurements.npz. A log can then be replayed through one or more GMRF backends without a planner in the
+loop, at full speed:
+	python replay.py data/<run>_measurements.npz
+	python replay.py log.npz --backend gp_scripts.gp_scripts:GMRF --backend mymodule:FastGMRF
+A backend is any class that is created like gp_scripts.GMRF(gmrf_dim, alpha_prior, kappa_prior, set_Q_init) and has
+gmrf_bayese_update(x_auv, y_t) returning (mue_x, var_x, pi_theta). If the run started from a checkpoint
+(Config.gmrf_state), its file name is stored in the log and the backend is created with from_state(filename) instead,
+so the checkpoint has to be found under that name when replaying. Every backend after the first is checked against
+the first one, a disagreement beyond the tolerances gives exit code 1.
+"""
+import argparse
+import contextlib
+import importlib
+import io
+import json
+import sys
+import time
+
+import numpy as np
+
+import Config
+import instrumentation
+
+# Version of the log files, increased whenever their content changes
+log_version = 2
+reference_backend = 'gp_scripts.gp_scripts:GMRF'
+
+
+class MeasurementLog(object):
+
+	def __init__(self, filename, seed=None, gmrf_state=None):
+		"""
+		:param filename: npz file the log is written to by close
+		:param seed: seed of the simulation noise, None if the run was not seeded
+		:param gmrf_state: save_state file the GMRF of the run started from, None if it started from the prior
+		"""
+		self.filename = filename
+		self.seed = seed
+		self.gmrf_state = gmrf_state
+		self.x_auv = []
+		self.y_t = []
+
+	def record(self, x_auv, y_t):
+		self.x_auv.append(np.array(np.ravel(x_auv)[:3], dtype=float))
+		self.y_t.append(float(np.ravel(y_t)[0]))
+
+	def close(self):
+		np.savez(self.filename, version=log_version, seed=-1 if self.seed is None else self.seed, gmrf_state=self.gmrf_state or '',
+				 x_auv=np.array(self.x_auv).reshape(len(self.x_auv), 3), y_t=np.array(self.y_t),
+				 gmrf_dim=np.array(Config.gmrf_dim), alpha_prior=Config.alpha_prior, kappa_prior=Config.kappa_prior,
+				 sigma_w_squ=Config.sigma_w_squ, field_dim=np.array(Config.field_dim, dtype=float))
+
+
+def load(filename):
+	# dict of the arrays of a measurement log
+	with np.load(filename) as data:
+		if int(data['version']) != log_version:
+			raise ValueError("measurement log {0} has version {1}, expected {2}".format(filename, int(data['version']), log_version))
+		return {name: data[name] for name in data.files}
+
+
+def backend_class(spec):
+	# class of a backend given as 'module:Class'
+	(module, class_name) = spec.split(':')
+	return getattr(importlib.import_module(module), class_name)
+
+
+@contextlib.contextmanager
+def log_config(log):
+	# the GMRF reads the field and measurement noise from Config, they are set to the ones of the logged run
+	saved = (Config.field_dim, Config.sigma_w_squ)
+	Config.field_dim = list(log['field_dim'])
+	Config.sigma_w_squ = float(log['sigma_w_squ'])
+	try:
+		yield
+	finally:
+		(Config.field_dim, Config.sigma_w_squ) = saved
+
+
+def replay(log, spec, limit=None, profile=False):
+	"""Feeds the measurements of a log through a backend
+		Output: statistics, (steps, n + p) predictive means and variances, (steps, l_TH) hyperparameter posteriors
+	"""
+	gmrf_state = str(log['gmrf_state'])
+	if not gmrf_state and list(log['gmrf_dim']) != list(Config.gmrf_dim):
+		raise ValueError("the log was recorded with gmrf_dim {0}, the stored precision matrices are for Config.gmrf_dim {1}".format(list(log['gmrf_dim']), Config.gmrf_dim))
+	steps = len(log['y_t']) if limit is None else min(limit, len(log['y_t']))
+	with log_config(log):
+		start = time.perf_counter()
+		with contextlib.redirect_stdout(io.StringIO()):
+			if gmrf_state:
+				# the run started from a checkpoint instead of the prior
+				gmrf = backend_class(spec).from_state(gmrf_state)
+			else:
+				gmrf = backend_class(spec)(list(log['gmrf_dim']), log['alpha_prior'], log['kappa_prior'], False)
+		init_time = time.perf_counter() - start
+
+		instrumentation.reset()
+		instrumentation.enable(profile)
+		latency = np.zeros(steps)
+		(mue, var, pi) = ([], [], [])
+		for k in range(steps):
+			y_t = np.array([log['y_t'][k]])
+			start = time.perf_counter()
+			(mue_x, var_x, pi_theta) = gmrf.gmrf_bayese_update(log['x_auv'][k], y_t)
+			latency[k] = time.perf_counter() - start
+			instrumentation.end_step()
+			# the backend may update its arrays in place
+			mue.append(np.ravel(mue_x).copy())
+			var.append(np.ravel(var_x).copy())
+			pi.append(np.ravel(pi_theta).copy())
+		instrumentation.enable(False)
+
+	stats = {'backend': spec, 'steps': steps, 'init_seconds': init_time, 'total_seconds': float(np.sum(latency)),
+			 'updates_per_second': steps / max(float(np.sum(latency)), 1e-12)}
+	for q in (50, 90, 99):
+		stats['p%d' % q] = float(np.percentile(latency, q)) if steps else 0.0
+	stats.update(mean=float(np.mean(latency)) if steps else 0.0, max=float(np.max(latency)) if steps else 0.0)
+	if profile:
+		stats['profile'] = instrumentation.summary()
+	return stats, np.array(mue), np.array(var), np.array(pi)
+
+
+def agreement(reference, result, rtol, atol):
+	# largest absolute deviation of the means, variances and posteriors of a backend from the reference and whether
+	# every value is within atol + rtol * |reference|
+	deviation = {}
+	for name, expected, actual in zip(('mue_x', 'var_x', 'pi_theta'), reference, result):
+		if expected.shape != actual.shape:
+			deviation[name] = {'shape': [list(expected.shape), list(actual.shape)], 'close': False}
+			continue
+		error = np.abs(actual - expected)
+		deviation[name] = {'abs': float(np.max(error)) if error.size else 0.0, 'close': bool(np.all(error <= atol + rtol * np.abs(expected)))}
+	return deviation
+
+
+def main(argv=None):
+	parser = argparse.ArgumentParser(description="Replays a measurement log through GMRF backends")
+	parser.add_argument('log')
+	parser.add_argument('--backend', action='append', default=None, help="module:Class, may be given several times, the first is the reference")
+	parser.add_argument('--steps', type=int, default=None, help="only replay the first measurements")
+	parser.add_argument('--rtol', type=float, default=1e-7)
+	parser.add_argument('--atol', type=float, default=1e-10)
+	parser.add_argument('--profile', action='store_true', help="also time the solves inside the update, see instrumentation.py")
+	parser.add_argument('--output', default=None, help="write the statistics to this JSON file")
+	args = parser.parse_args(argv)
+
+	log = load(args.log)
+	print("log:", args.log, len(log['y_t']), "measurements, seed", int(log['seed']))
+	if str(log['gmrf_state']):
+		print("starting from the GMRF checkpoint", str(log['gmrf_state']))
+	reports = []
+	reference = None
+	disagree = False
+	for spec in args.backend or [reference_backend]:
+		stats, mue, var, pi = replay(log, spec, args.steps, args.profile)
+		print("{0:<32} {1:8.1f} updates/s  p50 {2:.4f} s  p90 {3:.4f} s  p99 {4:.4f} s  max {5:.4f} s  init {6:.2f} s".format(
+			spec, stats['updates_per_second'], stats['p50'], stats['p90'], stats['p99'], stats['max'], stats['init_seconds']))
+		if args.profile:
+			print(stats['profile'])
+		if reference is None:
+			reference = (mue, var, pi)
+		else:
+			stats['deviation'] = agreement(reference, (mue, var, pi), args.rtol, args.atol)
+			stats['agrees'] = all(d['close'] for d in stats['deviation'].values())
+			disagree = disagree or not stats['agrees']
+			print("{0:<32} {1} {2}".format('', 'agrees' if stats['agrees'] else 'DISAGREES', json.dumps(stats['deviation'])))
+		reports.append(stats)
+	if args.output is not None:
+		with open(args.output, 'w') as f:
+			json.dump({'log': args.log, 'backends': reports}, f, indent=1, sort_keys=True)
+	return 1 if disagree else 0
+
+
+if __name__ == '__main__':
+	sys.exit(main())
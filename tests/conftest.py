@@ -0,0 +1,22 @@
+import os
+import sys
+
+import numpy as np
+import pytest
+
+# the modules of the simulation are imported from the repository root, like main.py does
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import Config
+
+
+@pytest.fixture
+def gmrf_params():
+	# GMRF.params for Config.field_dim and Config.gmrf_dim, computed like GMRF.__init__ does without loading the
+	# precision matrices
+	x_min, x_max, y_min, y_max = Config.field_dim
+	lxf, lyf, dvx, dvy = Config.gmrf_dim
+	lx, ly = lxf + 2 * dvx, lyf + 2 * dvy
+	de = np.array([float(x_max - x_min) / (lxf - 1), float(y_max - y_min) / (lyf - 1)])
+	l_TH = len(Config.alpha_prior) * len(Config.kappa_prior)
+	return (lxf, lyf, dvx, dvy, lx, ly, lx * ly, 1, de, l_TH, 1.0 / l_TH,
+			x_min - dvx * de[0], x_max + dvx * de[0], y_min - dvy * de[1], y_max + dvy * de[1])
@@ -0,0 +1,32 @@
+import time
+
+import pytest
+
+from control_algorithms.base.budget import make_budget
+
+
+def iterations(budget, nodes=lambda k: 1):
+	# number of planner iterations until the budget is exhausted
+	budget.start()
+	k = 0
+	while not budget.exhausted(nodes(k)):
+		k += 1
+	return k
+
+
+def test_iteration_and_node_budgets():
+	assert iterations(make_budget('iterations', 0.0, max_iterations=25)) == 25
+	assert iterations(make_budget('nodes', 0.0, max_nodes=10), lambda k: 1 + k // 3) == 27
+	# a tree that stops growing ends after 100 iterations per node
+	assert iterations(make_budget('nodes', 0.0, max_nodes=10)) == 1000
+	budget = make_budget('iterations', 0.0, max_iterations=5)
+	assert iterations(budget) == iterations(budget) == 5
+
+
+def test_time_budget():
+	budget = make_budget('time', 0.05)
+	start = time.time()
+	iterations(budget)
+	assert 0.05 <= time.time() - start < 1.0
+	with pytest.raises(ValueError):
+		make_budget('steps', 1.0)
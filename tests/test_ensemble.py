@@ -0,0 +1,36 @@
+import numpy as np
+
+import Config
+from control_algorithms import ensemble_control
+from test_planners import field_variance
+
+
+def test_ensemble_plan(gmrf_params, monkeypatch):
+	monkeypatch.setattr(Config, 'planner_budget', 'iterations')
+	monkeypatch.setattr(Config, 'max_iterations', 40)
+	monkeypatch.setattr(Config, 'planner_seed', None)
+	start = np.array([0.5, 0.5, 0.785])
+	control = ensemble_control.Ensemble('RRT_star', start, gmrf_params, field_variance(gmrf_params, 0), 12.0, 2)
+	np.random.seed(7)
+	try:
+		path, u_optimal, tau_optimal = control.control_algorithm()
+	finally:
+		ensemble_control.close_pool()
+	# the ensemble takes one draw from np.random, like a single planner does
+	after = np.random.rand()
+	np.random.seed(7)
+	np.random.randint(0, 2 ** 31 - 1)
+	assert after == np.random.rand()
+	# poses of the path nodes, leaf first, with the offsets of the chosen tree
+	assert path.shape == (len(control.edge_offsets) + 1, 3)
+	np.testing.assert_allclose(path[-1], start)
+	np.testing.assert_allclose(tau_optimal[:, 0], start)
+	assert control.edge_offsets[0] == 0 and len(control.arc_offsets) == len(control.edge_offsets)
+	assert np.all(np.diff(control.edge_offsets) > 0) and control.edge_offsets[-1] < tau_optimal.shape[1]
+
+
+def test_best_plan_skips_failed_trees():
+	failed = (float("inf"), None, None, None, None, None)
+	plans = [failed, (0.3, 'b', None, None, None, None), (0.2, 'c', None, None, None, None)]
+	assert ensemble_control.best_plan(plans)[1] == 'c'
+	assert ensemble_control.best_plan([failed, failed]) is None
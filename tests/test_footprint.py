@@ -0,0 +1,41 @@
+import numpy as np
+
+import Config
+from control_algorithms.RRT_star_control import interpolation_matrix
+from control_algorithms.base import footprint
+
+
+def test_box_max_bounds_the_interpolated_field(gmrf_params):
+	rng = np.random.RandomState(0)
+	n, p = gmrf_params[6], gmrf_params[7]
+	(x_min, x_max, y_min, y_max) = Config.field_dim
+	for _ in range(200):
+		var_x = rng.normal(size=n + p)
+		# boxes may reach beyond the field like the ones of the lazy edge bound, the points stay inside
+		(bx_min, bx_max) = np.sort(rng.uniform(x_min - 2, x_max + 2, 2))
+		(by_min, by_max) = np.sort(rng.uniform(y_min - 2, y_max + 2, 2))
+		if max(bx_min, x_min) > min(bx_max, x_max) or max(by_min, y_min) > min(by_max, y_max):
+			continue
+		px = rng.uniform(max(bx_min, x_min), min(bx_max, x_max), 50)
+		py = rng.uniform(max(by_min, y_min), min(by_max, y_max), 50)
+		bound = footprint.box_max(var_x, bx_min, bx_max, by_min, by_max, gmrf_params)
+		assert np.all(footprint.interpolate(px, py, var_x, gmrf_params) <= bound + 1e-12)
+		vertices, weights = footprint.corner_weights(px, py, gmrf_params)
+		assert np.all(var_x[vertices] <= bound)
+
+
+def test_path_footprint_matches_interpolation_matrix(gmrf_params):
+	rng = np.random.RandomState(1)
+	(lxf, lyf, dvx, dvy, lx, ly, n, p, de, l_TH, p_THETA, xg_min, xg_max, yg_min, yg_max) = gmrf_params
+	var_x = rng.uniform(0.0, 1.0, n + p)
+	px = rng.uniform(-1.0, 11.0, 40)
+	py = rng.uniform(-1.0, 6.0, 40)
+	vertices, weights, outside = footprint.path_footprint(px, py, gmrf_params, Config.field_dim)
+	A = np.zeros(shape=(n + p, 1))
+	inside = 0
+	for (x, y) in zip(px, py):
+		if Config.field_dim[0] <= x <= Config.field_dim[1] and Config.field_dim[2] <= y <= Config.field_dim[3]:
+			A += interpolation_matrix(np.array([x, y, 0.0]), n, p, lx, xg_min, yg_min, de)
+			inside += 1
+	assert outside == len(px) - inside
+	assert np.isclose(np.sum(weights * var_x[vertices]), np.dot(A.T, var_x)[0])
@@ -0,0 +1,40 @@
+import os
+
+import numpy as np
+
+import Config
+from gp_scripts import gp_scripts
+
+
+def Q_t(gmrf, jj):
+	return getattr(gmrf, os.path.join('gp_scripts', "Q_t_" + str(jj)))
+
+
+def assert_same_state(gmrf, other):
+	for name in gp_scripts.state_arrays:
+		np.testing.assert_array_equal(getattr(other, name), getattr(gmrf, name), err_msg=name)
+	for jj in range(gmrf.params[9]):
+		assert (Q_t(gmrf, jj) != Q_t(other, jj)).nnz == 0
+	for value, other_value in zip(gmrf.params, other.params):
+		np.testing.assert_array_equal(other_value, value)
+
+
+def test_save_state_load_state_round_trip(tmp_path):
+	gmrf = gp_scripts.GMRF(Config.gmrf_dim, Config.alpha_prior, Config.kappa_prior, False)
+	gmrf.gmrf_bayese_update(np.array([2.0, 1.5, 0.3]), np.array([0.4]))
+	filename = str(tmp_path / 'gmrf.npz')
+	gmrf.save_state(filename)
+
+	restored = gp_scripts.GMRF.from_state(filename)
+	assert_same_state(gmrf, restored)
+	# loading into a GMRF that holds the prior replaces all of it
+	prior = gp_scripts.GMRF(Config.gmrf_dim, Config.alpha_prior, Config.kappa_prior, False)
+	prior.load_state(filename)
+	assert_same_state(gmrf, prior)
+
+	# the restored posterior continues exactly like the original one
+	x_auv, y_t = np.array([6.0, 3.0, -1.0]), np.array([-0.2])
+	expected = gmrf.gmrf_bayese_update(x_auv, y_t)
+	for (actual, value) in zip(restored.gmrf_bayese_update(x_auv, y_t), expected):
+		np.testing.assert_array_equal(actual, value)
+	assert restored.measurements == gmrf.measurements == 2
@@ -0,0 +1,83 @@
+import math
+
+import numpy as np
+
+from control_algorithms.base import graph_search
+
+
+def random_graph(n, m, seed):
+	rng = np.random.RandomState(seed)
+	frm = rng.randint(0, n, size=m)
+	to = rng.randint(0, n, size=m)
+	# no loops and no parallel edges
+	pairs = np.unique(frm[frm != to] * n + to[frm != to])
+	frm, to = pairs // n, pairs % n
+	dist = rng.uniform(0.5, 2.0, size=len(pairs))
+	var = -rng.uniform(0.0, 3.0, size=len(pairs))
+	return graph_search.CSRGraph.from_edges(n, frm, to, dist, var)
+
+
+def edge(graph, v, w):
+	# index of the edge from v to w
+	edges = graph.edges(v)
+	return edges.start + np.nonzero(graph.indices[edges] == w)[0][0]
+
+
+def walks(graph, source, budget):
+	# (vertices, dist, var) of every walk from source not longer than budget that visits no vertex twice
+	result = []
+	stack = [([source], 0.0, 0.0)]
+	while stack:
+		(path, d, var) = stack.pop()
+		result.append((path, d, var))
+		for e in range(graph.indptr[path[-1]], graph.indptr[path[-1] + 1]):
+			if d + graph.dist[e] <= budget and graph.indices[e] not in path:
+				stack.append((path + [graph.indices[e]], d + graph.dist[e], var + graph.var[e]))
+	return result
+
+
+def test_pareto_labels_dominance():
+	graph = random_graph(8, 20, 3)
+	budget = 4.0
+	labels = graph_search.pareto_labels(graph, 0, budget)
+	paths = [[set(graph_search.label_path(labels, v, index)) for index in range(len(vertex_labels))] for v, vertex_labels in enumerate(labels)]
+	for v, vertex_labels in enumerate(labels):
+		# the labels of a vertex do not dominate each other
+		for i, (d1, var1, _, _) in enumerate(vertex_labels):
+			assert d1 <= budget + 1e-12
+			for j, (d2, var2, _, _) in enumerate(vertex_labels):
+				assert i == j or not (d2 <= d1 and var2 <= var1 and paths[v][j] <= paths[v][i])
+		# the path of every label is simple and has its distance and variance
+		for index, (d, var, _, _) in enumerate(vertex_labels):
+			path = graph_search.label_path(labels, v, index)
+			assert path[0] == 0 and path[-1] == v and len(set(path)) == len(path)
+			edges = [edge(graph, a, b) for (a, b) in zip(path[:-1], path[1:])]
+			(path_d, path_var) = (np.sum(graph.dist[edges]), np.sum(graph.var[edges]))
+			assert math.isclose(path_d, d, abs_tol=1e-9) and math.isclose(path_var, var, abs_tol=1e-9)
+	# every simple walk within the budget is dominated by a label of its last vertex
+	for (path, d, var) in walks(graph, 0, budget):
+		v = path[-1]
+		assert any(ld <= d + 1e-9 and lvar <= var + 1e-9 for (ld, lvar, _, _) in labels[v])
+
+
+def test_bucket_labels_are_simple_paths():
+	graph = random_graph(30, 120, 5)
+	(dist, var, prev, prev_bucket) = labels = graph_search.bucket_labels(graph, 0, 6.0, 0.25)
+	for (v, k) in zip(*np.nonzero(np.isfinite(var))):
+		path = graph_search.bucket_path(labels, v, k)
+		assert path[0] == 0 and path[-1] == v and len(set(path)) == len(path)
+		edges = [edge(graph, a, b) for (a, b) in zip(path[:-1], path[1:])]
+		assert math.isclose(np.sum(graph.var[edges]), var[v, k], abs_tol=1e-9)
+
+
+def test_best_ratio_of_labels_and_buckets():
+	graph = random_graph(30, 120, 11)
+	labels = graph_search.pareto_labels(graph, 0, 5.0)
+	v, index = graph_search.best_ratio(labels, 1.0)
+	(d, var, _, _) = labels[v][index]
+	assert d >= 1.0
+	assert all(ld < 1.0 or lvar / ld >= var / d for vertex_labels in labels for (ld, lvar, _, _) in vertex_labels)
+	# the bucket search keeps a subset of the labels, its best ratio cannot be better
+	buckets = graph_search.bucket_labels(graph, 0, 5.0, 0.25)
+	best = graph_search.best_bucket(buckets, 1.0)
+	assert buckets[1][best] / buckets[0][best] >= var / d - 1e-9
@@ -0,0 +1,30 @@
+import numpy as np
+
+from control_algorithms.base import obstacles
+
+space = [0, 9.9, 0, 4.9]
+
+
+def test_obstacle_shapes():
+	obstacle_map = obstacles.ObstacleMap([(2.0, 2.0, 1.0), ('circle', 5.0, 2.5, 0.8), ('polygon', [(7.0, 1.0), (9.0, 1.0), (8.0, 3.0)])], space)
+	inside = np.array([[2.0, 2.0], [2.3, 2.4], [5.0, 2.5], [5.5, 2.0], [8.0, 1.5], [8.0, 2.5]])
+	outside = np.array([[2.5, 2.0], [1.0, 1.0], [5.7, 3.0], [7.2, 2.5], [8.8, 2.5], [-1.0, 2.0], [12.0, 7.0]])
+	assert not np.any(obstacle_map.free(inside[:, 0], inside[:, 1]))
+	assert np.all(obstacle_map.free(outside[:, 0], outside[:, 1]))
+	assert obstacle_map.path_free(np.linspace(0.5, 9.5, 50), np.full(50, 4.5))
+	assert not obstacle_map.path_free(np.linspace(0.5, 9.5, 50), np.full(50, 2.0))
+
+
+def test_clearance():
+	obstacle_map = obstacles.ObstacleMap([('circle', 5.0, 2.5, 0.8)], space, clearance=0.5)
+	x = 5.0 + np.array([0.0, 1.1, 1.2, 1.4, 1.6])
+	np.testing.assert_array_equal(obstacle_map.free(x, np.full(len(x), 2.5)), [False, False, False, True, True])
+	assert obstacles.ObstacleMap(None, space).path_free([5.0], [2.5])
+
+
+def test_maps_are_shared_by_obstacles_and_field():
+	first = obstacles.get_map([('circle', 5.0, 2.5, 0.8)], space)
+	assert obstacles.get_map([('circle', 5.0, 2.5, 0.8)], space) is first
+	assert obstacles.get_map([('circle', 5.0, 2.5, 0.9)], space) is not first
+	assert obstacles.get_map([('circle', 5.0, 2.5, 0.8)], space, 0.05, 0.2) is not first
+	assert obstacles.get_map(None, space).signature().size == 0
@@ -0,0 +1,100 @@
+import time
+
+import numpy as np
+import pytest
+
+import Config
+from control_algorithms.base import dubins_path_planner as plan
+from control_algorithms.base.budget import make_budget
+
+
+def field_variance(gmrf_params, seed):
+	# smooth positive variance field over the GMRF vertices
+	(lxf, lyf, dvx, dvy, lx, ly, n, p, de, l_TH, p_THETA, xg_min, xg_max, yg_min, yg_max) = gmrf_params
+	rng = np.random.RandomState(seed)
+	x = xg_min + (np.arange(n) % lx) * de[0]
+	y = yg_min + (np.arange(n) // lx) * de[1]
+	(cx, cy) = (rng.uniform(0, 9.9), rng.uniform(0, 4.9))
+	return np.append(0.2 + np.exp(-((x - cx) ** 2 + (y - cy) ** 2) / 8.0), np.zeros(p)).reshape(-1, 1)
+
+
+def planner(name, gmrf_params, var_x, seed=1, start=(0.5, 0.5, 0.785)):
+	return Config.make_planner(name, np.array(start), gmrf_params, var_x, 12.0, None, make_budget('iterations', 0.0, max_iterations=40), seed)
+
+
+@pytest.mark.parametrize('name', ['RRT', 'PRM', 'RRT_star', 'PRM_star', 'PRM_roadmap'])
+def test_edge_offsets_layout(name, gmrf_params, monkeypatch):
+	monkeypatch.setattr(Config, 'roadmap_vertices', 150)
+	monkeypatch.setattr(Config, 'roadmap_file', None)
+	control = planner(name, gmrf_params, field_variance(gmrf_params, 0))
+	path, u_optimal, tau_optimal = control.control_algorithm()
+	# one entry per edge of the path, starting at 0
+	(edge_offsets, arc_offsets) = (np.asarray(control.edge_offsets), np.asarray(control.arc_offsets))
+	assert len(edge_offsets) == len(arc_offsets) == len(path) - 1 > 0
+	assert edge_offsets[0] == 0 and arc_offsets[0] == 0.0
+	assert np.all(np.diff(edge_offsets) > 0) and edge_offsets[-1] < tau_optimal.shape[1]
+	assert np.all(np.diff(arc_offsets) > 0)
+	# every edge starts where the one before it ended
+	ends = tau_optimal[:2, edge_offsets[1:] - 1]
+	starts = tau_optimal[:2, edge_offsets[1:]]
+	assert np.all(np.hypot(*(starts - ends)) < 0.5)
+
+
+@pytest.mark.parametrize('name', ['RRT', 'PRM', 'RRT_star', 'PRM_star'])
+def test_seeded_planners_are_reproducible(name, gmrf_params):
+	var_x = field_variance(gmrf_params, 1)
+	(first, second, other) = [planner(name, gmrf_params, var_x, seed).control_algorithm() for seed in (3, 3, 4)]
+	np.testing.assert_array_equal(first[2], second[2])
+	np.testing.assert_array_equal(first[1], second[1])
+	assert not np.array_equal(first[2], other[2])
+
+
+def test_edge_bound_is_a_lower_bound(gmrf_params):
+	control = planner('RRT_star', gmrf_params, field_variance(gmrf_params, 2))
+	rng = np.random.RandomState(0)
+	for _ in range(100):
+		(source, dest) = rng.uniform([0, 0, -np.pi], [9.9, 4.9, np.pi], size=(2, 3))
+		plength, var_bound = control.edge_bound(source, dest)
+		px, py, pangle, mode, length, u = plan.dubins_path_planning(source[0], source[1], source[2], dest[0], dest[1], dest[2], control.max_curvature)
+		assert np.isclose(plength, length)
+		assert var_bound <= control.path_var(px, py, pangle) + 1e-9
+
+
+@pytest.mark.parametrize('name', ['RRT_star', 'PRM_star'])
+def test_replan_rescores_the_kept_tree(name, gmrf_params, monkeypatch):
+	monkeypatch.setattr(Config, 'persistent_planner', True)
+	control = planner(name, gmrf_params, field_variance(gmrf_params, 3))
+	path, u_optimal, tau_optimal = control.control_algorithm()
+	start = tau_optimal[:, control.edge_offsets[1]]
+	var_x = field_variance(gmrf_params, 4)
+	control.replan(start, var_x, 11.0)
+	tree = control.tree
+	assert len(tree) > 1 and np.array_equal(tree.pose[0], start)
+	nodes = np.arange(1, len(tree))
+	assert np.all(tree.dist[nodes] <= control.max_dist)
+	for node in nodes:
+		edge = tree.edge(node)
+		assert np.isclose(tree.path_var[node], control.path_var(edge[:, 0], edge[:, 1], edge[:, 2]))
+		assert np.isclose(tree.dist[node], tree.dist[tree.parent[node]] + tree.path_dist[node])
+	path, u_optimal, tau_optimal = control.control_algorithm()
+	np.testing.assert_allclose(tau_optimal[:, 0], start)
+
+
+@pytest.mark.parametrize('name', ['RRT', 'PRM', 'RRT_star', 'PRM_star'])
+def test_stalled_tracks_the_best_cost(name, gmrf_params, monkeypatch):
+	monkeypatch.setattr(Config, 'stall_time', 10.0)
+	control = planner(name, gmrf_params, field_variance(gmrf_params, 5))
+	control.best_cost, control.best_time = float("inf"), time.time() - 20.0
+	# an improvement restarts the clock, an equal or worse cost does not
+	assert not control.stalled(1.0) and control.best_cost == 1.0
+	assert not control.stalled(2.0) and control.best_cost == 1.0
+	control.best_time -= 20.0
+	assert control.stalled(1.0)
+
+
+@pytest.mark.parametrize('name', ['RRT', 'PRM'])
+def test_best_node_has_the_lowest_cost(name, gmrf_params):
+	control = planner(name, gmrf_params, field_variance(gmrf_params, 6))
+	path, u_optimal, tau_optimal = control.control_algorithm()
+	costs = [node.total_var / node.dist for node in control.node_list if node.dist >= control.min_dist]
+	assert path[0] is control.best_node and control.best_node_cost() == min(costs)
@@ -0,0 +1,51 @@
+import numpy as np
+
+import Config
+import replay
+from gp_scripts import gp_scripts
+
+measurements = [(np.array([2.0, 1.5, 0.3]), np.array([0.4])), (np.array([6.0, 3.0, -1.0]), np.array([-0.2]))]
+
+
+def record(filename, gmrf, pairs, gmrf_state=None):
+	# logs the measurements like main.py while updating gmrf, returns the results of the updates
+	log = replay.MeasurementLog(filename, 5, gmrf_state)
+	results = []
+	for (x_auv, y_t) in pairs:
+		log.record(x_auv, y_t)
+		results.append([np.ravel(value).copy() for value in gmrf.gmrf_bayese_update(x_auv, y_t)])
+	log.close()
+	return results
+
+
+def test_replay_agrees_with_the_simulation(tmp_path):
+	gmrf = gp_scripts.GMRF(Config.gmrf_dim, Config.alpha_prior, Config.kappa_prior, False)
+	filename = str(tmp_path / 'run_measurements.npz')
+	results = record(filename, gmrf, measurements)
+	log = replay.load(filename)
+	assert int(log['seed']) == 5 and len(log['y_t']) == 2
+
+	stats, mue, var, pi = replay.replay(log, replay.reference_backend)
+	assert stats['steps'] == 2
+	for k, (mue_x, var_x, pi_theta) in enumerate(results):
+		np.testing.assert_array_equal(mue[k], mue_x)
+		np.testing.assert_array_equal(var[k], var_x)
+		np.testing.assert_array_equal(pi[k], pi_theta)
+
+	deviation = replay.agreement((mue, var, pi), (mue, var, pi), 1e-7, 1e-10)
+	assert all(d['close'] for d in deviation.values())
+	deviation = replay.agreement((mue, var, pi), (mue, var * (1 + 1e-5), pi), 1e-7, 1e-10)
+	assert not deviation['var_x']['close'] and deviation['mue_x']['close']
+
+
+def test_replay_starts_from_the_logged_checkpoint(tmp_path):
+	gmrf = gp_scripts.GMRF(Config.gmrf_dim, Config.alpha_prior, Config.kappa_prior, False)
+	gmrf.gmrf_bayese_update(*measurements[0])
+	state = str(tmp_path / 'gmrf.npz')
+	gmrf.save_state(state)
+	filename = str(tmp_path / 'run_measurements.npz')
+	results = record(filename, gmrf, measurements[1:], state)
+
+	stats, mue, var, pi = replay.replay(replay.load(filename), replay.reference_backend)
+	np.testing.assert_array_equal(mue[0], results[0][0])
+	np.testing.assert_array_equal(var[0], results[0][1])
@@ -0,0 +1,22 @@
+import os
+
+import numpy as np
+
+import Config
+from control_algorithms import PRM_roadmap_control
+from control_algorithms.base.Roadmap import Roadmap
+from test_planners import field_variance, planner
+
+
+def test_roadmap_file_round_trip(gmrf_params, tmp_path, monkeypatch):
+	monkeypatch.setattr(Config, 'roadmap_vertices', 60)
+	monkeypatch.setattr(Config, 'roadmap_file', str(tmp_path / 'cache' / 'roadmap'))
+	monkeypatch.setattr(PRM_roadmap_control, 'roadmaps', {})
+	control = planner('PRM_roadmap', gmrf_params, field_variance(gmrf_params, 0))
+	# the file gets the suffix np.savez_compressed adds and is found again under the configured name
+	assert os.listdir(str(tmp_path / 'cache')) == ['roadmap.npz']
+	roadmap = Roadmap.load(Config.roadmap_file, control.signature())
+	for name in ('pose', 'path', 'u', 'indptr') + Roadmap.edge_arrays + Roadmap.cell_arrays:
+		np.testing.assert_array_equal(getattr(roadmap, name), getattr(control.roadmap, name))
+	assert Roadmap.load(Config.roadmap_file, control.signature() + 1) is None
+	assert Roadmap.load(str(tmp_path / 'missing.npz'), control.signature()) is None
@@ -0,0 +1,40 @@
+import math
+
+import numpy as np
+
+from control_algorithms.base import samplers
+
+bounds = [1.0, 8.0, 0.5, 4.0]
+
+
+def draw(sampler, k):
+	return np.array([sampler.sample() for _ in range(k)])
+
+
+def test_samples_are_inside_the_bounds_and_seeded(gmrf_params):
+	var_x = np.random.RandomState(0).uniform(0.0, 1.0, gmrf_params[6] + gmrf_params[7])
+	for name in ('uniform', 'halton', 'sobol', 'variance'):
+		samples = draw(samplers.make_sampler(name, bounds, gmrf_params, var_x, seed=3, batch_size=64), 300)
+		assert np.all((samples[:, 0] >= bounds[0]) & (samples[:, 0] <= bounds[1])), name
+		assert np.all((samples[:, 1] >= bounds[2]) & (samples[:, 1] <= bounds[3])), name
+		assert np.all((samples[:, 2] >= -math.pi) & (samples[:, 2] < math.pi)), name
+		np.testing.assert_array_equal(draw(samplers.make_sampler(name, bounds, gmrf_params, var_x, seed=3, batch_size=64), 300), samples)
+		assert not np.array_equal(draw(samplers.make_sampler(name, bounds, gmrf_params, var_x, seed=4, batch_size=64), 300), samples), name
+
+
+def test_halton_samples_cover_the_box_evenly():
+	samples = draw(samplers.make_sampler('halton', bounds, seed=0), 512)
+	counts, _, _ = np.histogram2d(samples[:, 0], samples[:, 1], bins=4, range=[bounds[:2], bounds[2:]])
+	assert counts.min() >= 512 / 16 - 4 and counts.max() <= 512 / 16 + 4
+
+
+def test_variance_sampler_follows_the_variance(gmrf_params):
+	(lxf, lyf, dvx, dvy, lx, ly, n, p, de, l_TH, p_THETA, xg_min, xg_max, yg_min, yg_max) = gmrf_params
+	vertex_x = xg_min + (np.arange(n) % lx) * de[0]
+	var_x = np.full(n + p, 1e-3)
+	var_x[:n][vertex_x > 6.0] = 1.0
+	sampler = samplers.make_sampler('variance', bounds, gmrf_params, var_x, seed=0)
+	assert np.mean(draw(sampler, 1000)[:, 0] > 6.0) > 0.75
+	# after an update the samples follow the new field
+	sampler.update(np.where(var_x == 1.0, 1e-3, 1.0))
+	assert np.mean(draw(sampler, 1000)[:, 0] > 6.0) < 0.25
@@ -0,0 +1,93 @@
+import numpy as np
+
+import Config
+from control_algorithms.base import footprint
+from control_algorithms.base.Tree import Tree
+
+
+def random_tree(n, seed, edge_footprint=None):
+	# random tree in the field, every edge is a straight polyline from the parent to the node
+	rng = np.random.RandomState(seed)
+	tree = Tree([1.0, 1.0, 0.0], capacity=4, path_capacity=16, edge_footprint=edge_footprint, min_dist=1.0)
+	for node in range(1, n):
+		parent = rng.randint(0, node)
+		pose = np.array([rng.uniform(0.5, 9.5), rng.uniform(0.5, 4.5), rng.uniform(-np.pi, np.pi)])
+		points = rng.randint(2, 8)
+		px = np.linspace(tree.pose[parent, 0], pose[0], points)
+		py = np.linspace(tree.pose[parent, 1], pose[1], points)
+		tree.add_node(pose, parent, px, py, np.full(points, pose[2]), rng.uniform(-1, 1, points - 1),
+					  rng.uniform(0.5, 2.0), -rng.uniform(0.0, 3.0))
+	return tree
+
+
+def closed_mask(tree, rng):
+	# random mask that keeps the root and every ancestor of a kept node
+	keep = rng.uniform(size=len(tree)) < 0.6
+	keep[0] = True
+	for node in range(len(tree)):
+		if keep[node]:
+			parent = tree.parent[node]
+			while parent >= 0 and not keep[parent]:
+				keep[parent] = True
+				parent = tree.parent[parent]
+	return keep
+
+
+def check_consistent(tree):
+	n = len(tree)
+	parent = tree.parent[:n]
+	assert parent[0] == -1 and np.all((parent[1:] >= 0) & (parent[1:] < n))
+	assert np.all(tree.parent[n:] == -1)
+	assert len(tree.child_sets) == n
+	for node in range(n):
+		assert tree.children(node) == set(np.nonzero(parent == node)[0])
+	for node in range(1, n):
+		assert np.isclose(tree.dist[node], tree.dist[parent[node]] + tree.path_dist[node])
+		assert np.isclose(tree.total_var[node], tree.total_var[parent[node]] + tree.path_var[node])
+
+
+def test_prune_keeps_parents_and_children_consistent():
+	rng = np.random.RandomState(0)
+	for seed in range(5):
+		tree = random_tree(60, seed)
+		for _ in range(3):
+			keep = closed_mask(tree, rng)
+			old = {node: (tree.pose[node].copy(), tree.parent[node], tree.edge(node).copy(), tree.edge_u(node).copy(), tree.dist[node])
+				   for node in np.nonzero(keep)[0]}
+			mapping = tree.prune(keep)
+			assert len(tree) == np.count_nonzero(keep)
+			assert np.all(mapping[~keep] == -1)
+			check_consistent(tree)
+			for node, (pose, parent, edge, u, dist) in old.items():
+				new = mapping[node]
+				np.testing.assert_array_equal(tree.pose[new], pose)
+				assert tree.parent[new] == (mapping[parent] if parent >= 0 else -1)
+				np.testing.assert_array_equal(tree.edge(new), edge)
+				np.testing.assert_array_equal(tree.edge_u(new), u)
+				assert tree.dist[new] == dist
+			best = tree.best_node()
+			reachable = np.nonzero(tree.dist[:len(tree)] >= tree.min_dist)[0]
+			assert best == 0 if len(reachable) == 0 else tree.cost[best] == tree.cost[reachable].min()
+			# the pruned tree keeps growing and rewiring like before
+			node = tree.add_node([5.0, 2.0, 0.0], 0, [1.0, 5.0], [1.0, 2.0], [0.0, 0.0], [0.0], 4.1, -1.0)
+			if len(tree) > 2:
+				tree.set_edge(1, node, [5.0, 6.0], [2.0, 2.0], [0.0, 0.0], [0.0], 1.0, -0.5)
+				for child in tree.descendants(1):
+					tree.update_node(child)
+			check_consistent(tree)
+
+
+def test_prune_keeps_the_edge_footprint_index(gmrf_params):
+	def edge_footprint(px, py):
+		return footprint.path_footprint(px, py, gmrf_params, Config.field_dim)
+	var_x = np.random.RandomState(1).uniform(0.0, 1.0, gmrf_params[6] + gmrf_params[7])
+	tree = random_tree(40, 3, edge_footprint)
+	before = tree.edge_vars(var_x, Config.border_variance_penalty)
+	keep = closed_mask(tree, np.random.RandomState(2))
+	mapping = tree.prune(keep)
+	np.testing.assert_allclose(tree.edge_vars(var_x, Config.border_variance_penalty), before[keep])
+	cells = [set(edge_footprint(tree.edge(node)[:, 0], tree.edge(node)[:, 1])[0]) for node in range(len(tree))]
+	for vertex in set().union(*cells) | {0}:
+		expected = [node for node in range(len(tree)) if vertex in cells[node]]
+		np.testing.assert_array_equal(tree.edges_crossing([vertex]), expected)
+	assert np.all(mapping[np.nonzero(keep)[0]] == np.arange(len(tree)))